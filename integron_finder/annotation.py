@@ -27,8 +27,10 @@
 ####################################################################################
 
 import os
+import time
 import subprocess
 import shlex
+from concurrent.futures import ThreadPoolExecutor
 import colorlog
 
 import numpy as np
@@ -37,7 +39,7 @@ from Bio import SeqFeature
 from Bio import SeqIO
 
 from .utils import get_name_from_path
-from .hmm import read_hmm
+from .hmm import read_hmm, domtblout_path, scale_evalue
 
 _log = colorlog.getLogger(__name__)
 
@@ -48,6 +50,10 @@ def func_annot(integrons, replicon, prot_db, hmm_files, cfg, out_dir='.', evalue
     | Use NCBIfam-AMRFinder.LIB available here https://ftp.ncbi.nlm.nih.gov/hmm/NCBIfam-AMRFinder/
     | check for the appropriate version
 
+    The proteins of all integrons are searched together, with one hmmsearch run per hmm file,
+    then the hits are dispatched to the integrons by protein id.
+    The hmm files are searched in parallel, the *cpu* of the configuration are shared between the hmmsearch runs.
+
     :param integrons: integrons list to annotate
     :type integrons: list of :class:`integron_finder.integron.Integron` objects.
     :param replicon: replicon where the integrons were found (genomic fasta file)
@@ -65,65 +71,154 @@ def func_annot(integrons, replicon, prot_db, hmm_files, cfg, out_dir='.', evalue
 
              But several files per hmm file are produced.
 
-             * subseqprot.tmp: fasta file containing a subset of protfile (the proteins belonging to the integron)
+             * subseqprot.tmp: fasta file containing a subset of protfile (the proteins belonging to the integrons)
              * <hmm>_fa.res: an output of the hmm search.
              * <hmm>_fa_table.res: an output of the hmm search in tabulated format.
+             * <hmm>_fa_domtable.res: the per-domain output of the hmm search in tabulated format,
+               with the domains P-values (the E-values are computed for each integron).
 
     """
 
     prot_tmp = f'{os.path.join(out_dir, replicon.id + "_subseqprot.tmp")}'
+    if os.path.isfile(prot_tmp):
+        os.remove(prot_tmp)
+
+    integrons = [integron for integron in integrons if integron.type() != "In0" and not integron.proteins.empty]
+    if not integrons:
+        return
+    # the integrons of each protein to annotate
+    # a protein can belong to several overlapping integrons
+    prot_integrons = {}
+    for integron_idx, integron in enumerate(integrons):
+        for prot_id in integron.proteins.index:
+            prot_integrons.setdefault(prot_id, []).append(integron_idx)
+
+    prot_to_annotate = []
+    for prot_nb, prot_id in enumerate(prot_db.coding_prot_ids(), 1):
+        if prot_id in prot_integrons:
+            prot_to_annotate.append(prot_db[prot_id])
+    SeqIO.write(prot_to_annotate, prot_tmp, "fasta")
+
+    columns = ["Accession_number", "query_name", "ID_query", "ID_prot", "strand", "pos_beg", "pos_end", "evalue"]
+
+    # the banks are searched in parallel, the cpus are shared between the concurrent hmmsearch
+    workers = max(1, min(len(hmm_files), cfg.cpu))
+    hmm_cpu = max(1, cfg.cpu // workers)
+
+    def search(hmm):
+        """
+        :param str hmm: the path to the hmm file
+        :return: the path of the hmmsearch output, the domains search space of each integron and the time spent
+        :rtype: tuple (str, dict, float)
+        """
+        start = time.perf_counter()
+        name_wo_ext = "{}_{}".format(replicon.id, get_name_from_path(hmm))
+        hmm_out = os.path.join(out_dir, "{}_fa.res".format(name_wo_ext))
+        hmm_tableout = os.path.join(out_dir, "{}_fa_table.res".format(name_wo_ext))
+        # the sequences E-values are computed with the number of proteins of the replicon as search space (-Z)
+        # the domains E-values use the number of sequences reported (domZ) in the search of each integron,
+        # so they are computed for each integron from the P-values (--domZ 1) see _domain_search_spaces
+        hmm_cmd = "{hmmsearch} --cut_ga -Z {prot_nb} --domZ 1 --cpu {cpu} --tblout {tblout} --domtblout {domtblout}" \
+                  " -o {hmm_out} {hmm} {prot_tmp}".format(
+            hmmsearch=cfg.hmmsearch.replace(' ', '\\ '),
+            prot_nb=prot_nb,
+            cpu=hmm_cpu,
+            tblout=hmm_tableout.replace(' ', '\\ '),
+            domtblout=domtblout_path(hmm_out).replace(' ', '\\ '),
+            hmm_out=hmm_out.replace(' ', '\\ '),
+            hmm=hmm.replace(' ', '\\ '),
+            prot_tmp=prot_tmp.replace(' ', '\\ ')
+        )
+
+        try:
+            _log.debug(f"run hmmsearch: {hmm_cmd}")
+            cmd = shlex.split(hmm_cmd)
+            completed_process = subprocess.run(cmd)
+        except Exception as err:
+            raise RuntimeError(f"{cmd} failed : {err}")
+        if completed_process.returncode != 0:
+            raise RuntimeError(f"{cmd} failed return code = {completed_process.returncode}")
+        domz = _domain_search_spaces(hmm_tableout, prot_integrons)
+        return hmm_out, domz, time.perf_counter() - start
+
+    if workers == 1:
+        searches = [search(hmm) for hmm in hmm_files]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # the results are in the same order as hmm_files whatever the order of completion
+            searches = list(executor.map(search, hmm_files))
+
+    # the results are parsed and merged in hmm_files order
+    # so the annotation kept in case of ties does not depend on the scheduling
+    func_annotate_res = [[] for _ in integrons]
+    for hmm, (hmm_out, domz, elapsed) in zip(hmm_files, searches):
+        # the hits are read with their P-values, the E-values threshold is applied for each integron
+        hmm_in = read_hmm(replicon.id, prot_db, hmm_out, cfg, evalue=np.inf, coverage=coverage)
+        annotated = set()
+        for integron_idx, integron in enumerate(integrons):
+            integron_hits = hmm_in[hmm_in.ID_prot.isin(integron.proteins.index)].copy()
+            if integron_hits.empty:
+                continue
+            # the E-values of a search of the proteins of this integron alone
+            integron_hits["evalue"] = _scale_evalues(integron_hits.evalue.to_numpy(),
+                                                     [domz.get((integron_idx, query), 1)
+                                                      for query in integron_hits.query_name])
+            integron_hits = integron_hits[integron_hits.evalue < evalue]
+            integron_hits = integron_hits.sort_values("evalue").drop_duplicates(subset="ID_prot")
+            if not integron_hits.empty:
+                func_annotate_res[integron_idx].append(integron_hits)
+                annotated.update(integron_hits.ID_prot)
+        _log.info(f"Functional annotation with {get_name_from_path(hmm)}: {len(annotated)} proteins annotated "
+                  f"in {elapsed:.2f}s")
+
+    for integron, integron_res in zip(integrons, func_annotate_res):
+        if integron_res:
+            integron_res = pd.concat(integron_res).sort_values("evalue").drop_duplicates(subset="ID_prot")
+        else:
+            integron_res = pd.DataFrame(columns=columns)
+        integron.annotate_proteins(integron_res.ID_prot.tolist(),
+                                   integron_res.evalue.tolist(),
+                                   integron_res.query_name.tolist(),
+                                   integron_res.ID_query.tolist())
 
-    for integron in integrons:
-        if os.path.isfile(prot_tmp):
-            os.remove(prot_tmp)
-
-        if integron.type() != "In0" and not integron.proteins.empty:
-
-            func_annotate_res = pd.DataFrame(columns=["Accession_number",
-                                                      "query_name", "ID_query",
-                                                      "ID_prot", "strand",
-                                                      "pos_beg", "pos_end", "evalue"])
-
-            prot_to_annotate = []
-            for prot_nb, prot_id in enumerate(prot_db.coding_prot_ids(), 1):
-                if prot_id in integron.proteins.index:
-                    prot_to_annotate.append(prot_db[prot_id])
-
-            SeqIO.write(prot_to_annotate, prot_tmp, "fasta")
-            for hmm in hmm_files:
-                name_wo_ext = "{}_{}".format(replicon.id, get_name_from_path(hmm))
-                hmm_out = os.path.join(out_dir, "{}_fa.res".format(name_wo_ext))
-                hmm_tableout = os.path.join(out_dir, "{}_fa_table.res".format(name_wo_ext))
-                hmm_cmd = "{hmmsearch} --cut_ga -Z {prot_nb} --cpu {cpu} --tblout {tblout} -o {hmm_out}" \
-                          " {hmm} {prot_tmp}".format(
-                    hmmsearch=cfg.hmmsearch.replace(' ', '\\ '),
-                    prot_nb=prot_nb,
-                    cpu=cfg.cpu,
-                    tblout=hmm_tableout.replace(' ', '\\ '),
-                    hmm_out=hmm_out.replace(' ', '\\ '),
-                    hmm=hmm.replace(' ', '\\ '),
-                    prot_tmp=prot_tmp.replace(' ', '\\ ')
-                )
-
-                try:
-                    _log.debug(f"run hmmsearch: {hmm_cmd}")
-                    cmd = shlex.split(hmm_cmd)
-                    completed_process = subprocess.run(cmd)
-                except Exception as err:
-                    raise RuntimeError(f"{cmd} failed : {err}")
-                if completed_process.returncode != 0:
-                    raise RuntimeError(f"{cmd} failed return code = {completed_process.returncode}")
-                hmm_in = read_hmm(replicon.id, prot_db, hmm_out, cfg, evalue=evalue, coverage=coverage
-                                  ).sort_values("evalue").drop_duplicates(subset="ID_prot")
-                to_concat = [df for df in [func_annotate_res, hmm_in] if not df.empty]
-                if to_concat:
-                    func_annotate_res = pd.concat(to_concat)
-            func_annotate_res = func_annotate_res.sort_values("evalue").drop_duplicates(subset="ID_prot")
-
-            integron.proteins.loc[func_annotate_res.ID_prot, "evalue"] = func_annotate_res.evalue.values
-            integron.proteins.loc[func_annotate_res.ID_prot, "annotation"] = func_annotate_res.query_name.values
-            integron.proteins.loc[func_annotate_res.ID_prot, "model"] = func_annotate_res.ID_query.values
-            integron.proteins = integron.proteins.astype(dtype=integron.dtype)
+
+def _domain_search_spaces(tblout, prot_integrons):
+    """
+    The search is run with --domZ 1, so the domains E-values reported by hmmsearch are P-values.
+    In a search of the proteins of one integron alone, hmmsearch uses the number of sequences reported
+    for a profile as search space for its domains (domZ).
+    This function computes this number for each integron from the per-sequence output.
+    A protein which belongs to several integrons is counted in each of them.
+
+    :param str tblout: the path to the hmmsearch per-sequence tabular output
+    :param dict prot_integrons: the indexes of the integrons of each protein {str prot_id: [int integron index, ...]}
+    :return: the domains search space of each integron for each profile {(int integron index, str query): int domZ}
+    :rtype: dict
+    """
+    reported = {}
+    with open(tblout) as tbl:
+        for line in tbl:
+            if not line.startswith('#'):
+                # target name, accession, query name
+                fields = line.split(maxsplit=3)
+                for integron_idx in prot_integrons[fields[0]]:
+                    key = (integron_idx, fields[2])
+                    reported[key] = reported.get(key, 0) + 1
+    return reported
+
+
+def _scale_evalues(pvalues, search_spaces):
+    """
+    Convert the P-values reported by hmmsearch to E-values (see :func:`integron_finder.hmm.scale_evalue`).
+
+    :param pvalues: the P-values
+    :type pvalues: :class:`numpy.ndarray` of float
+    :param search_spaces: the search space of each P-value
+    :type search_spaces: sequence of int
+    :return: the E-values as printed by hmmsearch
+    :rtype: :class:`numpy.ndarray` of float
+    """
+    return np.array([scale_evalue(pvalue, z) for pvalue, z in zip(pvalues, search_spaces)], dtype=float)
 
 
 def add_feature(replicon, integron_desc, prot_db, dist_threshold):
@@ -30,7 +30,7 @@ import colorlog
 import numpy as np
 import pandas as pd
 
-from .infernal import local_max, expand
+from .infernal import local_max_batch, expand_search
 
 _log = colorlog.getLogger(__name__)
 
@@ -49,30 +49,34 @@ def search_attc(attc_df, keep_palindromes, dist_threshold, replicon_size, rep_to
     :return: a list attC sites found on replicon
     :rtype: list of :class:`pandas.DataFrame` objects
     """
-    def overlap(attc1, attc2):
+    def drop_overlaps(pos_beg, pos_end, evalue):
         """
-        compare two attc sites (attc2 must start at smae position or after attc1)
-        and remove attc sites which overlap more than 50%
-        keep the one with lower evalue
-
-        :param attc1: the first attc to compare
-        :type attc1: pandas.Series with fields
-                     "Accession_number", "cm_attC", "cm_debut", "cm_fin", "pos_beg", "pos_end", "sens", "evalue"
-        :param attc2: the second attc to compare
-        :type attc2: pandas.Series with fields
-                     "Accession_number", "cm_attC", "cm_debut", "cm_fin", "pos_beg", "pos_end", "sens", "evalue"
-        :return: a tuple of attc (pandas Series)
+        Sweep the attc sites (sorted along pos_beg, pos_end, evalue)
+        and remove attc sites which overlap more than 50% the previous kept one,
+        keep the one with lower evalue (the last one on tie).
+
+        :param list pos_beg: the start of each attc site
+        :param list pos_end: the end of each attc site
+        :param list evalue: the evalue of each attc site
+        :return: the indexes of the attc sites to keep
+        :rtype: list of int
         """
-        if attc2.pos_beg >= attc1.pos_end:
-            return attc1, attc2
-        else:
-            attc_1_len = attc1.pos_end - attc1.pos_beg
-            overlap = min(attc1.pos_end, attc2.pos_end) - attc2.pos_beg # by def attc_2.pos_beg >= attc_1.pos_beg
-            ratio = overlap / attc_1_len
-            if ratio > .5:
-                return (attc1, ) if attc1.evalue < attc2.evalue else (attc2, )
-            else:
-                return attc1, attc2
+        attc_to_keep = [0]
+        for idx in range(1, len(pos_beg)):
+            prev = attc_to_keep[-1]
+            # by def pos_beg[idx] >= pos_beg[prev]
+            if pos_beg[idx] < pos_end[prev]:
+                overlap = min(pos_end[prev], pos_end[idx]) - pos_beg[idx]
+                prev_len = pos_end[prev] - pos_beg[prev]
+                # as the former numpy division, a site of null length gives an infinite (or nan) ratio
+                ratio = overlap / prev_len if prev_len else overlap * np.inf
+                if ratio > .5:
+                    if not evalue[prev] < evalue[idx]:
+                        attc_to_keep[-1] = idx
+                    continue
+            attc_to_keep.append(idx)
+        return attc_to_keep
+
     ok = False
 
     position_bkp_minus = []
@@ -84,11 +88,10 @@ def search_attc(attc_df, keep_palindromes, dist_threshold, replicon_size, rep_to
     if not keep_palindromes:
         attc_df.sort_values(by=["pos_beg", "pos_end", "evalue"], inplace=True)
         if not attc_df.empty:
-            attc_to_keep = [attc_df.iloc[0]]
-            for row_idx in range(1, len(attc_df)):
-                previous_attc = attc_to_keep.pop()
-                attc_to_keep.extend(overlap(previous_attc, attc_df.iloc[row_idx]))
-            attc_df = pd.DataFrame(attc_to_keep, index=list(range(len(attc_to_keep))))
+            attc_to_keep = drop_overlaps(attc_df.pos_beg.tolist(),
+                                         attc_df.pos_end.tolist(),
+                                         attc_df.evalue.tolist())
+            attc_df = attc_df.iloc[attc_to_keep].reset_index(drop=True)
         attc_plus = attc_df[attc_df.sens == "+"].copy()
         attc_minus = attc_df[attc_df.sens == "-"].copy()
 
@@ -156,7 +159,7 @@ def find_attc_max(integrons, replicon, distance_threshold,
                   evalue_attc=1.,
                   circular=True, out_dir='.',
                   cmsearch_bin='cmsearch',
-                  cpu=1):
+                  cpu=1, cache=None, keep_tmp=False):
     """
     Look for attC site with cmsearch --max option which remove all heuristic filters.
     As this option make the algorithm way slower, we only run it in the region around a
@@ -196,6 +199,9 @@ def find_attc_max(integrons, replicon, distance_threshold,
                         used indirectly by some called functions as :func:`infernal.local_max` or `infernal.expand`.
     :param str cmsearch_bin: The path to the `cmsearch_bin` binary to use
     :param int cpu: call local_max with the right number of cpu
+    :param cache: the cache of the local_max windows searched in previous runs
+    :type cache: :class:`integron_finder.cache.ResultCache` object or None
+    :param bool keep_tmp: write the sequences searched by local_max and the alignments in out_dir
     :return: a table of attC site
     :rtype: :class:`pd.DataFrame` object with monotonic indexes
 
@@ -245,7 +251,18 @@ def find_attc_max(integrons, replicon, distance_threshold,
                                  )].copy()
         return all_attc
 
-    for i in integrons:
+    def attc_max_search(i):
+        """
+        The local_max search around one integron.
+        It yields lists of windows to search (window_beg, window_end, strand_search) and must receive
+        the list of local_max results, or None when it needs the attC sites found around
+        the previous integrons (max_final).
+
+        :param i: the integron
+        :type i: :class:`Integron` object
+        :return: the attC sites found around the integron
+        :rtype: :class:`pd.DataFrame` object
+        """
         max_elt = pd.DataFrame(columns=columns)
         max_elt = max_elt.astype(dtype=data_type)
         full_element = i.describe()  # dataframe
@@ -279,14 +296,7 @@ def find_attc_max(integrons, replicon, distance_threshold,
                 window_end = min(size_replicon, window_end + distance_threshold_right)
 
             strand = "top" if full_element[full_element.type_elt == "attC"].strand.values[0] == 1 else "bottom"
-            df_max = local_max(replicon, window_beg, window_end, model_attc_path,
-                               strand_search=strand,
-                               evalue_attc=evalue_attc,
-                               max_attc_size=max_attc_size,
-                               min_attc_size=min_attc_size,
-                               out_dir=out_dir,
-                               cmsearch_bin=cmsearch_bin,
-                               cpu=cpu)
+            df_max, = yield [(window_beg, window_end, strand)]
 
             all_attc = merge_previous_attc_w_local_max(i, df_max)
 
@@ -300,19 +310,15 @@ def find_attc_max(integrons, replicon, distance_threshold,
                        ) % size_replicon < distance_threshold and not integrase_is_left
             go_right = (all_attc.pos_beg.values[-1] - full_element[full_element.type_elt == "attC"].pos_end.values[-1]
                         ) % size_replicon < distance_threshold and integrase_is_left
-            max_elt = expand(replicon,
-                             window_beg, window_end, max_elt,
-                             circular, distance_threshold,
-                             model_attc_path,
-                             max_attc_size=max_attc_size,
-                             min_attc_size=min_attc_size,
-                             evalue_attc=evalue_attc,
-                             search_left=go_left, search_right=go_right,
-                             out_dir=out_dir,
-                             cmsearch_bin=cmsearch_bin,
-                             cpu=cpu)
+            max_elt = yield from expand_search(replicon,
+                                               window_beg, window_end, max_elt,
+                                               circular, distance_threshold,
+                                               max_attc_size=max_attc_size,
+                                               search_left=go_left, search_right=go_right)
 
         elif all(full_element.type == "CALIN"):
+            # wait for the attC sites found around the previous integrons
+            max_final = yield None
             if full_element[full_element.pos_beg.isin(max_final.pos_beg)].empty:
                 # if cluster don't overlap already max-searched region
                 window_beg = full_element[full_element.type_elt == "attC"].pos_beg.values[0]
@@ -325,15 +331,7 @@ def find_attc_max(integrons, replicon, distance_threshold,
                     window_end = min(size_replicon, window_end + distance_threshold)
                 strand = "top" if full_element[full_element.type_elt == "attC"].strand.values[0] == 1 else "bottom"
 
-                df_max = local_max(replicon, window_beg, window_end,
-                                   model_attc_path,
-                                   strand_search=strand,
-                                   evalue_attc=evalue_attc,
-                                   max_attc_size=max_attc_size,
-                                   min_attc_size=min_attc_size,
-                                   out_dir=out_dir,
-                                   cmsearch_bin=cmsearch_bin,
-                                   cpu=cpu)
+                df_max, = yield [(window_beg, window_end, strand)]
 
                 all_attc = merge_previous_attc_w_local_max(i, df_max)
                 to_concat = [df for df in [max_elt, all_attc] if not df.empty]
@@ -345,17 +343,11 @@ def find_attc_max(integrons, replicon, distance_threshold,
                                ) % size_replicon < distance_threshold
                     go_right = (all_attc.pos_beg.values[-1] - full_element[full_element.type_elt == "attC"].pos_end.values[-1]
                                 ) % size_replicon < distance_threshold
-                    max_elt = expand(replicon,
-                                     window_beg, window_end, max_elt,
-                                     circular, distance_threshold,
-                                     model_attc_path,
-                                     max_attc_size=max_attc_size,
-                                     min_attc_size=min_attc_size,
-                                     evalue_attc=evalue_attc,
-                                     search_left=go_left, search_right=go_right,
-                                     out_dir=out_dir,
-                                     cmsearch_bin=cmsearch_bin,
-                                     cpu=cpu)
+                    max_elt = yield from expand_search(replicon,
+                                                       window_beg, window_end, max_elt,
+                                                       circular, distance_threshold,
+                                                       max_attc_size=max_attc_size,
+                                                       search_left=go_left, search_right=go_right)
 
         elif all(full_element.type == "In0"):
             if all(full_element.model != "Phage_integrase"):
@@ -367,34 +359,66 @@ def find_attc_max(integrons, replicon, distance_threshold,
                 else:
                     window_beg = max(0, window_beg - distance_threshold)
                     window_end = min(size_replicon, window_end + distance_threshold)
-                df_max = local_max(replicon,
-                                   window_beg, window_end,
-                                   model_attc_path,
-                                   evalue_attc=evalue_attc,
-                                   max_attc_size=max_attc_size,
-                                   min_attc_size=min_attc_size,
-                                   out_dir=out_dir,
-                                   cmsearch_bin=cmsearch_bin,
-                                   cpu=cpu)
+                df_max, = yield [(window_beg, window_end, "both")]
                 to_concat = [df for df in [max_elt, df_max] if not df.empty]
                 if to_concat:
                     max_elt = pd.concat(to_concat)
                 if not max_elt.empty:
-                    max_elt = expand(replicon,
-                                     window_beg, window_end, max_elt,
-                                     circular, distance_threshold,
-                                     model_attc_path,
-                                     max_attc_size=max_attc_size,
-                                     min_attc_size=min_attc_size,
-                                     evalue_attc=evalue_attc,
-                                     search_left=True, search_right=True,
-                                     out_dir=out_dir,
-                                     cmsearch_bin=cmsearch_bin,
-                                     cpu=cpu)
+                    max_elt = yield from expand_search(replicon,
+                                                       window_beg, window_end, max_elt,
+                                                       circular, distance_threshold,
+                                                       max_attc_size=max_attc_size,
+                                                       search_left=True, search_right=True)
+        return max_elt
+
+    def add_max_elt(max_final, max_elt):
         to_concat = [df for df in [max_final, max_elt] if not df.empty]
         if to_concat:
             max_final = pd.concat(to_concat, ignore_index=True)
         max_final.drop_duplicates(subset=max_final.columns[:-1], inplace=True)
         max_final.index = range(len(max_final)) # this line is important for next step the index must be monotonic
+        return max_final
+
+    # the searches around all integrons are run together,
+    # at each step the pending windows of all searches (left and right of each integron)
+    # are searched with the same cmsearch calls (see local_max_batch)
+    searches = [attc_max_search(i) for i in integrons]
+    results = [None] * len(searches)
+    requests = {}
+
+    def advance(search_idx, value):
+        try:
+            requests[search_idx] = searches[search_idx].send(value)
+        except StopIteration as stop:
+            requests.pop(search_idx, None)
+            results[search_idx] = stop.value
+
+    for search_idx in range(len(searches)):
+        advance(search_idx, None)
+    merged = 0
+    while True:
+        # max_final is built in the integrons order
+        while merged < len(results) and results[merged] is not None:
+            max_final = add_max_elt(max_final, results[merged])
+            merged += 1
+        if not requests:
+            break
+        if merged in requests and requests[merged] is None:
+            # all previous searches are over
+            advance(merged, max_final)
+            continue
+        pending = [(search_idx, windows) for search_idx, windows in sorted(requests.items()) if windows is not None]
+        dfs_max = local_max_batch(replicon, [window for _, windows in pending for window in windows], model_attc_path,
+                                  evalue_attc=evalue_attc,
+                                  max_attc_size=max_attc_size,
+                                  min_attc_size=min_attc_size,
+                                  out_dir=out_dir,
+                                  cmsearch_bin=cmsearch_bin,
+                                  cpu=cpu,
+                                  cache=cache,
+                                  keep_tmp=keep_tmp)
+        for search_idx, windows in pending:
+            advance(search_idx, dfs_max[:len(windows)])
+            dfs_max = dfs_max[len(windows):]
     max_final = max_final.astype(dtype=data_type)
     return max_final
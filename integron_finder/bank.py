@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+####################################################################################
+# Integron_Finder - Integron Finder aims at detecting integrons in DNA sequences   #
+# by finding particular features of the integron:                                  #
+#   - the attC sites                                                               #
+#   - the integrase                                                                #
+#   - and when possible attI site and promoters.                                   #
+#                                                                                  #
+# Authors: Jean Cury, Bertrand Neron, Eduardo PC Rocha                             #
+# Copyright (c) 2015 - 2025  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                               #
+#                                                                                  #
+# integron_finder is free software: you can redistribute it and/or modify          #
+# it under the terms of the GNU General Public License as published by             #
+# the Free Software Foundation, either version 3 of the License, or                #
+# (at your option) any later version.                                              #
+#                                                                                  #
+# integron_finder is distributed in the hope that it will be useful,               #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of                   #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                    #
+# GNU General Public License for more details.                                     #
+#                                                                                  #
+# You should have received a copy of the GNU General Public License                #
+# along with this program (COPYING file).                                          #
+# If not, see <http://www.gnu.org/licenses/>.                                      #
+####################################################################################
+
+import os
+import json
+import tempfile
+
+import colorlog
+
+from .cache import file_digest
+
+_log = colorlog.getLogger(__name__)
+
+MANIFEST = 'bank.json'
+"""The name of the manifest file of a compiled bank"""
+
+
+def _parse_profiles(hmm_path):
+    """
+    :param str hmm_path: the path to a hmm file (which can contain several profiles)
+    :return: the name, accession, GA cutoffs and offset in the file (in bytes) of each profile
+    :rtype: list of dict with keys 'name', 'acc', 'ga' (a list of 2 floats or None), 'offset'
+    """
+    profiles = []
+    profile = None
+    offset = 0
+    with open(hmm_path, 'rb') as hmm_file:
+        for line in hmm_file:
+            line_offset = offset
+            offset += len(line)
+            line = line.decode()
+            if line.startswith('HMMER'):
+                profile = {'name': None, 'acc': None, 'ga': None, 'offset': line_offset}
+                profiles.append(profile)
+            elif profile is None:
+                continue
+            elif line.startswith('NAME '):
+                profile['name'] = line.split()[1]
+            elif line.startswith('ACC '):
+                profile['acc'] = line.split()[1]
+            elif line.startswith('GA '):
+                profile['ga'] = [float(cutoff.rstrip(';')) for cutoff in line.split()[1:3]]
+            elif line.startswith('HMM '):
+                # the header is over
+                profile = None
+    return profiles
+
+
+def _read_manifest(bank_dir):
+    """
+    :param str bank_dir: the path to the bank directory
+    :return: the manifest of the bank or None if the bank does not exist or cannot be read
+    :rtype: dict or None
+    """
+    manifest_path = os.path.join(bank_dir, MANIFEST)
+    try:
+        with open(manifest_path) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+
+
+def is_bank(path):
+    """
+    :param str path: a path
+    :return: True if path is a compiled bank (the bank directory or its manifest), False otherwise
+    :rtype: bool
+    """
+    if os.path.isdir(path):
+        return os.path.isfile(os.path.join(path, MANIFEST))
+    return os.path.basename(path) == MANIFEST and os.path.isfile(path)
+
+
+def build_bank(hmm_files, bank_dir, force=False):
+    """
+    Compile several hmm files in one bank, so the functional annotation need one hmmsearch run.
+    The bank is a directory which contains:
+
+        * *<bank name>.hmm*: all the profiles of the hmm files
+        * *bank.json*: the manifest, with for each source file its path, checksum, size and modification time
+          and for each profile its name, accession, GA cutoffs and offset in the compiled file.
+
+    The bank is rebuilt only if the source files have changed.
+
+    :param hmm_files: the path of the hmm files to compile (see :func:`integron_finder.hmm.scan_hmm_bank`)
+    :type hmm_files: list of str
+    :param str bank_dir: the path to the bank directory, it is created if needed
+    :param bool force: rebuild the bank even if the sources have not changed
+    :return: True if the bank has been (re)built, False if it was up to date.
+    :rtype: bool
+    :raise ValueError: if there is no hmm files or if a profile has no GA cutoffs
+                       (the functional annotation is done with --cut_ga)
+    """
+    if not hmm_files:
+        raise ValueError("No hmm files to compile.")
+    hmm_files = sorted(os.path.realpath(path) for path in hmm_files)
+    sources = [{'path': path,
+                'sha256': file_digest(path),
+                'size': os.path.getsize(path),
+                'mtime': os.path.getmtime(path)} for path in hmm_files]
+    bank_name = os.path.basename(os.path.normpath(bank_dir))
+    bank_path = os.path.join(bank_dir, bank_name + '.hmm')
+
+    manifest = _read_manifest(bank_dir)
+    if not force and manifest and os.path.isfile(bank_path) \
+            and [(src['path'], src['sha256']) for src in manifest['sources']] == \
+                [(src['path'], src['sha256']) for src in sources] \
+            and manifest['sha256'] == file_digest(bank_path):
+        _log.info(f"The bank '{bank_dir}' is up to date.")
+        return False
+
+    without_ga = []
+    for src in sources:
+        src['profiles'] = _parse_profiles(src['path'])
+        if not src['profiles']:
+            _log.warning(f"No profile found in '{src['path']}'.")
+        without_ga.extend(f"{profile['name']} ({src['path']})" for profile in src['profiles'] if not profile['ga'])
+    if without_ga:
+        raise ValueError(f"The profiles {', '.join(without_ga)} have no GA cutoffs.")
+
+    os.makedirs(bank_dir, exist_ok=True)
+    # write in temporary files then rename them
+    # so the bank is never seen partially written
+    tmp_fd, tmp_bank_path = tempfile.mkstemp(dir=bank_dir, prefix='.tmp_', suffix='.hmm')
+    with os.fdopen(tmp_fd, 'wb') as bank_file:
+        for src in sources:
+            with open(src['path'], 'rb') as hmm_file:
+                content = hmm_file.read()
+            # the offset of each profile in the compiled bank
+            start = bank_file.tell()
+            for profile in src['profiles']:
+                profile['offset'] += start
+            bank_file.write(content)
+            if not content.endswith(b'\n'):
+                bank_file.write(b'\n')
+    manifest = {'name': bank_name,
+                'bank': os.path.basename(bank_path),
+                'sha256': file_digest(tmp_bank_path),
+                'sources': sources}
+    tmp_fd, tmp_manifest_path = tempfile.mkstemp(dir=bank_dir, prefix='.tmp_', suffix='.json')
+    with os.fdopen(tmp_fd, 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(tmp_bank_path, bank_path)
+    os.replace(tmp_manifest_path, os.path.join(bank_dir, MANIFEST))
+    profiles_nb = sum(len(src['profiles']) for src in sources)
+    _log.info(f"The bank '{bank_dir}' has been built with {profiles_nb} profiles from {len(sources)} files.")
+    return True
+
+
+def load_bank(path):
+    """
+    Load a compiled bank, the sources files are only checked by size and modification time,
+    a warning is emitted if they have changed since the bank was built.
+
+    :param str path: the path to the bank directory or to its manifest
+    :return: the path to the compiled hmm file
+    :rtype: str
+    :raise IOError: if the manifest cannot be read or the compiled file does not exist
+    """
+    bank_dir = path if os.path.isdir(path) else os.path.dirname(path)
+    manifest = _read_manifest(bank_dir)
+    if manifest is None:
+        raise IOError(f"Cannot read the manifest of the bank '{bank_dir}'")
+    bank_path = os.path.join(bank_dir, manifest['bank'])
+    if not os.path.isfile(bank_path):
+        raise IOError(f"The bank file '{bank_path}' does not exist")
+    for src in manifest['sources']:
+        try:
+            changed = os.path.getsize(src['path']) != src['size'] or os.path.getmtime(src['path']) != src['mtime']
+        except OSError:
+            # the sources are not needed to use the bank
+            continue
+        if changed:
+            _log.warning(f"The source '{src['path']}' of the bank '{bank_dir}' has changed. "
+                         f"Rebuild it with 'integron_bank build'.")
+    return bank_path
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+
+####################################################################################
+# Integron_Finder - Integron Finder aims at detecting integrons in DNA sequences   #
+# by finding particular features of the integron:                                  #
+#   - the attC sites                                                               #
+#   - the integrase                                                                #
+#   - and when possible attI site and promoters.                                   #
+#                                                                                  #
+# Authors: Jean Cury, Bertrand Neron, Eduardo PC Rocha                             #
+# Copyright (c) 2015 - 2025  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                               #
+#                                                                                  #
+# integron_finder is free software: you can redistribute it and/or modify          #
+# it under the terms of the GNU General Public License as published by             #
+# the Free Software Foundation, either version 3 of the License, or                #
+# (at your option) any later version.                                              #
+#                                                                                  #
+# integron_finder is distributed in the hope that it will be useful,               #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of                   #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                    #
+# GNU General Public License for more details.                                     #
+#                                                                                  #
+# You should have received a copy of the GNU General Public License                #
+# along with this program (COPYING file).                                          #
+# If not, see <http://www.gnu.org/licenses/>.                                      #
+####################################################################################
+
+import os
+import shutil
+import hashlib
+import tempfile
+import functools
+import threading
+
+import colorlog
+
+_log = colorlog.getLogger(__name__)
+
+
+def file_digest(path):
+    """
+    :param str path: the path of a file
+    :return: the sha256 hexdigest of the file content
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def tool_version(path):
+    """
+    The version of an external tool (prodigal, hmmsearch, cmsearch).
+    If the version cannot be parsed, the digest of the binary is used instead.
+
+    :param str path: the path to the binary
+    :return: a string identifying the version of the tool
+    :rtype: str
+    """
+    from . import _eddy_version, _prodigal_version
+    try:
+        if os.path.basename(path).startswith('prodigal'):
+            version = _prodigal_version(path)
+        else:
+            version = _eddy_version(path)
+    except Exception:
+        version = ''
+    if not version:
+        version = file_digest(path)
+    return version
+
+
+class ResultCache:
+    """
+    Store the results of the external tools (prodigal, hmmsearch, cmsearch) between runs.
+    The results are addressed by a key computed from all the inputs of the tool
+    (sequence, model, tool version, options), so a result is reused only if it would be the same.
+    The size of the cache is bounded, the least recently used results are removed first.
+    The size of the cache is computed once, then kept up to date by :meth:`put`,
+    the cache is scanned again only when this estimate goes over the limit
+    (the results stored or evicted by concurrent runs are taken into account at this time).
+
+    Each entry is a directory *<cache_dir>/<key[:2]>/<key>* which contains the result files.
+    """
+
+    def __init__(self, cache_dir, max_size):
+        """
+        :param str cache_dir: the path to the cache directory, it is created if needed
+        :param int max_size: the maximum size of the cache in bytes
+        """
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._size = None  # estimation of the cache size, computed at the first put
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts):
+        """
+        :param parts: the values which identify a result
+        :type parts: str or bytes
+        :return: the key of the result
+        :rtype: str
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode()
+            # the length avoid collisions between ('ab', 'c') and ('a', 'bc')
+            digest.update(str(len(part)).encode() + b':' + part)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key, *dest_paths):
+        """
+        Copy the files of a cached result.
+
+        :param str key: the key of the result
+        :param str dest_paths: where to copy the files of the result,
+                               in the same order as they have been stored by :meth:`put`.
+                               The files which did not exist when the result was stored are not created.
+        :return: True if the result is in the cache and has been copied, False otherwise.
+        :rtype: bool
+        """
+        entry = self._entry_path(key)
+        files = []
+        for i, dest in enumerate(dest_paths):
+            cached = os.path.join(entry, str(i))
+            if os.path.exists(cached):
+                files.append((cached, dest))
+            elif not os.path.exists(cached + '.missing'):
+                return False
+        try:
+            for cached, dest in files:
+                shutil.copyfile(cached, dest)
+            # mark the entry as recently used
+            os.utime(entry)
+        except OSError as err:
+            # the entry may have been evicted by a concurrent run
+            _log.debug(f"cannot get {key} from cache: {err}")
+            return False
+        _log.debug(f"get {', '.join(dest_paths)} from cache {key}")
+        return True
+
+    def put(self, key, *src_paths):
+        """
+        Store the files of a result, then remove the least recently used results
+        if the estimated size of the cache is bigger than max_size.
+
+        :param str key: the key of the result
+        :param str src_paths: the files of the result, a file which does not exist
+                              (some outputs are not produced when there is no hit) is recorded as missing
+        """
+        entry = self._entry_path(key)
+        if os.path.exists(entry):
+            os.utime(entry)
+            return
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        # write in a temporary directory then rename it
+        # so a concurrent run never see a partial entry
+        tmp_entry = tempfile.mkdtemp(dir=os.path.dirname(entry), prefix='.tmp_')
+        entry_size = 0
+        try:
+            for i, src in enumerate(src_paths):
+                if os.path.exists(src):
+                    shutil.copyfile(src, os.path.join(tmp_entry, str(i)))
+                    entry_size += os.path.getsize(src)
+                else:
+                    open(os.path.join(tmp_entry, f"{i}.missing"), 'w').close()
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # the same result has been stored concurrently
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+        with self._lock:
+            if self._size is None:
+                # the new entry is already on disk
+                self._size = self.size()
+            else:
+                self._size += entry_size
+            if self._size > self.max_size:
+                self._size = self._evict()
+
+    def _entries(self):
+        """
+        :return: the entries with their last use time and their size
+        :rtype: list of tuple (float mtime, int size, str path)
+        """
+        entries = []
+        for prefix in os.scandir(self.cache_dir):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name.startswith('.tmp_') or not entry.is_dir():
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                except OSError:
+                    # evicted by a concurrent run
+                    continue
+        return entries
+
+    def size(self):
+        """
+        :return: the size of the cached results in bytes
+        :rtype: int
+        """
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        Remove the least recently used results until the cache size is lower than max_size.
+        """
+        with self._lock:
+            self._size = self._evict()
+
+    def _evict(self):
+        """
+        Scan the cache and remove the least recently used results until its size is lower than max_size.
+
+        :return: the size of the cache after the eviction
+        :rtype: int
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_size:
+            return total
+        for _, size, path in sorted(entries):
+            _log.debug(f"evict {path} from cache")
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            if total <= self.max_size:
+                break
+        return total
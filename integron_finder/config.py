@@ -27,10 +27,12 @@
 ####################################################################################
 
 import os
+import copy
 from importlib import resources as impresources
 import colorlog
 
 from . import utils
+from .cache import ResultCache
 
 _log = colorlog.getLogger(__name__)
 
@@ -42,6 +44,7 @@ class Config:
 
     def __init__(self, args):
         self._model_len = None  # model_len cache, because it's computation is "heavy" (open file)
+        self._result_cache = None  # the ResultCache is shared by all the searches of the run
         self._args = args
         self._prefix_data = impresources.files('integron_finder') / 'data'
         if  self._args.gembase or self._args.prot_file:
@@ -67,12 +70,82 @@ class Config:
                 raise RuntimeError(msg)
 
     def __getattr__(self, item):
+        if item == '_args' or item.startswith('__'):
+            # _args is not yet set when the object is unpickled (in worker processes)
+            # do not delegate to avoid an infinite recursion
+            raise AttributeError("config object has no attribute '{}'".format(item))
         try:
             attr = getattr(self._args, item)
             return attr
         except AttributeError:
             raise AttributeError("config object has no attribute '{}'".format(item))
 
+    @property
+    def keep_tmp(self):
+        """If True the intermediate files (hmmsearch text outputs, ...) are kept"""
+        return getattr(self._args, 'keep_tmp', False)
+
+    @property
+    def jobs(self):
+        """The number of replicons analysed concurrently"""
+        return max(1, getattr(self._args, 'jobs', 1) or 1)
+
+    @property
+    def attc_batch(self):
+        """:return: True if the attC sites of all replicons are searched with one cmsearch run"""
+        return getattr(self._args, 'attc_batch', False)
+
+    @property
+    def integrase_batch(self):
+        """:return: True if the integrases of all replicons are searched with one hmmsearch run"""
+        return getattr(self._args, 'integrase_batch', False)
+
+    @property
+    def prodigal_batch(self):
+        """:return: True if the proteins of all short replicons are predicted with one prodigal run"""
+        return getattr(self._args, 'prodigal_batch', False)
+
+    @property
+    def prodigal_prefetch(self):
+        """The number of replicons whose proteins are predicted in advance"""
+        return max(0, getattr(self._args, 'prodigal_prefetch', 0) or 0)
+
+    @property
+    def cache_dir(self):
+        """The directory where the results of the external tools are kept between runs, None if not set"""
+        return getattr(self._args, 'cache_dir', None)
+
+    @property
+    def cache_size(self):
+        """The maximum size of the cache in bytes"""
+        return int(getattr(self._args, 'cache_size', 2048) * 1024 * 1024)
+
+    @property
+    def result_cache(self):
+        """
+        The cache of the external tools results, None if --cache-dir is not set.
+
+        :rtype: :class:`integron_finder.cache.ResultCache` object or None
+        """
+        if not self.cache_dir:
+            return None
+        if self._result_cache is None:
+            self._result_cache = ResultCache(self.cache_dir, self.cache_size)
+        return self._result_cache
+
+    def job_config(self):
+        """
+        :return: a copy of this config where the *cpu* budget is split between the concurrent jobs.
+                 The config itself is returned if replicons are analysed one by one.
+        :rtype: :class:`Config` object
+        """
+        if self.jobs == 1:
+            return self
+        job_cfg = copy.copy(self)
+        job_cfg._args = copy.copy(self._args)
+        job_cfg._args.cpu = max(1, self._args.cpu // self.jobs)
+        return job_cfg
+
     @property
     def input_seq_path(self):
         """The absolute path to the input file"""
@@ -40,12 +40,17 @@ warnings.simplefilter('ignore', BiopythonExperimentalWarning)
 
 from Bio import SearchIO
 
+from .bank import is_bank, load_bank
+
 _log = colorlog.getLogger(__name__)
 
 
 def scan_hmm_bank(path):
     """
-    :param str path: - if the path is a dir:
+    :param str path: - if the path is a bank compiled with *integron_bank build*
+                       (the bank directory or its manifest):
+                       return the compiled hmm file
+                     - if the path is a dir:
                        return all files ending with .hmm in the dir
                      - if the path is a file:
                        parse the file, each line must be an expression (glob)
@@ -57,7 +62,9 @@ def scan_hmm_bank(path):
     real_path = os.path.realpath(path)
     files = []
     if os.path.exists(real_path):
-        if os.path.isdir(real_path):
+        if is_bank(real_path):
+            files = [load_bank(real_path)]
+        elif os.path.isdir(real_path):
             files = glob.glob(os.path.join(real_path, '*.hmm'))
             files.extend(glob.glob(os.path.join(real_path, '*.HMM')))
         elif os.path.isfile(real_path):
@@ -88,6 +95,120 @@ def scan_hmm_bank(path):
         raise IOError("{} no such file or directory".format(path))
 
 
+def domtblout_path(hmm_out):
+    """
+    :param str hmm_out: the path to the hmmsearch output (-o)
+    :return: the path of the per-domain tabular output (--domtblout) corresponding to hmm_out.
+             for instance: /path/to/ACBA.007.P01_13_intI.res => /path/to/ACBA.007.P01_13_intI_domtable.res
+    :rtype: str
+    """
+    root, ext = os.path.splitext(hmm_out)
+    return f"{root}_domtable{ext}"
+
+
+def scale_evalue(evalue, factor):
+    """
+    Rescale an E-value reported by a search to the E-value of a search with another search space size
+    (for instance a P-value reported by hmmsearch with *-Z 1* to the E-value of a search on *factor* sequences).
+
+    The E-values are printed with 2 significant digits in the tabular outputs of hmmsearch and cmsearch,
+    the unrounded value is not available. The rescaled E-value is rounded the same way,
+    so it can differ from the one reported by a search run directly with the other search space size
+    by the rounding of the reported E-value and of the rescaled one: at most 10%
+    (for instance 1e-10 instead of 1.1e-10). The hits themselves do not change.
+
+    :param float evalue: the E-value reported by the search
+    :param float factor: the ratio between the search space sizes
+    :return: the rescaled E-value, rounded to 2 significant digits
+    :rtype: float
+    """
+    return float(f"{evalue * factor:.2g}")
+
+
+def hmm_result_exists(hmm_out):
+    """
+    :param str hmm_out: the path to the hmmsearch output (-o)
+    :return: True if the hmmsearch output or the corresponding --domtblout output exists, False otherwise.
+    :rtype: bool
+    """
+    return os.path.isfile(hmm_out) or os.path.isfile(domtblout_path(hmm_out))
+
+
+def _is_domtblout(infile):
+    """
+    :param str infile: the path to a hmmsearch output
+    :return: True if infile is in per-domain tabular format (--domtblout), False otherwise
+    :rtype: bool
+    """
+    with open(infile) as hmm_file:
+        for line in hmm_file:
+            if not line.startswith('#'):
+                return False
+            elif line.startswith('# target name'):
+                return True
+    return False
+
+
+def _domtblout_hits(infile):
+    """
+    Parse hmmer --domtblout output and keep only the best domain of each hit.
+    The file is read line by line, the domains of a hit are consecutive.
+
+    :param str infile: the hmm output to parse
+    :return: a generator which yield for each hit a tuple with the following fields:
+             query_name, query accession, profile length, protein id, i-evalue, hmmfrom, hmmto
+    :rtype: generator of tuples
+    """
+    best_hit = None
+    with open(infile) as domtbl:
+        for line in domtbl:
+            if line.startswith('#'):
+                continue
+            # target name, target accession, tlen, query name, query accession, qlen,
+            # full seq E-value, score, bias, #, of, c-Evalue, i-Evalue, score, bias,
+            # hmm from, hmm to, ali from, ali to, env from, env to, acc, description of target
+            fields = line.split(maxsplit=22)
+            id_prot = fields[0]
+            query = fields[3]
+            i_evalue = float(fields[12])
+            if best_hit is not None and (best_hit[3], best_hit[0]) == (id_prot, query):
+                # keep the domain with the best i-evalue (the first one in case of ties)
+                if i_evalue < best_hit[4]:
+                    best_hit = (query, fields[4], int(fields[5]), id_prot, i_evalue, int(fields[15]), int(fields[16]))
+            else:
+                if best_hit is not None:
+                    yield best_hit
+                best_hit = (query, fields[4], int(fields[5]), id_prot, i_evalue, int(fields[15]), int(fields[16]))
+    if best_hit is not None:
+        yield best_hit
+
+
+def _hmmer3_text_hits(infile):
+    """
+    Parse hmmer --out output (hmmer3-text format) and keep only the best domain of each hit
+
+    :param str infile: the hmm output to parse
+    :return: a generator which yield for each hit a tuple with the following fields:
+             query_name, query accession, profile length, protein id, i-evalue, hmmfrom, hmmto
+    :rtype: generator of tuples
+    """
+    gen = SearchIO.parse(infile, 'hmmer3-text')
+    for query_result in gen:
+        len_profile = query_result.seq_len
+        query = query_result.id
+        try:
+            id_query = query_result.accession
+        except AttributeError:
+            id_query = "-"
+        for hit in query_result.hits:
+            if not hit.hsps:
+                _log.debug(f"{hit.id} does not contains any hsps. skip it.")
+                continue
+            # keep the domain with the best i-evalue (the first one in case of ties)
+            best_hsp = min(hit.hsps, key=lambda hsp: hsp.evalue)
+            yield query, id_query, len_profile, hit.id, best_hsp.evalue, best_hsp.query_start + 1, best_hsp.query_end
+
+
 def read_hmm(replicon_id, prot_db, infile, cfg, evalue=1., coverage=0.5):
     """
     Function that parse hmmer --out output and returns a pandas DataFrame
@@ -96,7 +217,9 @@ def read_hmm(replicon_id, prot_db, infile, cfg, evalue=1., coverage=0.5):
     :param str replicon_id: the id of the replicon
     :param prot_db: The protein database corresponding to the replicon translation
     :type prot_db: :class:`integron_finder.prot_db.ProteinDB` object.
-    :param str infile: the hmm output (in tabulated format) to parse
+    :param str infile: the hmm output to parse. if the per-domain tabular output corresponding to infile
+                       (see :func:`domtblout_path`) exists it is parsed instead of infile.
+                       infile can be also directly a --domtblout output.
     :param cfg: the config
     :type cfg: :class:`integron_finder.config.Config` object.
     :param float evalue: filter out hits with evalue greater tha evalue.
@@ -104,71 +227,58 @@ def read_hmm(replicon_id, prot_db, infile, cfg, evalue=1., coverage=0.5):
     :returns: data Frame with columns:
 
               | "Accession_number", "query_name", "ID_query", "ID_prot", "strand", "pos_beg", "pos_end", "evalue"
-              | each row correspond to a hit.
+              | each row correspond to a hit (the best domain of a protein for a query),
+              | the hits of all queries are kept, in the order of the output.
 
     :rtype: a :class:`pandas.DataFrame`
     """
-    df = pd.DataFrame(columns=["Accession_number", "query_name", "ID_query",
-                               "ID_prot", "strand", "pos_beg", "pos_end",
-                               "evalue", "hmmfrom", "hmmto", "alifrom",
-                               "alito", "len_profile"])
+    domtbl = domtblout_path(infile)
+    if os.path.isfile(domtbl):
+        infile = domtbl
     _log.debug("Parse {}".format(infile))
-    gen = SearchIO.parse(infile, 'hmmer3-text')
-    for idx, query_result in enumerate(gen):
-        len_profile = query_result.seq_len
-        query = query_result.id
+    if _is_domtblout(infile):
+        hits = _domtblout_hits(infile)
+    else:
+        hits = _hmmer3_text_hits(infile)
+    # the hits are accumulated column by column
+    # and the DataFrame is built once at the end
+    query_names = []
+    id_queries = []
+    len_profiles = []
+    id_prots = []
+    evalues = []
+    hmmfrom = []
+    hmmto = []
+    strands = []
+    pos_begs = []
+    pos_ends = []
+    for query, id_query, len_profile, id_prot, hit_evalue, hit_hmmfrom, hit_hmmto in hits:
+        _, strand, pos_beg, pos_end = prot_db.get_description(id_prot)
+        query_names.append(query)
+        id_queries.append(id_query)  # "-" remnant of ancient parsing function to keep data structure
+        len_profiles.append(len_profile)
+        id_prots.append(id_prot)
+        evalues.append(hit_evalue)  # i-evalue
+        hmmfrom.append(hit_hmmfrom)
+        hmmto.append(hit_hmmto)
+        strands.append(strand)
+        pos_begs.append(pos_beg)
+        pos_ends.append(pos_end)
 
-        try:
-            id_query = query_result.accession
-        except AttributeError:
-            id_query = "-"
-        for idx2, hit in enumerate(query_result.hits):
-            if not hit.hsps:
-                _log.debug(f"{hit.id} does not contains any hsps. skip it.")
-                continue
-            id_prot = hit.id
-
-            _, strand, pos_beg, pos_end = prot_db.get_description(hit.id)
-
-            evalue_tmp = []
-            hmmfrom = []
-            hmmto = []
-            alifrom = []
-            alito = []
-
-            for hsp in hit.hsps:
-                # strand = hsp.query_strand
-                evalue_tmp.append(hsp.evalue)
-                hmmfrom.append(hsp.query_start + 1)
-                hmmto.append(hsp.query_end)
-                alifrom.append(hsp.hit_start + 1)
-                alito.append(hsp.hit_end)
-
-            best_evalue = np.argmin(evalue_tmp)
-
-            df.loc[idx+idx2, "ID_prot"] = id_prot
-            df.loc[idx+idx2, "ID_query"] = id_query  # "-"  # remnant of ancient parsing function to keep data structure
-            df.loc[idx+idx2, "pos_beg"] = pos_beg
-            df.loc[idx+idx2, "pos_end"] = pos_end
-            df.loc[idx+idx2, "strand"] = strand
-            df.loc[idx+idx2, "evalue"] = evalue_tmp[best_evalue]   # i-evalue
-            df.loc[idx+idx2, "hmmfrom"] = hmmfrom[best_evalue]   # hmmfrom
-            df.loc[idx+idx2, "hmmto"] = hmmto[best_evalue]     # hmm to
-            df.loc[idx+idx2, "alifrom"] = alifrom[best_evalue]   # alifrom
-            df.loc[idx+idx2, "alito"] = alito[best_evalue]  # ali to
-            df.loc[idx+idx2, "len_profile"] = float(len_profile)
-            df.loc[idx+idx2, "Accession_number"] = replicon_id
-            df.loc[idx+idx2, "query_name"] = query
-
-    intcols = ["pos_beg", "pos_end", "strand"]
-    floatcol = ["evalue", "len_profile"]
-    df[intcols] = df[intcols].astype(int)
-    df[floatcol] = df[floatcol].astype(float)
-
-    df = df[(((df.hmmto - df.hmmfrom) / df.len_profile) > coverage) & (df.evalue < evalue)]
-    df.index = range(len(df))
-
-    df_out = df[["Accession_number", "query_name", "ID_query", "ID_prot",
-                 "strand", "pos_beg", "pos_end", "evalue"]]
+    evalues = np.array(evalues, dtype=float)
+    len_profiles = np.array(len_profiles, dtype=float)
+    hmm_cov = (np.array(hmmto, dtype=float) - np.array(hmmfrom, dtype=float)) / len_profiles
+    to_keep = (hmm_cov > coverage) & (evalues < evalue)
 
+    df_out = pd.DataFrame({"Accession_number": pd.Series([replicon_id] * len(id_prots), dtype=object),
+                           "query_name": pd.Series(query_names, dtype=object),
+                           "ID_query": pd.Series(id_queries, dtype=object),
+                           "ID_prot": pd.Series(id_prots, dtype=object),
+                           "strand": np.array(strands, dtype=int),
+                           "pos_beg": np.array(pos_begs, dtype=int),
+                           "pos_end": np.array(pos_ends, dtype=int),
+                           "evalue": evalues,
+                           })
+    df_out = df_out[to_keep]
+    df_out.index = range(len(df_out))
     return df_out
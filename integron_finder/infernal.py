@@ -28,11 +28,15 @@
 import os
 import subprocess
 import shlex
+from concurrent.futures import ThreadPoolExecutor
+
 import colorlog
+import numpy as np
 import pandas as pd
-from Bio import SeqIO
 
 from .utils import model_len
+from .cache import file_digest, tool_version
+from .hmm import scale_evalue
 
 _log = colorlog.getLogger(__name__)
 
@@ -65,56 +69,57 @@ def read_infernal(infile, replicon_id, replicon_size,
              "pos_end": "int",
              "evalue": "float",
              }
+    columns = ["Accession_number", "cm_attC", "cm_debut", "cm_fin", "pos_beg", "pos_end", "sens", "evalue"]
     try:
-        _ = pd.read_csv(infile, comment="#", sep="\t")
-    except Exception:
-        df = pd.DataFrame(columns=["Accession_number", "cm_attC", "cm_debut",
-                                   "cm_fin", "pos_beg", "pos_end", "sens", "evalue"])
+        # some line can have different number of columns due to difference in description
+        # we do not use these columns, so we must parse only cols we need
+        # Keep only columns: query_name(2), mdl from(5), mdl to(6), seq from(7),
+        # seq to(8), strand(9), E-value(15)
+        # the C engine parses the file in one pass, the extra fields of the description are ignored
+        df = pd.read_csv(infile, sep=r"\s+", engine="c", header=None,
+                         comment='#',
+                         usecols=[2, 5, 6, 7, 8, 9, 15],
+                         names=["cm_attC", "cm_debut", "cm_fin", "pos_beg_tmp", "pos_end_tmp", "sens", "evalue"])
+    except (OSError, pd.errors.EmptyDataError):
+        df = pd.DataFrame(columns=columns)
         return df.astype(dtype)
-
-    df = pd.read_csv(infile, sep="\\s+", engine="python",  header=None,
-                     comment='#',
-                     usecols=[2, 5, 6, 7, 8, 9, 15])
-    # some line can have different number of columns due to difference in description
-    # we do not use these columns, so we must parse only cols we need
-    # Keep only columns: query_name(2), mdl from(5), mdl to(6), seq from(7),
-    # seq to(8), strand(9), E-value(15)
-    df.columns = ["cm_attC", "cm_debut", "cm_fin", "pos_beg_tmp", "pos_end_tmp", "sens", "evalue"]
-    df["Accession_number"] = replicon_id
     _log.debug(f"Before filtering on evalue {evalue}, there were {len(df)} attC sites")
     df = df[df.evalue < evalue]  # filter on evalue
     _log.debug(f"After filtering on evalue {evalue}, there are now {len(df)} attC sites")
-    df = df[(abs(df.pos_end_tmp - df.pos_beg_tmp) < size_max_attc) &
-            (size_min_attc < abs(df.pos_end_tmp - df.pos_beg_tmp))]
+    size = (df.pos_end_tmp - df.pos_beg_tmp).abs()
+    df = df[(size < size_max_attc) & (size_min_attc < size)]
     _log.debug(f"After filtering on size max: {size_max_attc} and size min: {size_min_attc}, "
                f"there are now {len(df)} attC sites")
-    if not df.empty:
-        df.sort_values(['pos_end_tmp', 'evalue'], inplace=True)
-        df.index = list(range(0, len(df)))
-        idx = (df.pos_beg_tmp > df.pos_end_tmp)
-        df.loc[idx, "pos_beg"] = df.loc[idx].apply(lambda x: max(x["pos_end_tmp"] - (len_model_attc - x["cm_fin"]),
-                                                                 1),
-                                                   axis=1)
-        df.loc[idx, "pos_end"] = df.loc[idx].apply(lambda x: min(x["pos_beg_tmp"] + (x["cm_debut"] - 1),
-                                                                 replicon_size),
-                                                   axis=1)
-
-        df.loc[~idx, "pos_beg"] = df.loc[~idx].apply(lambda x: max(x["pos_beg_tmp"] - (x["cm_debut"] - 1),
-                                                                   1),
-                                                     axis=1)
-        df.loc[~idx, "pos_end"] = df.loc[~idx].apply(lambda x: min(x["pos_end_tmp"] + (len_model_attc - x["cm_fin"]),
-                                                                   replicon_size),
-                                                     axis=1)
-
-        df = df[["Accession_number", "cm_attC", "cm_debut", "cm_fin", "pos_beg", "pos_end", "sens", "evalue"]]
-        df["cm_attC"] = df["cm_attC"].str.lower()
-    else:
-        df = pd.DataFrame(columns=["Accession_number", "cm_attC", "cm_debut",
-                                     "cm_fin", "pos_beg", "pos_end", "sens", "evalue"])
+    if df.empty:
+        df = pd.DataFrame(columns=columns)
+        return df.astype(dtype)
+
+    df = df.sort_values(['pos_end_tmp', 'evalue']).reset_index(drop=True)
+    beg_tmp = df.pos_beg_tmp.to_numpy()
+    end_tmp = df.pos_end_tmp.to_numpy()
+    cm_debut = df.cm_debut.to_numpy()
+    cm_fin = df.cm_fin.to_numpy()
+    # on the reverse strand cmsearch reports seq from > seq to
+    reverse = beg_tmp > end_tmp
+    pos_beg = np.where(reverse,
+                       end_tmp - (len_model_attc - cm_fin),
+                       beg_tmp - (cm_debut - 1))
+    pos_end = np.where(reverse,
+                       beg_tmp + (cm_debut - 1),
+                       end_tmp + (len_model_attc - cm_fin))
+    df = pd.DataFrame({"Accession_number": replicon_id,
+                       "cm_attC": df.cm_attC.str.lower(),
+                       "cm_debut": cm_debut,
+                       "cm_fin": cm_fin,
+                       "pos_beg": np.clip(pos_beg, 1, None),
+                       "pos_end": np.clip(pos_end, None, replicon_size),
+                       "sens": df.sens,
+                       "evalue": df.evalue},
+                      columns=columns)
     return df.astype(dtype)
 
 
-def find_attc(replicon_path, replicon_id, cmsearch_path, out_dir, model_attc, incE=1., cpu=1):
+def find_attc(replicon_path, replicon_id, cmsearch_path, out_dir, model_attc, incE=1., cpu=1, cache=None):
     """
     Call cmsearch to find attC sites in a single replicon.
 
@@ -125,17 +130,23 @@ def find_attc(replicon_path, replicon_id, cmsearch_path, out_dir, model_attc, in
     :param str model_attc: path to the attc model (Covariance Matrix).
     :param float incE: consider sequences <= this E-value threshold as significant (to get the alignment with -A)
     :param int cpu: the number of cpu used by cmsearch.
+    :param cache: the cache of the results of previous runs
+    :type cache: :class:`integron_finder.cache.ResultCache` object or None
     :returns: None, the results are written on the disk.
     :raises RuntimeError: when cmsearch run failed.
     """
+    out_path = os.path.join(out_dir, replicon_id + "_attc.res")
+    tblout_path = os.path.join(out_dir, replicon_id + "_attc_table.res")
+    if cache:
+        cache_key = cache.key('cmsearch', tool_version(cmsearch_path), file_digest(model_attc), str(incE),
+                              file_digest(replicon_path))
+        if cache.get(cache_key, tblout_path, out_path):
+            return
     cmsearch_cmd = '{cmsearch} --cpu {cpu} -A {out} --tblout {tblout_path} ' \
                    '-E 10 --incE {incE} {mod_attc} {infile}'.format(cmsearch=cmsearch_path.replace(' ', '\\ '),
                                                                     cpu=cpu,
-                                                                    out=os.path.join(out_dir,
-                                                                                     replicon_id + "_attc.res").replace(' ', '\\ '),
-                                                                    tblout_path=os.path.join(out_dir,
-                                                                                             replicon_id +
-                                                                                             "_attc_table.res").replace(' ', '\\ '),
+                                                                    out=out_path.replace(' ', '\\ '),
+                                                                    tblout_path=tblout_path.replace(' ', '\\ '),
                                                                     incE=incE,
                                                                     mod_attc=model_attc.replace(' ', '\\ '),
                                                                     infile=replicon_path.replace(' ', '\\ '))
@@ -148,6 +159,62 @@ def find_attc(replicon_path, replicon_id, cmsearch_path, out_dir, model_attc, in
         raise RuntimeError(f"{' '.join(cmd)} failed : {err}")
     if completed_process.returncode != 0:
         raise RuntimeError(f"{' '.join(cmd)} failed returncode = {completed_process.returncode}")
+    if cache:
+        cache.put(cache_key, tblout_path, out_path)
+
+
+def find_attc_batch(seq_path, replicons_size, seq_size, cmsearch_path, out_dirs, model_attc, tblout_path,
+                    cpu=1, cache=None):
+    """
+    Call cmsearch once to find the attC sites of all replicons of a multi fasta file.
+    The results are split in one file per replicon, *<out_dir>/<replicon_id>_attc_table.res*,
+    as those written by :func:`find_attc` for each replicon.
+
+    The E-values depend on the search space size, here the whole file.
+    They are rescaled to the length of each replicon to be the E-values of a search on the replicon alone.
+    As cmsearch prints the E-values rounded, they can differ slightly (see :func:`integron_finder.hmm.scale_evalue`)
+    from those of :func:`find_attc`.
+    The reporting threshold (-E) is raised by the same factor, and the filters are set
+    for the search space of the smallest replicon (--FZ) to not lose hits found by a search on each replicon.
+
+    :param str seq_path: the path of the multi fasta file.
+    :param dict replicons_size: the length of the replicons to analyse {str replicon_id: int length}
+    :param int seq_size: the total length of the sequences of seq_path (even those which are not analysed)
+    :param str cmsearch_path: the path to the cmsearch executable.
+    :param dict out_dirs: the directory where to write the results of each replicon {str replicon_id: str path}
+    :param str model_attc: path to the attc model (Covariance Matrix).
+    :param str tblout_path: the path to the cmsearch --tblout output for the whole file.
+    :param int cpu: the number of cpu used by cmsearch.
+    :param cache: the cache of the results of previous runs
+    :type cache: :class:`integron_finder.cache.ResultCache` object or None
+    :returns: None, the results are written on the disk.
+    :raises RuntimeError: when cmsearch run failed.
+    """
+    max_evalue = 10
+    scale = {rep_id: size / seq_size for rep_id, size in replicons_size.items()}
+    min_size = min(replicons_size.values())
+    # search space of the smallest replicon in Mb (both strands)
+    filter_z = 2 * min_size / 1e6
+    report_evalue = max_evalue * seq_size / min_size
+    if cache:
+        cache_key = cache.key('cmsearch batch', tool_version(cmsearch_path), file_digest(model_attc),
+                              str(filter_z), str(report_evalue), file_digest(seq_path))
+    if not (cache and cache.get(cache_key, tblout_path)):
+        cmd = [cmsearch_path, '--cpu', str(cpu), '--tblout', tblout_path,
+               '-E', str(report_evalue), '--FZ', str(filter_z), model_attc, seq_path]
+        try:
+            _log.debug(f"run cmsearch: {' '.join(cmd)}")
+            with open(os.devnull, 'w') as dev_null:
+                completed_process = subprocess.run(cmd, stdout=dev_null)
+        except Exception as err:
+            raise RuntimeError(f"{' '.join(cmd)} failed : {err}")
+        if completed_process.returncode != 0:
+            raise RuntimeError(f"{' '.join(cmd)} failed returncode = {completed_process.returncode}")
+        if cache:
+            cache.put(cache_key, tblout_path)
+    targets_tblout = {rep_id: os.path.join(out_dirs[rep_id], rep_id + "_attc_table.res")
+                      for rep_id in replicons_size}
+    _split_tblout(tblout_path, targets_tblout, evalue_scale=scale, max_evalue=max_evalue)
 
 
 def local_max(replicon,
@@ -155,7 +222,7 @@ def local_max(replicon,
               model_attc_path,
               strand_search="both",
               evalue_attc=1., max_attc_size=200, min_attc_size=40,
-              cmsearch_bin='cmsearch', out_dir='.', cpu=1):
+              cmsearch_bin='cmsearch', out_dir='.', cpu=1, cache=None, keep_tmp=False, table_end=None):
     """
     :param replicon: The replicon to analyse
     :type replicon: :class:`Bio.Seq.SeqRecord` object.
@@ -176,6 +243,11 @@ def local_max(replicon,
     :param str cmsearch_bin: The path to cmsearch
     :param str out_dir: The path to directory where to write results
     :param int cpu: The number of cpu used by cmsearch
+    :param cache: the cache of the windows searched in previous runs
+    :type cache: :class:`integron_finder.cache.ResultCache` object or None
+    :param bool keep_tmp: write the searched sequence and the alignments in out_dir
+    :param list table_end: if set, the intermediate results are appended to this list
+                           instead of being written in <replicon_id>_subseq_attc_table_end.res
     :return: DataFrame with same structure as the DataFrame returns by :func:`read_infernal`
              where position are converted on position on replicon and attc are filtered
              by evalue, min_attc_size, max_attc_size
@@ -183,7 +255,167 @@ def local_max(replicon,
              this file store the local_max results before filtering by max_attc_size and min_attc_size
     :rtype: :class:`pandas.DataFrame` object
     """
-    replicon_size = len(replicon)
+    return local_max_batch(replicon, [(window_beg, window_end, strand_search)], model_attc_path,
+                           evalue_attc=evalue_attc, max_attc_size=max_attc_size, min_attc_size=min_attc_size,
+                           cmsearch_bin=cmsearch_bin, out_dir=out_dir, cpu=cpu, cache=cache,
+                           keep_tmp=keep_tmp, table_end=table_end)[0]
+
+
+def local_max_batch(replicon, windows, model_attc_path,
+                    evalue_attc=1., max_attc_size=200, min_attc_size=40,
+                    cmsearch_bin='cmsearch', out_dir='.', cpu=1, cache=None, keep_tmp=False, table_end=None):
+    """
+    Search attC sites with cmsearch --max in several windows of the same replicon.
+    All windows to search on the same strand(s) are written in one multi-fasta file
+    and searched with a single cmsearch call, the hits are mapped back to each window.
+    The cmsearch calls for the different strands are run concurrently, the cpu are shared between them.
+    The search space size (-Z) is the replicon size, so the evalues are the same as with :func:`local_max`.
+
+    :param replicon: The replicon to analyse
+    :type replicon: :class:`Bio.Seq.SeqRecord` object.
+    :param windows: The windows to search, each window is a tuple (window_beg, window_end, strand_search)
+                    see :func:`local_max` for the meaning of each value.
+    :type windows: list of tuple (int, int, str)
+    :param str model_attc_path: The path to the covariance model for attc (eg: attc_4.cm)
+                                used by cmsearch to find attC sites
+    :param float evalue_attc: evalue threshold to filter out hits above it
+    :param int max_attc_size: The maximum value fot the attC size
+    :param int min_attc_size: The minimum value fot the attC size
+    :param str cmsearch_bin: The path to cmsearch
+    :param str out_dir: The path to directory where to write results
+    :param int cpu: The number of cpu used by all cmsearch calls
+    :param cache: the cache of the windows searched in previous runs
+    :type cache: :class:`integron_finder.cache.ResultCache` object or None
+    :param bool keep_tmp: write the searched sequences and the alignments in out_dir
+    :param list table_end: if set, the intermediate results of the windows are appended to this list
+                           instead of being written in <replicon_id>_subseq_attc_table_end.res
+    :return: for each window (in the same order as windows) a DataFrame as returned by :func:`local_max`
+    :rtype: list of :class:`pandas.DataFrame` objects
+    """
+    # the same window can be asked several times, it is searched only once
+    # the windows already searched in a previous run are get from the cache
+    strand_windows = {}
+    tblouts = {}
+    cache_keys = {}
+    subseqs = {}
+    if cache:
+        cache_prefix = ('cmsearch --max', tool_version(cmsearch_bin), file_digest(model_attc_path),
+                        str(len(replicon)), str(evalue_attc))
+    for window in windows:
+        if window in tblouts:
+            continue
+        window_beg, window_end, strand_search = window
+        tblouts[window] = os.path.join(out_dir, f"{replicon.id}_{window_beg}_{window_end}_subseq_attc_table.res")
+        subseqs[window] = _subseq(replicon, window_beg, window_end)
+        if cache:
+            cache_keys[window] = cache.key(*cache_prefix, strand_search, str(subseqs[window].seq))
+            if cache.get(cache_keys[window], tblouts[window]):
+                continue
+        strand_windows.setdefault(strand_search, []).append((window_beg, window_end))
+
+    # one cmsearch call by strand mode, the calls are run concurrently
+    # the cpu are shared between the concurrent calls
+    # the sequences are given to cmsearch through its standard input, they are written on disk
+    # only to keep the intermediate files
+    searches = []
+    for strand_search, wins in strand_windows.items():
+        if len(wins) == 1:
+            window_beg, window_end = wins[0]
+            name = f"{replicon.id}_{window_beg}_{window_end}"
+            tblout_path = tblouts[(window_beg, window_end, strand_search)]
+            win_subseqs = [subseqs[(window_beg, window_end, strand_search)]]
+            win_tblouts = None
+        else:
+            name = f"{replicon.id}_batch_{strand_search}_{wins[0][0]}_{wins[0][1]}"
+            tblout_path = os.path.join(out_dir, name + "_subseq_attc_table.res")
+            win_subseqs = []
+            win_tblouts = {}
+            for window_beg, window_end in wins:
+                subseq = subseqs[(window_beg, window_end, strand_search)]
+                # the target name allow to map the hits on the right window
+                subseq.id = f"{replicon.id}_{window_beg}_{window_end}"
+                subseq.description = ''
+                win_subseqs.append(subseq)
+                win_tblouts[subseq.id] = tblouts[(window_beg, window_end, strand_search)]
+        if keep_tmp:
+            infile_path = os.path.join(out_dir, name + "_subseq.fst")
+            output_path = os.path.join(out_dir, name + "_subseq_attc.res")
+        else:
+            infile_path = output_path = None
+        searches.append((win_subseqs, tblout_path, strand_search, infile_path, output_path, win_tblouts))
+
+    workers = max(1, min(len(searches), cpu))
+    cmsearch_cpu = max(1, cpu // workers)
+
+    def search(win_subseqs, tblout_path, strand_search, infile_path, output_path, win_tblouts):
+        _cmsearch_max(win_subseqs, tblout_path, len(replicon), strand_search,
+                      model_attc_path, evalue_attc=evalue_attc, cmsearch_bin=cmsearch_bin, cpu=cmsearch_cpu,
+                      infile_path=infile_path, output_path=output_path)
+        if win_tblouts is not None:
+            _split_tblout(tblout_path, win_tblouts)
+
+    if workers == 1:
+        for args in searches:
+            search(*args)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # list to raise the first error (in searches order) if any
+            list(executor.map(lambda args: search(*args), searches))
+
+    if cache:
+        for strand_search, wins in strand_windows.items():
+            for window_beg, window_end in wins:
+                window = (window_beg, window_end, strand_search)
+                cache.put(cache_keys[window], tblouts[window])
+
+    # the hits before the size filter are written once, in the windows order,
+    # when all the searches are over
+    results = {}
+    window_hits = []
+    for window in windows:
+        if window not in results:
+            window_beg, window_end, _ = window
+            df_max = _window_hits(replicon, window_beg, window_end, tblouts[window], model_attc_path,
+                                  evalue_attc=evalue_attc,
+                                  max_attc_size=max_attc_size,
+                                  min_attc_size=min_attc_size)
+            window_hits.append(df_max)
+            # filter on size
+            results[window] = df_max[(abs(df_max.pos_end - df_max.pos_beg) > min_attc_size) &
+                                     (abs(df_max.pos_end - df_max.pos_beg) < max_attc_size)]
+    if table_end is None:
+        _write_table_end(window_hits, os.path.join(out_dir, replicon.id + "_subseq_attc_table_end.res"))
+    else:
+        table_end.extend(window_hits)
+    return [results[window] for window in windows]
+
+
+def _write_table_end(window_hits, table_end_path):
+    """
+    Append the local_max results before the filter on the attC size to the intermediate results file.
+
+    :param window_hits: the hits of each window, as returned by :func:`_window_hits`
+    :type window_hits: list of :class:`pandas.DataFrame` objects
+    :param str table_end_path: the path to the intermediate results file <replicon_id>_subseq_attc_table_end.res
+    """
+    if not window_hits:
+        return
+    to_concat = [df_max for df_max in window_hits if not df_max.empty]
+    # the file is created even if there is no hit
+    df_max = pd.concat(to_concat) if to_concat else window_hits[0]
+    df_max.to_csv(table_end_path, sep="\t", index=0, mode="a", header=0)
+
+
+def _subseq(replicon, window_beg, window_end):
+    """
+    :param replicon: The replicon to analyse
+    :type replicon: :class:`Bio.Seq.SeqRecord` object.
+    :param int window_beg: Start of window
+    :param int window_end: End of window
+    :return: the sequence of the replicon between window_beg and window_end
+             if window_end < window_beg the window overlap the replicon origin.
+    :rtype: :class:`Bio.Seq.SeqRecord` object.
+    """
     if window_beg < window_end:
         subseq = replicon[window_beg:window_end]
     else:
@@ -191,39 +423,121 @@ def local_max(replicon,
         subseq1 = replicon[window_beg:]
         subseq2 = replicon[:window_end]
         subseq = subseq1 + subseq2
+    return subseq
 
-    infile_path = os.path.join(out_dir, replicon.id + "_subseq.fst")
-    with open(infile_path, "w") as f:
-        SeqIO.write(subseq, f, "fasta")
-
-    output_path = os.path.join(out_dir, "{name}_{win_beg}_{win_end}_subseq_attc.res".format(name=replicon.id,
-                                                                                            win_beg=window_beg,
-                                                                                            win_end=window_end))
-    tblout_path = os.path.join(out_dir, "{name}_{win_beg}_{win_end}_subseq_attc_table.res".format(name=replicon.id,
-                                                                                                  win_beg=window_beg,
-                                                                                                  win_end=window_end))
 
+def _cmsearch_max(subseqs, tblout_path, replicon_size, strand_search, model_attc_path,
+                  evalue_attc=1., cmsearch_bin='cmsearch', cpu=1, infile_path=None, output_path=None):
+    """
+    Run cmsearch with --max option.
+    The sequences are given to cmsearch through its standard input,
+    unless infile_path is set, then they are written in this file (to keep the intermediate files).
+
+    :param subseqs: the sequences to search in
+    :type subseqs: list of :class:`Bio.SeqRecord` objects
+    :param str tblout_path: the path to the tabular output (--tblout)
+    :param int replicon_size: the size of the whole replicon, used to compute the search space size
+    :param str strand_search: The strand on which to looking for attc 'top', 'bottom' or 'both'
+    :param str model_attc_path: The path to the covariance model for attc
+    :param float evalue_attc: the evalue threshold to consider the hits as significant
+    :param str cmsearch_bin: The path to cmsearch
+    :param int cpu: The number of cpu used by cmsearch
+    :param str infile_path: the path of the fasta file to write the sequences in, None to not write them.
+    :param str output_path: the path to the alignments output (-A), None to not produce the alignments.
+    :raises RuntimeError: when cmsearch run failed.
+    """
+    fasta = ''.join(subseq.format('fasta') for subseq in subseqs)
+    if infile_path:
+        with open(infile_path, 'w') as infile:
+            infile.write(fasta)
     cmsearch_cmd = \
-        '{bin} -Z {size} {strand} --max --cpu {cpu} -A {out} --tblout {tblout} -E 10 ' \
+        '{bin} -Z {size} {strand} --max --cpu {cpu} {out}--tblout {tblout} -E 10 ' \
         '--incE {incE} {mod_attc_path} {infile}'.format(bin=cmsearch_bin.replace(' ', '\\ '),
                                                         size=replicon_size / 1000000.,  # search space size in *Mb*
                                                         strand={"both": "",
                                                                 "top": "--toponly",
                                                                 "bottom": "--bottomonly"}[strand_search],
                                                         cpu=cpu,
-                                                        out=output_path.replace(' ', '\\ '),
+                                                        out="-A " + output_path.replace(' ', '\\ ') + " " if output_path else '',
                                                         tblout=tblout_path.replace(' ', '\\ '),
                                                         incE=evalue_attc,
                                                         mod_attc_path=model_attc_path.replace(' ', '\\ '),
-                                                        infile=infile_path.replace(' ', '\\ '))
+                                                        # cmsearch read the sequences on stdin
+                                                        infile=infile_path.replace(' ', '\\ ') if infile_path else '-')
     try:
         _log.debug("run cmsearch: {}".format(cmsearch_cmd))
         with open(os.devnull, 'w') as dev_null:
-            completed_process = subprocess.run(shlex.split(cmsearch_cmd), stdout=dev_null)
+            if infile_path:
+                completed_process = subprocess.run(shlex.split(cmsearch_cmd), stdout=dev_null)
+            else:
+                completed_process = subprocess.run(shlex.split(cmsearch_cmd), stdout=dev_null,
+                                                   input=fasta, text=True)
     except Exception as err:
         raise RuntimeError(f"{cmsearch_cmd} failed : {err}")
     if completed_process.returncode != 0:
         raise RuntimeError(f"{cmsearch_cmd} failed returncode = {completed_process.returncode}")
+
+
+def _split_tblout(tblout_path, targets_tblout, evalue_scale=None, max_evalue=None):
+    """
+    Split a cmsearch tabular output on several files, one by target.
+    The comment lines are copied in each file.
+    The hits on targets which are not in targets_tblout are ignored.
+
+    :param str tblout_path: the path to the cmsearch --tblout output
+    :param dict targets_tblout: the path of the output for each target name
+    :param dict evalue_scale: the factor to apply to the E-values of the hits of each target name
+    :param float max_evalue: the hits with a (rescaled) E-value above this threshold are removed
+    """
+    header = []
+    footer = []
+    comments = header
+    target_hits = {target: [] for target in targets_tblout}
+    with open(tblout_path) as tblout:
+        for line in tblout:
+            if line.startswith('#'):
+                # the comments before the first hit are the header (columns names)
+                # those after are the footer (program, command line, ...)
+                comments.append(line)
+                continue
+            comments = footer
+            target = line.split(maxsplit=1)[0]
+            if target not in target_hits:
+                continue
+            if evalue_scale is not None:
+                fields = line.split()
+                # E-value is the 16th column
+                evalue = scale_evalue(float(fields[15]), evalue_scale[target])
+                if max_evalue is not None and evalue > max_evalue:
+                    continue
+                fields[15] = f"{evalue:.2g}"
+                line = ' '.join(fields) + '\n'
+            target_hits[target].append(line)
+    for target, path in targets_tblout.items():
+        with open(path, 'w') as target_tblout:
+            target_tblout.writelines(header)
+            target_tblout.writelines(target_hits[target])
+            target_tblout.writelines(footer)
+
+
+def _window_hits(replicon, window_beg, window_end, tblout_path, model_attc_path,
+                 evalue_attc=1., max_attc_size=200, min_attc_size=40):
+    """
+    Parse the cmsearch results of a window and convert the positions on the replicon
+
+    :param replicon: The replicon to analyse
+    :type replicon: :class:`Bio.Seq.SeqRecord` object.
+    :param int window_beg: Start of the searched window
+    :param int window_end: End of the searched window
+    :param str tblout_path: the cmsearch tabular output corresponding to the window
+    :param str model_attc_path: The path to the covariance model for attc
+    :param float evalue_attc: evalue threshold to filter out hits above it
+    :param int max_attc_size: The maximum value fot the attC size
+    :param int min_attc_size: The minimum value fot the attC size
+    :return: the hits of the window, before the filter on the attC size
+    :rtype: :class:`pandas.DataFrame` object
+    """
+    replicon_size = len(replicon)
     df_max = read_infernal(tblout_path,
                            replicon.id,
                            replicon_size,
@@ -246,11 +560,6 @@ def local_max(replicon,
     else:
         df_max.pos_beg = (df_max.pos_beg + window_beg).clip(lower=0, upper=replicon_size)
         df_max.pos_end = (df_max.pos_end + window_beg).clip(lower=0, upper=replicon_size)
-    df_max.to_csv(os.path.join(out_dir, replicon.id + "_subseq_attc_table_end.res"),
-                  sep="\t", index=0, mode="a", header=0)
-    # filter on size
-    df_max = df_max[(abs(df_max.pos_end - df_max.pos_beg) > min_attc_size) &
-                    (abs(df_max.pos_end - df_max.pos_beg) < max_attc_size)]
     return df_max
 
 
@@ -259,7 +568,7 @@ def expand(replicon,
            circular, dist_threshold, model_attc_path,
            max_attc_size=200, min_attc_size=40, evalue_attc=1.,
            search_left=False, search_right=False,
-           out_dir='.', cpu=1, cmsearch_bin='cmsearch'):
+           out_dir='.', cpu=1, cmsearch_bin='cmsearch', cache=None, keep_tmp=False):
     """
     for a given element, we can search on the left hand side (if integrase is on the right for instance)
     or right hand side (opposite situation) or both side (only integrase or only attC sites)
@@ -276,14 +585,6 @@ def expand(replicon,
         and each row is an occurrence of attc site
 
     :type max_elt: :class:`pandas.DataFrame` object
-    :param df_max: DataFrame with columns
-        ::
-
-            Accession_number cm_attC  cm_debut  cm_fin   pos_beg   pos_end sens   evalue
-
-        and each row is an occurrence of attc site
-
-    :type df_max: :class:`pandas.DataFrame` object
     :param bool circular: True if replicon topology is circular otherwise False.
     :param int dist_threshold: Two elements are aggregated if they are distant of dist_threshold [4kb] or less
     :param int max_attc_size: The maximum value for the attC size
@@ -295,120 +596,245 @@ def expand(replicon,
     :param str out_dir: The path to directory where to write results
     :param int cpu: the number of cpu use by expand
     :param str cmsearch_bin: the path to the `cmsearch` binary to use
+    :param cache: the cache of the windows searched in previous runs
+    :type cache: :class:`integron_finder.cache.ResultCache` object or None
+    :param bool keep_tmp: write the searched sequences and the alignments in out_dir
     :return: a copy of max_elt with attC hits
     :rtype: :class:`pandas.DataFrame` object
 
     """
-    replicon_size = len(replicon)
+    search = expand_search(replicon,
+                           window_beg, window_end, max_elt,
+                           circular, dist_threshold,
+                           max_attc_size=max_attc_size,
+                           search_left=search_left, search_right=search_right)
+    return run_search(search,
+                      lambda win_beg, win_end, strand, cpu, table_end: local_max(replicon,
+                                                                                 win_beg, win_end,
+                                                                                 model_attc_path,
+                                                                                 max_attc_size=max_attc_size,
+                                                                                 min_attc_size=min_attc_size,
+                                                                                 strand_search=strand,
+                                                                                 out_dir=out_dir,
+                                                                                 cpu=cpu,
+                                                                                 evalue_attc=evalue_attc,
+                                                                                 cmsearch_bin=cmsearch_bin,
+                                                                                 cache=cache,
+                                                                                 keep_tmp=keep_tmp,
+                                                                                 table_end=table_end),
+                      cpu=cpu,
+                      table_end_path=os.path.join(out_dir, replicon.id + "_subseq_attc_table_end.res")
+                      )
+
+
+def run_search(search, local_max_func, cpu=1, table_end_path=None):
+    """
+    Run a search (see :func:`expand_search`).
+    The windows yielded together by the search are searched concurrently, the cpu are shared between them.
+
+    :param search: the search to run
+    :type search: generator
+    :param local_max_func: the function called to search a window,
+                           it takes window_beg, window_end, strand_search, cpu, table_end as arguments
+                           and return a DataFrame as :func:`local_max`.
+                           The intermediate results of the window must be appended to the list table_end.
+    :type local_max_func: callable
+    :param int cpu: the number of cpu to use
+    :param str table_end_path: the path to the file where to write the intermediate results,
+                               they are written by the calling thread in the windows order,
+                               once the windows searched concurrently are over.
+                               If None the intermediate results are not written.
+    :return: the value returned by the search
+    """
+    try:
+        windows = next(search)
+        while True:
+            workers = max(1, min(len(windows), cpu))
+            tables_end = [[] for _ in windows]
+            if workers == 1:
+                dfs_max = [local_max_func(*window, cpu, table_end) for window, table_end in zip(windows, tables_end)]
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    dfs_max = list(executor.map(lambda window, table_end: local_max_func(*window, cpu // workers,
+                                                                                         table_end),
+                                                windows, tables_end))
+            if table_end_path:
+                _write_table_end([df for table_end in tables_end for df in table_end], table_end_path)
+            windows = search.send(dfs_max)
+    except StopIteration as stop:
+        return stop.value
+
+
+def expand_search(replicon,
+                  window_beg, window_end, max_elt,
+                  circular, dist_threshold,
+                  max_attc_size=200,
+                  search_left=False, search_right=False):
+    """
+    The window by window search performed by :func:`expand`.
+    The search does not run cmsearch itself, it yields the windows to search
+    and must receive the corresponding local_max results, so the searches can be
+    batched (see :func:`local_max_batch`) or run by :func:`run_search`.
+    The expansions on the right and on the left are independent, so at each step the search yields
+    the next window of each side. The hits are merged in the same order as if the right expansion
+    was done before the left one.
+
+    :param replicon: The Replicon to annotate
+    :type replicon: a :class:`Bio.Seq.SeqRecord` object.
+    :param int window_beg: start of window to search for attc (position of protein)
+    :param int window_end: end of window to search for attc (position of protein)
+    :param max_elt: the attC sites already found (see :func:`expand`)
+    :type max_elt: :class:`pandas.DataFrame` object
+    :param bool circular: True if replicon topology is circular otherwise False.
+    :param int dist_threshold: Two elements are aggregated if they are distant of dist_threshold [4kb] or less
+    :param int max_attc_size: The maximum value for the attC size
+    :param bool search_left: trigger the local_max search on the left of the already detected element
+    :param bool search_right: trigger the local_max search on the right of the already detected element
+    :return: a generator which yield lists of tuples (window_beg, window_end, strand_search) and must be sent
+             the list of the local_max results of these windows. When the search is over
+             the generator return a copy of max_elt with attC hits (as :func:`expand`)
+    :rtype: generator
+    """
     # for a given element, we can search on the left hand side of it
     # (if the integrase is on the right and attC sites on the left for instance),
     # on the right hand side of it (opposite situation), or on both sides (only integrase or only attC sites)
+    sides = []
+    if search_right:
+        # search on both strands if search in both directions
+        sides.append(_expand_right(replicon, window_beg, window_end, circular, dist_threshold, max_attc_size,
+                                   "both" if search_left else "top"))
+    if search_left:
+        sides.append(_expand_left(replicon, window_beg, window_end, circular, dist_threshold, max_attc_size,
+                                  "both" if search_right else "bottom"))
+    # on circular replicon, when searching in both directions the right search can loop all over the replicon,
+    # then the left search is useless. So in this case the left search starts once the right one is over.
+    concurrent = not (circular and search_left and search_right)
+    windows = {}
+    hits = {}
+    for side in (sides if concurrent else sides[:1]):
+        windows[side] = next(side)
+    while windows:
+        running = [side for side in sides if side in windows]
+        dfs_max = yield [windows[side] for side in running]
+        for side, df_max in zip(running, dfs_max):
+            try:
+                windows[side] = side.send(df_max)
+            except StopIteration as stop:
+                del windows[side]
+                hits[side], loop_over = stop.value
+                if not concurrent and side is sides[0]:
+                    if loop_over:
+                        # we loop all over the replicon and search in both strand
+                        # searching left is useless
+                        sides.pop().close()
+                    else:
+                        windows[sides[1]] = next(sides[1])
+
+    to_concat = [df for df in [max_elt] + [df for side in sides for df in hits[side]] if not df.empty]
+    if to_concat:
+        max_elt = pd.concat(to_concat)
+    max_elt.drop_duplicates(inplace=True)
+    max_elt.index = list(range(len(max_elt)))
+    return max_elt
+
+
+def _expand_right(replicon, window_beg, window_end, circular, dist_threshold, max_attc_size, searched_strand):
+    """
+    The search on the right of an element, see :func:`expand_search`.
+
+    :return: a generator which yield the windows to search (window_beg, window_end, strand_search)
+             and must be sent the local_max results of this window.
+             It returns the list of the local_max results and True if the search loop all over the replicon
+    :rtype: generator
+    """
+    replicon_size = len(replicon)
     wb = window_beg
     we = window_end
+    hits = []
+    # max_attc_size (200bo by default) to allow the detection of sites that would overlap 2 consecutive windows
+    if circular:
+        # to allow the detection of sites that overlap last window and the first one (given as argument)
+        end_of_turn = wb + max_attc_size
+        pass_through_ori = False
+        window_beg = (window_end - max_attc_size) % replicon_size
+        window_end = (window_end + dist_threshold) % replicon_size
+    else:
+        window_beg = max(0, window_end - max_attc_size)
+        window_end = min(replicon_size, window_end + dist_threshold)
+
+    while True:
+        df_max = yield window_beg, window_end, searched_strand
+        hits.append(df_max)
+        _log.info(f"\tsearched {window_beg}->{window_end} in {searched_strand} strand(s) found {len(df_max)} attc sites")
 
-    if search_right:
-        # max_attc_size (200bo by default) to allow the detection of sites that would overlap 2 consecutive windows
         if circular:
-            # to allow the detection of sites that overlap last window and the first one (given as argument)
-            end_of_turn = wb + max_attc_size
-            pass_through_ori = False
+            if window_end == end_of_turn:
+                return hits, searched_strand == "both"
+            elif df_max.empty:
+                break
+
+            pass_through_ori = pass_through_ori or (window_end + dist_threshold) >= replicon_size
+
             window_beg = (window_end - max_attc_size) % replicon_size
             window_end = (window_end + dist_threshold) % replicon_size
+            if we > wb:
+                if pass_through_ori:
+                    window_end = min(end_of_turn, window_end)
+            else:
+                window_end = min(end_of_turn, window_end)
         else:
+            if df_max.empty or window_end == replicon_size:
+                break
             window_beg = max(0, window_end - max_attc_size)
             window_end = min(replicon_size, window_end + dist_threshold)
+    return hits, False
 
-        searched_strand = "both" if search_left else "top"  # search on both strands if search in both directions
-        while True:
-            df_max = local_max(replicon,
-                               window_beg, window_end,
-                               model_attc_path,
-                               max_attc_size=max_attc_size,
-                               min_attc_size=min_attc_size,
-                               strand_search=searched_strand,
-                               out_dir=out_dir,
-                               cpu=cpu,
-                               evalue_attc=evalue_attc,
-                               cmsearch_bin=cmsearch_bin
-                               )
-            to_concat = [df for df in [max_elt, df_max] if not df.empty]
-            if to_concat:
-                max_elt = pd.concat(to_concat)
-            _log.info(f"\tsearched {window_beg}->{window_end} in {searched_strand} strand(s) found {len(df_max)} attc sites")
-
-            if circular:
-                if window_end == end_of_turn:
-                    if searched_strand == "both":
-                        # we loop all over the replicon and search in both strand
-                        # searching left is useless
-                        search_left = False
-                    break
-                elif df_max.empty:
-                    break
-
-                pass_through_ori = pass_through_ori or (window_end + dist_threshold) >= replicon_size
-
-                window_beg = (window_end - max_attc_size) % replicon_size
-                window_end = (window_end + dist_threshold) % replicon_size
-                if we > wb:
-                    if pass_through_ori:
-                        window_end = min(end_of_turn, window_end)
-                else:
-                    window_end = min(end_of_turn, window_end)
-            else:
-                if df_max.empty or window_end == replicon_size:
-                    break
-                window_beg = max(0, window_end - max_attc_size)
-                window_end = min(replicon_size, window_end + dist_threshold)
 
-    if search_left:
-        window_beg = wb
+def _expand_left(replicon, window_beg, window_end, circular, dist_threshold, max_attc_size, searched_strand):
+    """
+    The search on the left of an element, see :func:`expand_search`.
+
+    :return: a generator which yield the windows to search (window_beg, window_end, strand_search)
+             and must be sent the local_max results of this window.
+             It returns the list of the local_max results and False
+    :rtype: generator
+    """
+    replicon_size = len(replicon)
+    wb = window_beg
+    we = window_end
+    hits = []
+    if circular:
+        #  to allow the detection of sites that overlap last window and the first one (given as argument)
+        end_of_turn = we - max_attc_size
+        pass_through_ori = False
+        window_end = (window_beg + max_attc_size) % replicon_size
+        window_beg = (window_beg - dist_threshold) % replicon_size
+    else:
+        window_end = min(replicon_size, window_beg + max_attc_size)
+        window_beg = max(0, window_beg - dist_threshold)
+
+    while True:
+        df_max = yield window_beg, window_end, searched_strand
+        hits.append(df_max)
+        _log.info(f"\tsearched {window_beg}->{window_end} in {searched_strand} strand(s) found {len(df_max)} attc sites")
+
         if circular:
-            #  to allow the detection of sites that overlap last window and the first one (given as argument)
-            end_of_turn = we - max_attc_size
-            pass_through_ori = False
+            if df_max.empty or window_beg == end_of_turn:
+                break
+
+            pass_through_ori = pass_through_ori or (window_end - dist_threshold) <= 0
+
             window_end = (window_beg + max_attc_size) % replicon_size
             window_beg = (window_beg - dist_threshold) % replicon_size
-        else:
-            window_end = min(replicon_size, window_beg + max_attc_size)
-            window_beg = max(0, window_beg - dist_threshold)
 
-        searched_strand = "both" if search_right else "bottom"
-        while True:
-            df_max = local_max(replicon,
-                               window_beg, window_end,
-                               model_attc_path,
-                               max_attc_size=max_attc_size,
-                               min_attc_size=min_attc_size,
-                               strand_search=searched_strand,
-                               out_dir=out_dir,
-                               cpu=cpu,
-                               evalue_attc=evalue_attc,
-                               cmsearch_bin=cmsearch_bin)
-            to_concat = [df for df in (max_elt, df_max) if not df.empty]
-            if to_concat:
-                max_elt = pd.concat(to_concat) # update of attC list of hits.
-            _log.info(f"\tsearched {window_beg}->{window_end} in {searched_strand} strand(s) found {len(df_max)} attc sites")
-
-            if circular:
-                if df_max.empty or window_beg == end_of_turn:
-                    break
-
-                pass_through_ori = pass_through_ori or (window_end - dist_threshold) <= 0
-
-                window_end = (window_beg + max_attc_size) % replicon_size
-                window_beg = (window_beg - dist_threshold) % replicon_size
-
-                if we > wb:
-                    if pass_through_ori:
-                        window_beg = max(window_beg, end_of_turn)
-                else:
+            if we > wb:
+                if pass_through_ori:
                     window_beg = max(window_beg, end_of_turn)
             else:
-                if df_max.empty or window_beg == 0:
-                    break
-                window_end = min(replicon_size, window_beg + max_attc_size)
-                window_beg = max(0, window_beg - dist_threshold)
-    max_elt.drop_duplicates(inplace=True)
-    max_elt.index = list(range(len(max_elt)))
-    return max_elt
+                window_beg = max(window_beg, end_of_turn)
+        else:
+            if df_max.empty or window_beg == 0:
+                break
+            window_end = min(replicon_size, window_beg + max_attc_size)
+            window_beg = max(0, window_beg - dist_threshold)
+    return hits, False
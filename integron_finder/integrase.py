@@ -28,10 +28,12 @@
 
 import os
 import subprocess
-import shlex
+import functools
 import colorlog
 
 from . import EmptyFileError
+from .cache import file_digest, tool_version
+from .hmm import domtblout_path, hmm_result_exists, scale_evalue
 
 _log = colorlog.getLogger(__name__)
 
@@ -40,6 +42,8 @@ def find_integrase(replicon_id, prot_file, out_dir, cfg):
     """
     Call Prodigal for Gene annotation and hmmer to find integrase, either with phage_int
     HMM profile or with intI profile.
+    Both profiles are searched in one hmmsearch run, then the hits are split by profile
+    in *<replicon_id>_intI* and *<replicon_id>_phage_int* outputs.
 
     :param str replicon_id: The Replicon identifier to search integrase into
     :param str prot_file: the path to the fasta file containing the translation of the replicon.
@@ -48,9 +52,6 @@ def find_integrase(replicon_id, prot_file, out_dir, cfg):
     :type cfg: a :class:`integron_finder.config.Config` object
     :returns: None, the results are written on the disk
     """
-
-    intI_hmm_out = os.path.join(out_dir, replicon_id + "_intI.res")
-    hmm_cmd = []
     if not os.path.exists(prot_file):
         msg = "The protein file: '{}' does not exists cannot perform hmmsearch on it.".format(prot_file)
         _log.warning(msg)
@@ -60,35 +61,265 @@ def find_integrase(replicon_id, prot_file, out_dir, cfg):
         _log.warning(msg)
         raise EmptyFileError(msg)
 
-    if not os.path.isfile(intI_hmm_out):
-        cmd = "{hmmsearch} --cut_ga --cpu {cpu} --tblout {tblout} -o {out} {model_int} {prot_file}".format(
-            hmmsearch=cfg.hmmsearch.replace(' ', '\\ '),
-            cpu=cfg.cpu,
-            tblout=os.path.join(out_dir, replicon_id + "_intI_table.res").replace(' ', '\\ '),
-            out=intI_hmm_out.replace(' ', '\\ '),
-            model_int=cfg.model_integrase.replace(' ', '\\ '),
-            prot_file=prot_file.replace(' ', '\\ ')
-        )
-        hmm_cmd.append(cmd)
-
-    phage_hmm_out = os.path.join(out_dir, replicon_id + "_phage_int.res")
-    if not os.path.isfile(phage_hmm_out):
-        cmd = "{hmmsearch} --cut_ga --cpu {cpu} --tblout {tblout} -o {phage_hmm_out} {model_phage_int} {prot_file}"\
-            .format( hmmsearch=cfg.hmmsearch.replace(' ', '\\ '),
-                     cpu=cfg.cpu,
-                     tblout=os.path.join(out_dir, replicon_id + "_phage_int_table.res").replace(' ', '\\ '),
-                     phage_hmm_out=phage_hmm_out.replace(' ', '\\ '),
-                     model_phage_int=cfg.model_phage_int.replace(' ', '\\ '),
-                     prot_file=prot_file.replace(' ', '\\ ')
-                     )
-        hmm_cmd.append(cmd)
-
-    for cmd in hmm_cmd:
-        try:
-            _log.debug(f"run hmmsearch: {cmd}")
-            cmd = shlex.split(cmd)
-            completed_process = subprocess.run(cmd)
-        except Exception as err:
-            raise RuntimeError(f"{cmd} failed : {err}")
-        if completed_process.returncode != 0:
-            raise RuntimeError(f"{cmd} failed return code = {completed_process.returncode}")
+    cache = cfg.result_cache
+    prot_digest = file_digest(prot_file) if cache else None
+    searches = []
+    for suffix, model in (('intI', cfg.model_integrase), ('phage_int', cfg.model_phage_int)):
+        hmm_out = os.path.join(out_dir, f"{replicon_id}_{suffix}.res")
+        if hmm_result_exists(hmm_out):
+            continue
+        tblout = os.path.join(out_dir, f"{replicon_id}_{suffix}_table.res")
+        outputs = (domtblout_path(hmm_out), tblout)
+        if cache:
+            options = ['--cut_ga']
+            if cfg.keep_tmp:
+                # the human readable output is cached too,
+                # the results cached without it cannot be reused
+                outputs += (hmm_out,)
+                options.append('-o')
+            cache_key = cache.key('hmmsearch', tool_version(cfg.hmmsearch), *options, file_digest(model), prot_digest)
+            if cache.get(cache_key, *outputs):
+                continue
+        else:
+            cache_key = None
+        searches.append((model, hmm_out, outputs, cache_key))
+    if not searches:
+        return
+
+    hmm_out = os.path.join(out_dir, f"{replicon_id}_integrases.res")
+    domtblout = domtblout_path(hmm_out)
+    tblout = os.path.join(out_dir, f"{replicon_id}_integrases_table.res")
+    # the hits are parsed from the per-domain tabular output (see read_hmm)
+    # the human readable output is only needed if the user want to keep the intermediate files
+    # the profiles are read from stdin
+    cmd = [cfg.hmmsearch, '--cut_ga', '--cpu', str(cfg.cpu), '--tblout', tblout, '--domtblout', domtblout,
+           '-o', hmm_out if cfg.keep_tmp else os.devnull, '-', prot_file]
+    try:
+        _log.debug(f"run hmmsearch: {' '.join(cmd)}")
+        completed_process = subprocess.run(cmd, input=_profiles_db(*[model for model, *_ in searches]), text=True)
+    except Exception as err:
+        raise RuntimeError(f"{cmd} failed : {err}")
+    if completed_process.returncode != 0:
+        raise RuntimeError(f"{cmd} failed return code = {completed_process.returncode}")
+
+    queries = {_profile_name(model): (model_out, outputs) for model, model_out, outputs, _ in searches}
+    _split_tblout(domtblout, {query: outputs[0] for query, (_, outputs) in queries.items()}, query_col=3)
+    _split_tblout(tblout, {query: outputs[1] for query, (_, outputs) in queries.items()}, query_col=2)
+    os.unlink(domtblout)
+    os.unlink(tblout)
+    if cfg.keep_tmp:
+        _split_hmmer_text(hmm_out, {query: model_out for query, (model_out, _) in queries.items()})
+        os.unlink(hmm_out)
+    for _, _, outputs, cache_key in searches:
+        if cache_key:
+            cache.put(cache_key, *outputs)
+
+
+def find_integrase_batch(prot_files, out_dirs, batch_dir, cfg):
+    """
+    Search the integrases in the proteins of several replicons with one hmmsearch run.
+    The results are split in the same outputs as those written by :func:`find_integrase` for each replicon.
+
+    The proteins of all replicons are concatenated and searched with *-Z 1 --domZ 1*,
+    so the E-values reported by hmmsearch are P-values. They are converted to the E-values of a search
+    on the proteins of each replicon: the sequence E-values are multiplied by the number of proteins
+    of the replicon and the domain E-values by the number of hits of the profile in the replicon
+    (hmmsearch uses the number of sequences reported as search space for the domains).
+    The thresholds are the --cut_ga bit scores, so the hits do not depend on the search space size.
+    As the P-values are printed rounded, the E-values can differ slightly (see :func:`integron_finder.hmm.scale_evalue`)
+    from those of :func:`find_integrase`.
+
+    :param dict prot_files: the path to the proteins file of each replicon {str replicon_id: str path}.
+                            The replicons with the same proteins file share the results.
+    :param dict out_dirs: the directory where to write the results of each replicon {str replicon_id: str path}
+    :param str batch_dir: the directory where to write the concatenated proteins and the hmmsearch outputs.
+    :param cfg: the configuration
+    :type cfg: a :class:`integron_finder.config.Config` object
+    :returns: None, the results are written on the disk. The replicons without proteins are ignored.
+    :raises RuntimeError: when hmmsearch run failed.
+    """
+    models = (cfg.model_integrase, cfg.model_phage_int)
+    suffixes = {_profile_name(cfg.model_integrase): 'intI', _profile_name(cfg.model_phage_int): 'phage_int'}
+    # the proteins of each file are prefixed with the index of the file
+    # so they stay distinct even if the same id is used in several files
+    files = {}
+    files_prot_nb = []
+    all_prot_path = os.path.join(batch_dir, 'integrases_proteins.prt')
+    with open(all_prot_path, 'w') as all_prot:
+        for prot_file in prot_files.values():
+            if prot_file in files or not os.path.exists(prot_file) or os.path.getsize(prot_file) == 0:
+                continue
+            prot_nb = 0
+            with open(prot_file) as prots:
+                for line in prots:
+                    if line.startswith('>'):
+                        prot_nb += 1
+                        line = f">{len(files)}|{line[1:]}"
+                    all_prot.write(line)
+            files[prot_file] = len(files)
+            files_prot_nb.append(prot_nb)
+    if not files:
+        os.unlink(all_prot_path)
+        return
+
+    domtblout = os.path.join(batch_dir, 'integrases_domtable.res')
+    tblout = os.path.join(batch_dir, 'integrases_table.res')
+    cmd = [cfg.hmmsearch, '--cut_ga', '-Z', '1', '--domZ', '1', '--cpu', str(cfg.cpu),
+           '--tblout', tblout, '--domtblout', domtblout, '-o', os.devnull, '-', all_prot_path]
+    try:
+        _log.debug(f"run hmmsearch: {' '.join(cmd)}")
+        completed_process = subprocess.run(cmd, input=_profiles_db(*models), text=True)
+    except Exception as err:
+        raise RuntimeError(f"{cmd} failed : {err}")
+    if completed_process.returncode != 0:
+        raise RuntimeError(f"{cmd} failed return code = {completed_process.returncode}")
+
+    # the number of hits of each profile in each file
+    hits_nb = {}
+    tbl_hits = _batch_hits(tblout, query_col=2, desc_col=18)
+    for file_idx, query, _ in tbl_hits[1]:
+        hits_nb[file_idx, query] = hits_nb.get((file_idx, query), 0) + 1
+
+    def scale_tbl(file_idx, query, fields):
+        # full sequence E-value and best domain E-value
+        for col in (4, 7):
+            fields[col] = f"{scale_evalue(float(fields[col]), files_prot_nb[file_idx]):.2g}"
+
+    def scale_domtbl(file_idx, query, fields):
+        # full sequence E-value, then domain c-Evalue and i-Evalue
+        fields[6] = f"{scale_evalue(float(fields[6]), files_prot_nb[file_idx]):.2g}"
+        for col in (11, 12):
+            fields[col] = f"{scale_evalue(float(fields[col]), hits_nb[file_idx, query]):.2g}"
+
+    for (header, hits, footer), suffix_fmt, scale in (
+            (_batch_hits(domtblout, query_col=3, desc_col=22), "{}_{}_domtable.res", scale_domtbl),
+            (tbl_hits, "{}_{}_table.res", scale_tbl)):
+        file_hits = {}
+        for file_idx, query, fields in hits:
+            scale(file_idx, query, fields)
+            file_hits.setdefault((file_idx, query), []).append(' '.join(fields) + '\n')
+        for replicon_id, prot_file in prot_files.items():
+            if prot_file not in files:
+                continue
+            file_idx = files[prot_file]
+            for query, suffix in suffixes.items():
+                with open(os.path.join(out_dirs[replicon_id], suffix_fmt.format(replicon_id, suffix)), 'w') as out:
+                    out.writelines(header)
+                    out.writelines(file_hits.get((file_idx, query), []))
+                    out.writelines(footer)
+    if not cfg.keep_tmp:
+        for path in (all_prot_path, domtblout, tblout):
+            os.unlink(path)
+
+
+def _batch_hits(tblout_path, query_col, desc_col):
+    """
+    Parse the tabular output of a search on concatenated proteins files (see :func:`find_integrase_batch`)
+
+    :param str tblout_path: the path to the hmmsearch tabular output (--tblout or --domtblout)
+    :param int query_col: the index of the query name column (2 for --tblout, 3 for --domtblout)
+    :param int desc_col: the index of the target description column (18 for --tblout, 22 for --domtblout)
+    :return: the comments before the hits, the hits and the comments after the hits.
+             each hit is a tuple (int file index, str query name, list of fields)
+             where the target name is restored without the file index.
+    :rtype: tuple (list of str, list of tuple, list of str)
+    """
+    header = []
+    footer = []
+    comments = header
+    hits = []
+    with open(tblout_path) as tblout:
+        for line in tblout:
+            if line.startswith('#'):
+                comments.append(line)
+                continue
+            comments = footer
+            fields = line.rstrip('\n').split(maxsplit=desc_col)
+            file_idx, fields[0] = fields[0].split('|', 1)
+            hits.append((int(file_idx), fields[query_col], fields))
+    return header, hits, footer
+
+
+@functools.lru_cache(maxsize=None)
+def _profile_name(model):
+    """
+    :param str model: the path to a hmm profile file
+    :return: the name of the profile (the NAME field)
+    :rtype: str
+    """
+    with open(model) as hmm_file:
+        for line in hmm_file:
+            if line.startswith('NAME'):
+                return line.split()[1]
+    raise RuntimeError(f"cannot find the profile name in '{model}'")
+
+
+@functools.lru_cache(maxsize=None)
+def _profiles_db(*models):
+    """
+    The profile database is built once and reused for each replicon.
+
+    :param str models: the paths to the hmm profile files
+    :return: the profiles concatenated in one database
+    :rtype: str
+    """
+    db = []
+    for model in models:
+        with open(model) as hmm_file:
+            db.append(hmm_file.read())
+    return ''.join(db)
+
+
+def _split_tblout(tblout_path, queries_tblout, query_col=2):
+    """
+    Split a hmmsearch tabular output (--tblout or --domtblout) on several files, one by query.
+    The comment lines are copied in each file.
+
+    :param str tblout_path: the path to the hmmsearch tabular output
+    :param dict queries_tblout: the path of the output for each query name
+    :param int query_col: the index of the query name column (2 for --tblout, 3 for --domtblout)
+    """
+    header = []
+    footer = []
+    comments = header
+    query_hits = {query: [] for query in queries_tblout}
+    with open(tblout_path) as tblout:
+        for line in tblout:
+            if line.startswith('#'):
+                # the comments before the first hit are the header (columns names)
+                # those after are the footer (program, command line, ...)
+                comments.append(line)
+            else:
+                comments = footer
+                query_hits[line.split(maxsplit=query_col + 1)[query_col]].append(line)
+    for query, path in queries_tblout.items():
+        with open(path, 'w') as query_tblout:
+            query_tblout.writelines(header)
+            query_tblout.writelines(query_hits[query])
+            query_tblout.writelines(footer)
+
+
+def _split_hmmer_text(hmm_out, queries_out):
+    """
+    Split a hmmsearch human readable output (-o) on several files, one by query.
+    The program header and the last line ([ok]) are copied in each file.
+
+    :param str hmm_out: the path to the hmmsearch output
+    :param dict queries_out: the path of the output for each query name
+    """
+    header = []
+    footer = []
+    query_lines = {query: [] for query in queries_out}
+    lines = header
+    with open(hmm_out) as hmm_file:
+        for line in hmm_file:
+            if line.startswith('Query:'):
+                lines = query_lines[line.split()[1]]
+            lines.append(line)
+            if line.startswith('//'):
+                lines = footer
+    for query, path in queries_out.items():
+        with open(path, 'w') as query_out:
+            query_out.writelines(header)
+            query_out.writelines(query_lines[query])
+            query_out.writelines(footer)
@@ -27,6 +27,7 @@
 ####################################################################################
 
 import os
+import bisect
 import colorlog
 import numpy as np
 import pandas as pd
@@ -122,129 +123,7 @@ def find_integron(replicon, prot_db, intI_file, phageI_file, cfg, attc_file=None
     # attc_cluster_list = list of Dataframe, each have an array of attC
     attc_cluster_list = search_attc(attc, cfg.keep_palindromes, cfg.distance_threshold,
                                     len(replicon), replicon.topology)
-    integrons = []
-    if not intI_ac.empty and attc_cluster_list:
-        attc_cluster_nb = len(attc_cluster_list)
-        # If an array hasn't been clustered with an Integrase
-        # or if an integrase lacks an array
-        # redundant info, we could check for len(attc_cluster_list)==0
-        # -> to remove
-        for i, id_int in enumerate(intI_ac.ID_prot.values):  # For each Integrase
-            if attc_cluster_nb == 0:  # No more array to attribute to an integrase
-
-                integrons.append(Integron(replicon, cfg))
-                integrons[-1].add_integrase(intI_ac.pos_beg.values[i],
-                                            intI_ac.pos_end.values[i],
-                                            id_int,
-                                            int(intI_ac.strand.values[i]),
-                                            intI_ac.evalue.values[i],
-                                            intI_ac.query_name.values[i])
-
-            else:  # we still have several attC cluster and int :
-                # Look for array of attC (cluster) where intI would fall inside it
-
-                # array_2_split is a boolean with True when intI is within an array
-                array_2_split = [(attc.pos_beg.values[0] < intI_ac.pos_beg.values[i] and
-                                  intI_ac.pos_beg.values[i] < attc.pos_end.values[-1])
-                                  for attc in attc_cluster_list]
-                # get the index of array to split
-                split_index = np.where(array_2_split)[0]
-                # for each of the attc cluster to split
-                # pop it, split it and add the 2 new arrays back.
-                for index in split_index:
-                    poped_attc = attc_cluster_list.pop(index)
-                    whr_split = np.searchsorted(poped_attc.pos_beg.values, intI_ac.pos_beg.values[i])
-                    for split_item in poped_attc.iloc[:whr_split], poped_attc.iloc[whr_split:]:
-                        # when there is only one attC in the cluster
-                        # the split generate an emtpy dataframe
-                        if not split_item.empty:
-                            attc_cluster_list.append(split_item)
-                    attc_cluster_nb += 1  # new attC array
-
-                attc_left = np.array([i_attc.pos_beg.values[0] for i_attc in attc_cluster_list])
-                attc_right = np.array([i_attc.pos_end.values[-1] for i_attc in attc_cluster_list])
-
-                if replicon.topology == 'circ':
-                    distances = np.array([(attc_left - intI_ac.pos_end.values[i]),
-                                          (intI_ac.pos_beg.values[i] - attc_right)]) % len(replicon)
-                else:
-                    distances = np.array([abs(attc_left - intI_ac.pos_end.values[i]),
-                                          abs(intI_ac.pos_beg.values[i] - attc_right)])
-
-                if attc_cluster_list:
-                    # tmp = (distances /
-                    #       np.array([[len(aac) for attc in attc_cluster_list]]))
-                    side, idx_attc = np.where(distances == distances.min())
-                    # side : 0 <=> left; 1 <=> right
-                    # index of the closest and biggest attC array to the integrase
-                    # exactly tmp = dist(cluster to integrase) / size cluster
-                    # to make a decision between 2 equally distant arrays
-                    # Usually they are on the same side but on 2 different strands
-
-                    # If they are exactly similar (same distance, same number of attC, take the first one arbitrarily
-                    # Or just flatten from idx_attc=[i] to idx_attc=i
-                    idx_attc = idx_attc[0]
-                    side = side[0]
-
-                else:
-                    idx_attc = 0
-                    side = np.argmin(distances)
-
-                if distances[side, idx_attc] < cfg.distance_threshold:
-                    integrons.append(Integron(replicon, cfg))
-                    integrons[-1].add_integrase(intI_ac.pos_beg.values[i],
-                                                intI_ac.pos_end.values[i],
-                                                id_int,
-                                                int(intI_ac.strand.values[i]),
-                                                intI_ac.evalue.values[i],
-                                                intI_ac.query_name.values[i])
-
-                    attc_tmp = attc_cluster_list.pop(idx_attc)
-                    for a_tmp in attc_tmp.values:
-                        integrons[-1].add_attC(a_tmp[4],  # pos_beg
-                                               a_tmp[5],  # pos_end
-                                               1 if a_tmp[6] == "+" else -1,  # sens
-                                               a_tmp[7],  # evalue
-                                               cfg.model_attc_name
-                                               )
-                    attc_cluster_nb -= 1
-
-                else:  # no array close to the integrase on both side
-                    integrons.append(Integron(replicon, cfg))
-                    integrons[-1].add_integrase(intI_ac.pos_beg.values[i],
-                                                intI_ac.pos_end.values[i],
-                                                id_int,
-                                                int(intI_ac.strand.values[i]),
-                                                intI_ac.evalue.values[i], intI_ac.query_name.values[i])
-
-        if attc_cluster_nb > 0:  # after the integrase loop (<=> no more integrases)
-            for attc_array in attc_cluster_list:
-                integrons.append(Integron(replicon, cfg))
-
-                for a_tmp in attc_array.values:
-                    integrons[-1].add_attC(a_tmp[4],
-                                           a_tmp[5],
-                                           1 if a_tmp[6] == "+" else -1,
-                                           a_tmp[7], cfg.model_attc_name)
-
-    elif intI_ac.pos_end.values.size == 0 and attc_cluster_list:  # If attC only
-        for attc_array in attc_cluster_list:
-            integrons.append(Integron(replicon, cfg))
-            for a_tmp in attc_array.values:
-                integrons[-1].add_attC(a_tmp[4],
-                                       a_tmp[5],
-                                       1 if a_tmp[6] == "+" else -1,
-                                       a_tmp[7], cfg.model_attc_name)
-
-    elif intI_ac.pos_end.values.size >= 1 and not attc_cluster_list:  # If intI only
-        for i, id_int in enumerate(intI_ac.ID_prot.values):
-            integrons.append(Integron(replicon, cfg))
-            integrons[-1].add_integrase(intI_ac.pos_beg.values[i],
-                                        intI_ac.pos_end.values[i],
-                                        id_int,
-                                        int(intI_ac.strand.values[i]),
-                                        intI_ac.evalue.values[i],
-                                        intI_ac.query_name.values[i])
+    integrons = assign_attc_clusters(replicon, intI_ac, attc_cluster_list, cfg)
 
     #########################################
     # filter CALIN integron on attc number  #
@@ -271,12 +150,341 @@ def find_integron(replicon, prot_db, intI_file, phageI_file, cfg, attc_file=None
     return integrons
 
 
+class _AttcClusters:
+    """
+    The attC clusters which are not yet assigned to an integrase.
+
+    The clusters keep the order of a list where the clusters produced by a split are appended at the end,
+    this order is used to break the ties between clusters at the same distance of an integrase.
+    To avoid to scan all clusters for each integrase, the clusters are indexed
+    by their left (first attC pos_beg) and right (last attC pos_end) positions in sorted lists.
+    """
+
+    def __init__(self, clusters):
+        """
+        :param clusters: the attC clusters
+        :type clusters: list of :class:`pandas.DataFrame` objects
+        """
+        self._clusters = {}  # rank -> cluster
+        self._bounds = {}  # rank -> (left, right)
+        self._ranks = []  # the rank of the clusters in list order
+        self._by_left = []  # sorted (left, rank)
+        self._by_right = []  # sorted (right, rank)
+        self._max_span = 0
+        self._next_rank = 0
+        for cluster in clusters:
+            self.add(cluster)
+
+    def __len__(self):
+        return len(self._ranks)
+
+    def __iter__(self):
+        return (self._clusters[rank] for rank in self._ranks)
+
+    def add(self, cluster):
+        """
+        Append a cluster
+
+        :param cluster: the attC sites of the cluster sorted by pos_beg
+        :type cluster: :class:`pandas.DataFrame` object
+        """
+        rank = self._next_rank
+        self._next_rank += 1
+        left = int(cluster.pos_beg.values[0])
+        right = int(cluster.pos_end.values[-1])
+        self._clusters[rank] = cluster
+        self._bounds[rank] = (left, right)
+        self._ranks.append(rank)
+        bisect.insort(self._by_left, (left, rank))
+        bisect.insort(self._by_right, (right, rank))
+        self._max_span = max(self._max_span, right - left)
+
+    def pop(self, position):
+        """
+        Remove a cluster
+
+        :param int position: the position of the cluster in the list order
+        :return: the cluster
+        :rtype: :class:`pandas.DataFrame` object
+        """
+        rank = self._ranks.pop(position)
+        left, right = self._bounds.pop(rank)
+        del self._by_left[bisect.bisect_left(self._by_left, (left, rank))]
+        del self._by_right[bisect.bisect_left(self._by_right, (right, rank))]
+        return self._clusters.pop(rank)
+
+    def containing(self, pos):
+        """
+        :param int pos: a position on the replicon
+        :return: the positions in the list order of the clusters where left < pos < right
+        :rtype: list of int
+        """
+        ranks = []
+        idx = bisect.bisect_left(self._by_left, (pos, -1))
+        # the clusters starting before pos, from the closest one
+        # a cluster cannot contain pos if it starts farther than the widest cluster
+        while idx > 0:
+            idx -= 1
+            left, rank = self._by_left[idx]
+            if left + self._max_span <= pos:
+                break
+            if pos < self._bounds[rank][1]:
+                ranks.append(rank)
+        return sorted(bisect.bisect_left(self._ranks, rank) for rank in ranks)
+
+    def closest(self, int_beg, int_end, replicon_size, circular):
+        """
+        Find the closest cluster of an integrase, the distance between the integrase and a cluster
+        is either the distance between the integrase end and the cluster left (on the left side)
+        or between the cluster right and the integrase beginning (on the right side).
+        In case of ties, the clusters on the left side are preferred, then the first one in list order.
+
+        :param int int_beg: the integrase beginning
+        :param int int_end: the integrase end
+        :param int replicon_size: the replicon size
+        :param bool circular: True if the replicon is circular
+        :return: the distance and the position in list order of the closest cluster
+        :rtype: tuple (int distance, int position)
+        """
+        if circular:
+            sides = ((self._by_left, int_end, lambda left: (left - int_end) % replicon_size,
+                      lambda d: (int_end + d - replicon_size, int_end + d, int_end + d + replicon_size)),
+                     (self._by_right, int_beg, lambda right: (int_beg - right) % replicon_size,
+                      lambda d: (int_beg - d - replicon_size, int_beg - d, int_beg - d + replicon_size)))
+        else:
+            sides = ((self._by_left, int_end, lambda left: abs(left - int_end),
+                      lambda d: (int_end - d, int_end + d)),
+                     (self._by_right, int_beg, lambda right: abs(int_beg - right),
+                      lambda d: (int_beg - d, int_beg + d)))
+        best = None
+        for by_pos, pos, distance, at_distance in sides:
+            idx = bisect.bisect_left(by_pos, (pos, -1))
+            # the closest cluster is the previous or the next one (or the first or last one around the origin)
+            neighbors = [by_pos[0][0], by_pos[-1][0]]
+            if idx < len(by_pos):
+                neighbors.append(by_pos[idx][0])
+            if idx > 0:
+                neighbors.append(by_pos[idx - 1][0])
+            dist = min(distance(neighbor) for neighbor in neighbors)
+            if best is not None and dist >= best[0]:
+                continue
+            ranks = []
+            for neighbor in at_distance(dist):
+                first = bisect.bisect_left(by_pos, (neighbor, -1))
+                if first < len(by_pos) and by_pos[first][0] == neighbor and distance(neighbor) == dist:
+                    ranks.append(by_pos[first][1])
+            best = (dist, min(ranks))
+        dist, rank = best
+        return dist, bisect.bisect_left(self._ranks, rank)
+
+
+def assign_attc_clusters(replicon, intI_ac, attc_cluster_list, cfg):
+    """
+    Build the integrons from the integrases and the attC clusters of a replicon.
+    Each integrase, in turn, takes the closest cluster if it is closer than cfg.distance_threshold
+    (a cluster which contains the integrase is split before).
+    The clusters which remain are CALIN.
+
+    :param replicon: the replicon
+    :type replicon: :class:`Bio.Seq.SeqRecord` object
+    :param intI_ac: the integrases
+    :type intI_ac: :class:`pandas.DataFrame` object
+    :param attc_cluster_list: the attC clusters as returned by :func:`integron_finder.attc.search_attc`
+    :type attc_cluster_list: list of :class:`pandas.DataFrame` objects
+    :param cfg: configuration
+    :type cfg: a :class:`integron_finder.config.Config` object
+    :returns: list of all integrons, be they complete or not
+    :retype: list of :class:`Integron` object
+    """
+    def add_cluster(integron, cluster):
+        for a_tmp in cluster.values:
+            integron.add_attC(a_tmp[4],  # pos_beg
+                              a_tmp[5],  # pos_end
+                              1 if a_tmp[6] == "+" else -1,  # sens
+                              a_tmp[7],  # evalue
+                              cfg.model_attc_name
+                              )
+
+    integrons = []
+    clusters = _AttcClusters(attc_cluster_list)
+    attc_cluster_nb = len(clusters)
+    circular = replicon.topology == 'circ'
+    for i, id_int in enumerate(intI_ac.ID_prot.values):  # For each Integrase
+        integron = Integron(replicon, cfg)
+        integron.add_integrase(intI_ac.pos_beg.values[i],
+                               intI_ac.pos_end.values[i],
+                               id_int,
+                               int(intI_ac.strand.values[i]),
+                               intI_ac.evalue.values[i],
+                               intI_ac.query_name.values[i])
+        integrons.append(integron)
+        if attc_cluster_nb == 0:  # No more array to attribute to an integrase
+            continue
+        int_beg = int(intI_ac.pos_beg.values[i])
+        int_end = int(intI_ac.pos_end.values[i])
+        # split the clusters where intI would fall inside
+        # the positions of the clusters to split are computed before splitting any of them
+        # and the clusters resulting of a split are put at the end
+        for position in clusters.containing(int_beg):
+            poped_attc = clusters.pop(position)
+            whr_split = np.searchsorted(poped_attc.pos_beg.values, intI_ac.pos_beg.values[i])
+            for split_item in poped_attc.iloc[:whr_split], poped_attc.iloc[whr_split:]:
+                # when there is only one attC in the cluster
+                # the split generate an emtpy dataframe
+                if not split_item.empty:
+                    clusters.add(split_item)
+            attc_cluster_nb += 1  # new attC array
+
+        if clusters:
+            distance, position = clusters.closest(int_beg, int_end, len(replicon), circular)
+            if distance < cfg.distance_threshold:
+                add_cluster(integron, clusters.pop(position))
+                attc_cluster_nb -= 1
+
+    if attc_cluster_nb > 0:  # after the integrase loop (<=> no more integrases)
+        for cluster in clusters:
+            integron = Integron(replicon, cfg)
+            add_cluster(integron, cluster)
+            integrons.append(integron)
+    return integrons
+
+
+class _Elements:
+    """
+    The elements of one kind (integrase, attC sites, promoters, ...) of an integron
+    stored column by column, so adding an element does not copy the others.
+    The :class:`pandas.DataFrame` is built only when it is asked and kept until the elements change.
+    """
+
+    __slots__ = ('ids', 'pos_beg', 'pos_end', 'strand', 'evalue', 'type_elt', 'model', 'distance_2attC',
+                 'annotation', '_frame')
+
+    def __init__(self):
+        self.ids = []
+        self.pos_beg = []
+        self.pos_end = []
+        self.strand = []
+        self.evalue = []
+        self.type_elt = []
+        self.model = []
+        self.distance_2attC = []
+        self.annotation = []
+        self._frame = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def append(self, elt_id, pos_beg, pos_end, strand, evalue, type_elt, model, distance_2attC, annotation):
+        """
+        Add an element
+
+        :param str elt_id: the identifier of the element (the index of the DataFrame)
+        :param int pos_beg: the position on the replicon of the beginning of the element
+        :param int pos_end: the position on the replicon of the end of the element
+        :param int strand: 1 for forward, -1 for reverse
+        :param float evalue: the evalue of the element
+        :param str type_elt: the type of the element (protein, attC, Promoter, attI)
+        :param str model: the name of model which detect the element
+        :param float distance_2attC: the distance to the previous attC site
+        :param str annotation: the annotation of the element
+        """
+        self.ids.append(elt_id)
+        self.pos_beg.append(int(pos_beg))
+        self.pos_end.append(int(pos_end))
+        self.strand.append(int(strand))
+        self.evalue.append(float(evalue))
+        self.type_elt.append(type_elt)
+        self.model.append(model)
+        self.distance_2attC.append(float(distance_2attC))
+        self.annotation.append(annotation)
+        self._frame = None
+
+    def update(self, elt_ids, **columns):
+        """
+        Change the values of some columns of some elements
+
+        :param elt_ids: the identifiers of the elements to update
+        :param columns: for each column to change, the new values in the same order as elt_ids
+        """
+        positions = {elt_id: idx for idx, elt_id in enumerate(self.ids)}
+        idx = [positions[elt_id] for elt_id in elt_ids]
+        for col, values in columns.items():
+            col_values = getattr(self, col)
+            for i, value in zip(idx, values):
+                col_values[i] = value
+        self._frame = None
+
+    @classmethod
+    def from_frame(cls, frame):
+        """
+        :param frame: the elements with the columns of :attr:`Integron._columns` and indexed by element id
+        :type frame: :class:`pandas.DataFrame` object
+        :return: a store with the elements of the frame
+        :rtype: :class:`_Elements` object
+        """
+        elements = cls()
+        elements.ids = frame.index.tolist()
+        for col in Integron._columns:
+            setattr(elements, col, frame[col].tolist())
+        elements._frame = frame
+        return elements
+
+    def frame(self):
+        """
+        :return: the elements (one row per element)
+        :rtype: :class:`pandas.DataFrame` object
+        """
+        if self._frame is None:
+            if self.ids:
+                frame = pd.DataFrame({col: getattr(self, col) for col in Integron._columns},
+                                     index=pd.Index(self.ids, dtype=object),
+                                     columns=Integron._columns)
+            else:
+                frame = pd.DataFrame(columns=Integron._columns)
+            self._frame = frame.astype(dtype=Integron._dtype)
+        return self._frame
+
+
+def _elements_property(kind):
+    """
+    Create the property which gives access to the elements of an integron as a DataFrame.
+    The DataFrame must not be modified in place, set the property instead.
+
+    :param str kind: the kind of elements (integrase, attC, promoter, attI, proteins)
+    """
+    def getter(self):
+        return self._elements[kind].frame()
+
+    def setter(self, frame):
+        self._elements[kind] = _Elements.from_frame(frame)
+        self._description = None
+
+    return property(getter, setter, doc=f"The {kind} of the integron (:class:`pandas.DataFrame` object)")
+
+
 class Integron(object):
     """Integron object represents an object composed of an integrase, attC sites and gene cassettes.
     Each element is characterized by their coordinates in the replicon, the strand (+ or -),
     the ID of the gene (except attC).
     The object Integron is also characterized by the ID of the replicon."""
 
+    _columns = ["pos_beg", "pos_end", "strand", "evalue", "type_elt", "model", "distance_2attC", "annotation"]
+    _dtype = {"pos_beg": "int",
+              "pos_end": "int",
+              "strand": "int",
+              "evalue": "float",
+              "type_elt": "str",
+              "model": "str",
+              "distance_2attC": "float",
+              "annotation": "str"}
+    _kinds = ("integrase", "attC", "promoter", "attI", "proteins")
+
+    integrase = _elements_property("integrase")
+    attC = _elements_property("attC")
+    promoter = _elements_property("promoter")
+    attI = _elements_property("attI")
+    proteins = _elements_property("proteins")
+
     def __init__(self, replicon, cfg):
         """
         :param replicon: The replicon where integrons has been found
@@ -287,36 +495,28 @@ class Integron(object):
         self.cfg = cfg
         self.replicon = replicon
         self.replicon_size = len(self.replicon)
-        self._columns = ["pos_beg", "pos_end", "strand", "evalue", "type_elt", "model", "distance_2attC", "annotation"]
-        self._dtype = {"pos_beg": "int",
-                       "pos_end": "int",
-                       "strand": "int",
-                       "evalue": "float",
-                       "type_elt": "str",
-                       "model": "str",
-                       "distance_2attC": "float",
-                       "annotation": "str"}
-        self.integrase = pd.DataFrame(columns=self._columns)
-        self.integrase = self.integrase.astype(dtype=self._dtype)
-
-        self.attC = pd.DataFrame(columns=self._columns)
-        self.attC = self.attC.astype(dtype=self._dtype)
-
-        self.promoter = pd.DataFrame(columns=self._columns)
-        self.promoter = self.promoter.astype(dtype=self._dtype)
-
-        self.attI = pd.DataFrame(columns=self._columns)
-        self.attI = self.attI.astype(dtype=self._dtype)
-
-        self.proteins = pd.DataFrame(columns=self._columns)
-        self.proteins = self.proteins.astype(dtype=self._dtype)
-
-        self.sizes_cassettes = None
+        self._elements = {kind: _Elements() for kind in self._kinds}
+        # the result of describe, reset each time an element is added
+        self._description = None
 
     @property
     def dtype(self):
         return {k: v for k, v in self._dtype.items()}
 
+    @property
+    def sizes_cassettes(self):
+        """
+        :return: the distances between each attC site and the previous one (nan for the first one)
+                 or None if there is no attC site
+        :rtype: list of float
+        """
+        distances = self._elements["attC"].distance_2attC
+        return list(distances) if distances else None
+
+    def _add_element(self, kind, *values):
+        self._elements[kind].append(*values)
+        self._description = None
+
     def add_integrase(self, pos_beg_int, pos_end_int, id_int, strand_int, evalue, model):
         """Adds integrases to the integron. Should be called once.
 
@@ -328,20 +528,10 @@ class Integron(object):
         :param str model: the name of integrase model (for instance intersection_tyr_intI)
         """
 
-        if not self.integrase.empty:
+        if self.has_integrase():
             raise RuntimeError("add_integrase should be called once.")
-        tmp_df = pd.DataFrame(columns=self._columns)
-        tmp_df = tmp_df.astype(dtype=self._dtype)
-        tmp_df["pos_beg"] = [pos_beg_int]
-        tmp_df["pos_end"] = [pos_end_int]
-        tmp_df["strand"] = [strand_int]
-        tmp_df["evalue"] = [evalue]
-        tmp_df["type_elt"] = "protein"
-        tmp_df["annotation"] = "intI"
-        tmp_df["model"] = [model]
-        tmp_df.index = [id_int]
-        tmp_df["distance_2attC"] = [np.nan]
-        self.integrase = pd.concat([self.integrase, tmp_df], ignore_index=False)
+        self._add_element("integrase", id_int, pos_beg_int, pos_end_int, strand_int, evalue,
+                          "protein", model, np.nan, "intI")
 
 
     def add_attC(self, pos_beg_attC, pos_end_attC, strand, evalue, model):
@@ -353,27 +543,28 @@ class Integron(object):
         :param float evalue: the evalue associated to this attc site
         :param str model: the name of attc model (for instance attc4)
         """
-        tmp_df = pd.DataFrame(columns=self._columns)
-        tmp_df = tmp_df.astype(dtype=self._dtype)
-        tmp_df["pos_beg"] = [pos_beg_attC]
-        tmp_df["pos_end"] = [pos_end_attC]
-        tmp_df["strand"] = [strand]
-        tmp_df["evalue"] = [evalue]
-        tmp_df["type_elt"] = "attC"
-        tmp_df["annotation"] = "attC"
-        tmp_df["model"] = [model]
-        self.attC = pd.concat([self.attC, tmp_df], ignore_index=True)
-        attC_len = len(self.attC)
-        if attC_len < 2:
-            self.sizes_cassettes = [np.nan]
+        attC = self._elements["attC"]
+        if attC:
+            distance_2attC = (pos_beg_attC - attC.pos_end[-1]) % self.replicon_size
         else:
-            self.sizes_cassettes.append((self.attC.iloc[attC_len - 1].pos_beg -
-                                         self.attC.iloc[attC_len - 2].pos_end) % len(self.replicon))
-        self.attC["distance_2attC"] = self.sizes_cassettes
+            distance_2attC = np.nan
+        self._add_element("attC", f"attc_{len(attC) + 1:03d}", pos_beg_attC, pos_end_attC, strand, evalue,
+                          "attC", model, distance_2attC, "attC")
 
-        # self.attC.sort_values(["pos_beg"], inplace = True)G669
-        self.attC.index = ["attc_%03i" % int(j + 1) for j in self.attC.index]
+    def annotate_proteins(self, prot_ids, evalues, annotations, models):
+        """
+        Set the functional annotation of some proteins of the integron.
 
+        :param prot_ids: the ids of the proteins to annotate
+        :param evalues: the evalue of the annotation of each protein
+        :param annotations: the annotation of each protein (the name of the hmm profile)
+        :param models: the model of each protein (the accession of the hmm profile)
+        """
+        self._elements["proteins"].update(prot_ids,
+                                          evalue=[float(evalue) for evalue in evalues],
+                                          annotation=annotations,
+                                          model=models)
+        self._description = None
 
     def type(self):
         """
@@ -384,11 +575,11 @@ class Integron(object):
                     - 'In0' : Just an integrase intI
         :rtype: str
         """
-        if not self.attC.empty and not self.integrase.empty:
+        if self.has_attC() and self.has_integrase():
             return "complete"
-        elif self.attC.empty and not self.integrase.empty:
+        elif not self.has_attC() and self.has_integrase():
             return "In0"
-        elif not self.attC.empty and self.integrase.empty:
+        elif self.has_attC() and not self.has_integrase():
             return "CALIN"
 
 
@@ -398,6 +589,8 @@ class Integron(object):
         It takes 1s for about 13kb.
         """
         dist_prom = 500  # pb distance from edge of the element for which we seek promoter
+        integrase = self._elements["integrase"]
+        attC = self._elements["attC"]
 
         ######## Promoter of integrase #########
 
@@ -415,43 +608,29 @@ class Integron(object):
 
             motifs_Pint = [p_intI1_mot]
 
-            seq_p_int = self.replicon.seq[int(self.integrase.pos_beg.min()) - dist_prom:
-                                          int(self.integrase.pos_end.max()) + dist_prom]
+            seq_p_int = self.replicon.seq[min(integrase.pos_beg) - dist_prom:
+                                          max(integrase.pos_end) + dist_prom]
 
             for m in motifs_Pint:
-                if self.integrase.strand.values[0] == 1:
+                if integrase.strand[0] == 1:
                     generator_motifs = seq_p_int[:dist_prom].search(p_intI1_mot.alignment.sequences)
                     for pos, s in generator_motifs:
-                        tmp_df = pd.DataFrame(columns=self._columns)
-                        tmp_df = tmp_df.astype(dtype=self._dtype)
-                        tmp_df["pos_beg"] = [self.integrase.pos_beg.values[0] - dist_prom + pos]
-                        tmp_df["pos_end"] = [self.integrase.pos_beg.values[0] - dist_prom + pos + len(s)]
-                        tmp_df["strand"] = [self.integrase.strand.values[0]]
-                        tmp_df["evalue"] = [np.nan]
-                        tmp_df["type_elt"] = "Promoter"
-                        tmp_df["annotation"] = "Pint_%s" %(m.name[-1])
-                        tmp_df["model"] = "NA"
-                        tmp_df.index = [m.name]
-                        tmp_df["distance_2attC"] = [np.nan]
-                        self.promoter = pd.concat([self.promoter, tmp_df])
+                        self._add_element("promoter", m.name,
+                                          integrase.pos_beg[0] - dist_prom + pos,
+                                          integrase.pos_beg[0] - dist_prom + pos + len(s),
+                                          integrase.strand[0], np.nan, "Promoter", "NA", np.nan,
+                                          "Pint_%s" % (m.name[-1]))
                 else:
                     # generator_motifs = m.instances.reverse_complement().search(seq_p_int[-dist_prom:])
                     generator_motifs = seq_p_int[-dist_prom:].search(m.reverse_complement().alignment.sequences)
                     for pos, s in generator_motifs:
-                        tmp_df = pd.DataFrame(columns=self._columns)
-                        tmp_df = tmp_df.astype(dtype=self._dtype)
-                        tmp_df["pos_beg"] = [self.integrase.pos_end.max() + pos]
-                        tmp_df["pos_end"] = [self.integrase.pos_end.max() + pos + len(s)]
-                        tmp_df["strand"] = [self.integrase.strand.values[0]]
-                        tmp_df["evalue"] = [np.nan]
-                        tmp_df["type_elt"] = "Promoter"
-                        tmp_df["annotation"] = "Pint_%s" % (m.name[-1])
-                        tmp_df["model"] = "NA"
-                        tmp_df.index = [m.name]
-                        tmp_df["distance_2attC"] = [np.nan]
-                        self.promoter = pd.concat([self.promoter, tmp_df])
-            integrase_start = int(self.integrase.pos_beg.values[0])
-            integrase_end = int(self.integrase.pos_end.values[-1])
+                        self._add_element("promoter", m.name,
+                                          max(integrase.pos_end) + pos,
+                                          max(integrase.pos_end) + pos + len(s),
+                                          integrase.strand[0], np.nan, "Promoter", "NA", np.nan,
+                                          "Pint_%s" % (m.name[-1]))
+            integrase_start = integrase.pos_beg[0]
+            integrase_end = integrase.pos_end[-1]
         ######## Promoter of K7 #########
 
         # Pc-int1
@@ -479,9 +658,9 @@ class Integron(object):
         pc_intI3.name = "Pc_int3"
         motifs_Pc.append(pc_intI3)
 
-        if not self.attC.empty:
-            attc_start = int(self.attC.pos_beg.values[0])
-            attc_end = int(self.attC.pos_end.values[-1])
+        if attC:
+            attc_start = attC.pos_beg[0]
+            attc_end = attC.pos_end[-1]
 
         if self.type() == "complete":
             if self.replicon.topology == 'circ':
@@ -501,7 +680,7 @@ class Integron(object):
                 else:
                     left = integrase_end
                     right = attc_start
-            strand_array = self.attC.strand.unique()[0]
+            strand_array = attC.strand[0]
 
         elif self.type() == "In0":
             left = integrase_start
@@ -511,7 +690,7 @@ class Integron(object):
         elif self.type() == "CALIN":
             left = attc_start
             right = attc_end
-            strand_array = self.attC.strand.unique()[0]
+            strand_array = attC.strand[0]
 
         if left < right:
             seq_Pc = self.replicon.seq[left - dist_prom:right + dist_prom]
@@ -531,18 +710,11 @@ class Integron(object):
             for sa, mo in enumerate(mot):
                 # for pos, s in mo.instances.search(seq_Pc):
                 for pos, s in seq_Pc.search(mo.alignment.sequences):
-                    tmp_df = pd.DataFrame(columns=self._columns)
-                    tmp_df = tmp_df.astype(dtype=self._dtype)
-                    tmp_df["pos_beg"] = [(left - dist_prom + pos) % self.replicon_size]
-                    tmp_df["pos_end"] = [(left - dist_prom + pos + len(s)) % self.replicon_size]
-                    tmp_df["strand"] = [strand_array] if strand_array != "both" else [sa * 2 - 1]
-                    tmp_df["evalue"] = [np.nan]
-                    tmp_df["type_elt"] = "Promoter"
-                    tmp_df["annotation"] = "Pc_%s" % (m.name[-1])
-                    tmp_df["model"] = "NA"
-                    tmp_df.index = [m.name]
-                    tmp_df["distance_2attC"] = [np.nan]
-                    self.promoter = pd.concat([self.promoter, tmp_df])
+                    self._add_element("promoter", m.name,
+                                      (left - dist_prom + pos) % self.replicon_size,
+                                      (left - dist_prom + pos + len(s)) % self.replicon_size,
+                                      strand_array if strand_array != "both" else sa * 2 - 1,
+                                      np.nan, "Promoter", "NA", np.nan, "Pc_%s" % (m.name[-1]))
 
 
     def add_attI(self):
@@ -568,13 +740,15 @@ class Integron(object):
 
         motif_attI = [attI1, attI2, attI3]
 
+        integrase = self._elements["integrase"]
+        attC = self._elements["attC"]
         if self.type() in ("CALIN", "complete"):
-            attc_start = self.attC.pos_beg.values[0]
-            attc_end = self.attC.pos_end.values[-1]
+            attc_start = attC.pos_beg[0]
+            attc_end = attC.pos_end[-1]
 
         if self.type() in ("complete", "In0"):
-            integrase_start = self.integrase.pos_beg.values[0]
-            integrase_end = self.integrase.pos_end.values[-1]
+            integrase_start = integrase.pos_beg[0]
+            integrase_end = integrase.pos_end[-1]
 
         if self.type() == "complete":
             if self.replicon.topology == 'circ':
@@ -595,16 +769,16 @@ class Integron(object):
                     left = integrase_end
                     right = attc_start
 
-            strand_array = self.attC.strand.unique()[0]
+            strand_array = attC.strand[0]
 
         elif self.type() == "In0":
-            left = int(self.integrase.pos_beg.iloc[0])
-            right = int(self.integrase.pos_end.iloc[0])
+            left = integrase.pos_beg[0]
+            right = integrase.pos_end[0]
             strand_array = "both"
         elif self.type() == "CALIN":
             left = attc_start
             right = attc_end
-            strand_array = self.attC.strand.unique()[0]
+            strand_array = attC.strand[0]
 
         if left < right:
             seq_attI = self.replicon.seq[left - dist_atti:right + dist_atti]
@@ -624,18 +798,11 @@ class Integron(object):
 
             for sa, mo in enumerate(mot):
                 for pos, s in seq_attI.search(mo.alignment.sequences):  #  mo.instances.search(seq_attI) is depprecated
-                    tmp_df = pd.DataFrame(columns=self._columns)
-                    tmp_df = tmp_df.astype(dtype=self._dtype)
-                    tmp_df["pos_beg"] = [(left - dist_atti + pos) % self.replicon_size]
-                    tmp_df["pos_end"] = [(left - dist_atti + pos + len(s)) % self.replicon_size]
-                    tmp_df["strand"] = [strand_array] if strand_array != "both" else [sa * 2 - 1]
-                    tmp_df["evalue"] = [np.nan]
-                    tmp_df["type_elt"] = "attI"
-                    tmp_df["annotation"] = f"attI_{m.name[-1]}"
-                    tmp_df["model"] = "NA"
-                    tmp_df.index = [m.name]
-                    tmp_df["distance_2attC"] = [np.nan]
-                    self.attI = pd.concat([self.attI, tmp_df])
+                    self._add_element("attI", m.name,
+                                      (left - dist_atti + pos) % self.replicon_size,
+                                      (left - dist_atti + pos + len(s)) % self.replicon_size,
+                                      strand_array if strand_array != "both" else sa * 2 - 1,
+                                      np.nan, "attI", "NA", np.nan, f"attI_{m.name[-1]}")
 
 
     def add_proteins(self, prot_db):
@@ -643,53 +810,34 @@ class Integron(object):
         :param prot_db: The protein db corresponding to the translation of the replicon
         :type prot_db: :class:`integron.prot_db.ProteinDB` object.
         """
-
-
-        def to_add(window_start, window_end, prot_attr):
-            """
-            decide if we keep the protein or not
-
-            We keep proteins (<--->) if start (<) and end (>) follows that scheme:
-
-                 ok:            <--->         <--->
-                 ok:  <--->                                    <--->
-                          ^ 200pb v                    v 200pb ^
-                                  |------integron------|
-                                window_start                 fin
-            """
-            if self.replicon.topology == 'circ':
-                s_int = (window_end - window_start) % self.replicon_size
-                return ((window_end - prot_attr.stop) % self.replicon_size < s_int) or \
-                       ((prot_attr.start - window_start) % self.replicon_size < s_int)
-            else:
-                return window_start < prot_attr.stop < window_end or window_start < prot_attr.start < window_end
-
-        attc_start = self.attC.pos_beg.values[0]
-        attc_end = self.attC.pos_end.values[-1]
+        integrase = self._elements["integrase"]
+        attC = self._elements["attC"]
+        attc_start = attC.pos_beg[0]
+        attc_end = attC.pos_end[-1]
 
         if self.has_integrase():
         
-            integrase_start = self.integrase.pos_beg.values[0]
-            integrase_end = self.integrase.pos_end.values[-1]
+            integrase_start = integrase.pos_beg[0]
+            integrase_end = integrase.pos_end[-1]
 
             if self.replicon.topology == 'circ':
                 if ((attc_start - integrase_end) % self.replicon_size >
                         (integrase_start - attc_end) % self.replicon_size):
                     # integrase on the right of attC cluster.
                     window_start = attc_start - 200
-                    window_end = self.integrase.pos_beg.min()
+                    window_end = min(integrase.pos_beg)
                 else:
-                    window_start = self.integrase.pos_end.max()
+                    window_start = max(integrase.pos_end)
                     window_end = attc_end + 200
             else:  # replicon is linear
                 if attc_end < integrase_start:
                     # integrase on the right of attC cluster.
                     window_start = max(attc_start - 200, 0)
-                    window_end = self.integrase.pos_beg.min()
+                    window_end = min(integrase.pos_beg)
 
                 else:
                     # integrase on the left of attC cluster.
-                    window_start = self.integrase.pos_end.max()
+                    window_start = max(integrase.pos_end)
                     window_end = min(attc_end + 200, self.replicon_size)
 
         else:
@@ -697,22 +845,42 @@ class Integron(object):
             window_start = attc_start - 200
             window_end = attc_end + 200
 
-        for prot_id in prot_db:
-            prot_attr = prot_db.get_description(prot_id)
-            if to_add(window_start, window_end, prot_attr):
-                prot_annot = "protein"
-                prot_evalue = np.nan
-                prot_model = "NA"
-                self.proteins.loc[prot_attr.id] = [prot_attr.start, prot_attr.stop, prot_attr.strand, prot_evalue,
-                                                   "protein", prot_model, np.nan, prot_annot]
-
-            intcols = ["pos_beg", "pos_end", "strand"]
-            floatcols = ["evalue", "distance_2attC"]
-            self.proteins[intcols] = self.proteins[intcols].astype(int)
-            self.proteins[floatcols] = self.proteins[floatcols].astype(float)
+        # We keep proteins (<--->) if start (<) and end (>) follows that scheme:
+        #
+        #      ok:            <--->         <--->
+        #      ok:  <--->                                    <--->
+        #               ^ 200pb v                    v 200pb ^
+        #                       |------integron------|
+        #                     window_start                 fin
+        #
+        # all proteins of the replicon are tested at once
+        prots = prot_db.descriptions()
+        if self.replicon.topology == 'circ':
+            s_int = (window_end - window_start) % self.replicon_size
+            to_add = ((window_end - prots.stop) % self.replicon_size < s_int) | \
+                     ((prots.start - window_start) % self.replicon_size < s_int)
+        else:
+            to_add = ((window_start < prots.stop) & (prots.stop < window_end)) | \
+                     ((window_start < prots.start) & (prots.start < window_end))
+
+        prot_nb = int(to_add.sum())
+        proteins = _Elements()
+        proteins.ids = prots.id[to_add].tolist()
+        proteins.pos_beg = prots.start[to_add].tolist()
+        proteins.pos_end = prots.stop[to_add].tolist()
+        proteins.strand = prots.strand[to_add].tolist()
+        proteins.evalue = [np.nan] * prot_nb
+        proteins.type_elt = ["protein"] * prot_nb
+        proteins.model = ["NA"] * prot_nb
+        proteins.distance_2attC = [np.nan] * prot_nb
+        proteins.annotation = ["protein"] * prot_nb
+        self._elements["proteins"] = proteins
+        self._description = None
 
     def describe(self):
         """
+        The description is computed once, then kept until an element is added to the integron.
+
         :returns: DataFrame describing the integron object
                   The columns are:
 
@@ -720,26 +888,28 @@ class Integron(object):
                   "distance_2attC", "annotation", "considered_topology"
 
         """
-        full = pd.concat([self.integrase, self.attC, self.promoter, self.attI, self.proteins])
-        full["pos_beg"] = full["pos_beg"].astype(int)
-        full["pos_end"] = full["pos_end"].astype(int)
-        full["strand"] = full["strand"].astype(int)
-        full["distance_2attC"] = full["distance_2attC"].astype(float)
-        full = full.reset_index()
-        full.columns = ["element"] + list(full.columns[1:])
-        full["type"] = self.type()
-        full["ID_replicon"] = self.replicon.id
-        full["ID_integron"] = id(self)  # uniq identifier of a given Integron
-        full["default"] = "Yes" if not self.cfg.local_max else "No"
-        try:
-            # when replicon has been got using utils.FastaIterator
-            full["considered_topology"] = self.replicon.topology
-        except AttributeError:
-            # if replicon is a bare Bio.SeqRecord
-            full["considered_topology"] = self.cfg.default_topology
-
-        full.drop_duplicates(subset=["element"], inplace=True)
-        return full
+        if self._description is None:
+            elements = [self._elements[kind] for kind in self._kinds]
+            data = {"element": [elt_id for elts in elements for elt_id in elts.ids]}
+            for col in self._columns:
+                data[col] = [value for elts in elements for value in getattr(elts, col)]
+            full = pd.DataFrame(data, columns=["element"] + self._columns)
+            full = full.astype(dtype=self._dtype)
+            full["type"] = self.type()
+            full["ID_replicon"] = self.replicon.id
+            full["ID_integron"] = id(self)  # uniq identifier of a given Integron
+            full["default"] = "Yes" if not self.cfg.local_max else "No"
+            try:
+                # when replicon has been got using utils.FastaIterator
+                full["considered_topology"] = self.replicon.topology
+            except AttributeError:
+                # if replicon is a bare Bio.SeqRecord
+                full["considered_topology"] = self.cfg.default_topology
+
+            full.drop_duplicates(subset=["element"], inplace=True)
+            self._description = full
+        # the caller may modify the description
+        return self._description.copy()
 
 
     def draw_integron(self, file=None):
@@ -805,11 +975,11 @@ class Integron(object):
         """
         :return: True if integron has integrase False otherwise.
         """
-        return not self.integrase.empty
+        return len(self._elements["integrase"]) > 0
 
 
     def has_attC(self):
         """
         :return: True if integron has attc sites False otherwise.
         """
-        return not self.attC.empty
+        return len(self._elements["attC"]) > 0
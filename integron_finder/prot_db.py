@@ -28,8 +28,11 @@
 
 from abc import ABC, abstractmethod
 import os
+import mmap
+import bisect
 import subprocess
 import shlex
+import tempfile
 from collections import namedtuple
 import re
 import importlib.util
@@ -37,9 +40,13 @@ from enum import Enum
 
 
 import colorlog
+import numpy as np
 import pandas as pd
 from Bio import SeqIO
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
 from integron_finder import IntegronError
+from integron_finder.cache import tool_version
 
 _log = colorlog.getLogger(__name__)
 
@@ -47,6 +54,9 @@ _log = colorlog.getLogger(__name__)
 """Sequence description with fields: id strand start stop"""
 SeqDesc = namedtuple('SeqDesc', ('id', 'strand', 'start', 'stop'))
 
+"""Descriptions of several sequences with fields: id strand start stop, each field is a numpy array"""
+SeqDescTable = namedtuple('SeqDescTable', ('id', 'strand', 'start', 'stop'))
+
 
 class ProteinDB(ABC):
     """
@@ -67,12 +77,13 @@ class ProteinDB(ABC):
         self._prot_file = self._make_protfile(path=prot_file)
         self._prot_db = self._make_db()
         self._pseudo_genes = set()
+        # the descriptions are parsed once, the first time they are needed
+        self._desc_index = None
+        self._desc_table = None
 
 
     def __del__(self):
-        ##### CAUTION #########
-        # self._make_db() use biopython SeqIO.index
-        # and index open a fileIO but not close it
+        # the proteins store keep the protein file mapped until it is closed
         self.close()
 
 
@@ -114,21 +125,124 @@ class ProteinDB(ABC):
     def _make_db(self):
         """
         :return: an index of the sequence contains in protfile corresponding to the replicon
+        :rtype: :class:`ProteinStore` object
         """
-        idx = SeqIO.index(self._prot_file, "fasta")
-        return idx
+        return ProteinStore(self._prot_file)
 
 
     @abstractmethod
+    def _parse_description(self, seq_id, description):
+        """
+        :param str seq_id: the id of the protein
+        :param str description: the description of the protein (the whole fasta header without '>')
+        :return: The description of the protein
+        :rtype: :class:`SeqDesc` namedtuple object
+        :raise IntegronError: when the description cannot be parsed
+        """
+        pass
+
+
+    def _read_description(self, gene_id):
+        """
+        Get the protein from the protein file and parse its description.
+
+        :param str gene_id: a protein/gene identifier
+        :return: The description of the protein corresponding to the gene_id
+        :rtype: :class:`SeqDesc` namedtuple object
+        """
+        return self._parse_description(gene_id, self[gene_id].description)
+
+
+    def _get_desc_table(self):
+        """
+        Parse all the headers of the protein file once, without parsing the sequences.
+        The proteins with a description which cannot be parsed are not in the table.
+
+        :return: the descriptions of the proteins in the order of the protein file
+        :rtype: :class:`SeqDescTable` namedtuple object
+        """
+        if self._desc_table is None:
+            index = {}
+            ids, strands, starts, stops = [], [], [], []
+            with open(self._prot_file) as prot_file:
+                for line in prot_file:
+                    if not line.startswith('>'):
+                        continue
+                    description = line[1:].rstrip()
+                    seq_id = description.split(None, 1)[0] if description else ''
+                    try:
+                        desc = self._parse_description(seq_id, description)
+                    except (IntegronError, ValueError):
+                        # the error will be reported by _read_description if this protein is requested
+                        continue
+                    index[seq_id] = len(ids)
+                    ids.append(desc.id)
+                    strands.append(desc.strand)
+                    starts.append(desc.start)
+                    stops.append(desc.stop)
+            self._desc_index = index
+            self._desc_table = SeqDescTable(np.array(ids, dtype=object),
+                                            np.array(strands, dtype=np.int64),
+                                            np.array(starts, dtype=np.int64),
+                                            np.array(stops, dtype=np.int64))
+        return self._desc_table
+
+
+    def _get_row(self, gene_id):
+        """
+        :param str gene_id: a protein/gene identifier
+        :return: the row of the gene_id in the descriptions table
+        :rtype: int
+        """
+        self._get_desc_table()
+        try:
+            return self._desc_index[gene_id]
+        except KeyError:
+            # unknown protein or description which cannot be parsed
+            # _read_description raise the right error
+            self._read_description(gene_id)
+            raise KeyError(gene_id) from None
+
+
     def get_description(self, gene_id):
         """
         :param str gene_id: a protein/gene identifier
         :return: The description of the protein corresponding to the gene_id
         :rtype: :class:`SeqDesc` namedtuple object
-        :raise IntegronError: when gene_id is not a valid Gembase gene identifier
-        :raise KeyError: if gene_id is not found in GembaseDB instance
+        :raise IntegronError: when gene_id is not a valid gene identifier
+        :raise KeyError: if gene_id is not found in ProteinDB instance
         """
-        pass
+        row = self._get_row(gene_id)
+        table = self._get_desc_table()
+        return SeqDesc(table.id[row], int(table.strand[row]), int(table.start[row]), int(table.stop[row]))
+
+
+    def get_descriptions(self, gene_ids):
+        """
+        :param gene_ids: the protein/gene identifiers
+        :type gene_ids: iterable of str
+        :return: The descriptions of the proteins corresponding to the gene_ids in the same order
+        :rtype: :class:`SeqDescTable` namedtuple object
+        :raise IntegronError: when a gene_id is not a valid gene identifier
+        :raise KeyError: if a gene_id is not found in ProteinDB instance
+        """
+        rows = np.array([self._get_row(gene_id) for gene_id in gene_ids], dtype=np.intp)
+        return SeqDescTable(*(field[rows] for field in self._get_desc_table()))
+
+
+    def descriptions(self):
+        """
+        :return: The descriptions of all proteins of the ProteinDB in the iteration order
+        :rtype: :class:`SeqDescTable` namedtuple object
+        :raise IntegronError: when a protein description cannot be parsed
+        """
+        table = self._get_desc_table()
+        if len(table.id) != len(self._prot_db):
+            # some descriptions cannot be parsed report the error for the first one
+            for seq_id in self:
+                if seq_id not in self._desc_index:
+                    self._read_description(seq_id)
+        return table
 
     @property
     def protfile(self):
@@ -219,6 +333,348 @@ class RepliconType(Enum):
         }[self.value]
 
 
+class FastaIndex:
+    """
+    The byte offsets of the records of a fasta file (like a samtools *.fai* index).
+    The records are copied as raw bytes, without parsing nor formatting the sequences.
+    The index can be kept in a :class:`integron_finder.cache.ResultCache` to be reused between runs,
+    it is rebuilt if the fasta file has been modified.
+    """
+
+    _header = '#integron_finder fasta index'
+
+    def __init__(self, fasta_path, cache=None):
+        """
+        :param str fasta_path: the path to the fasta file to index
+        :param cache: where to keep the index between runs
+        :type cache: :class:`integron_finder.cache.ResultCache` object or None
+        """
+        self.fasta_path = fasta_path
+        self._cache = cache
+        self._records = None
+
+
+    @property
+    def records(self):
+        """
+        :return: the offset of the first byte and the length in bytes of each record (header included)
+        :rtype: dict {str seq_id: (int offset, int length)}
+        """
+        if self._records is None:
+            fasta_stat = os.stat(self.fasta_path)
+            key = None
+            if self._cache:
+                key = self._cache.key('fasta_index', os.path.realpath(self.fasta_path),
+                                      str(fasta_stat.st_size), str(fasta_stat.st_mtime_ns))
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    index_path = os.path.join(tmp_dir, 'fasta.idx')
+                    if self._cache.get(key, index_path):
+                        self._records = self.load(index_path)
+            if self._records is None:
+                self._records = self.build(self.fasta_path)
+                if key:
+                    with tempfile.TemporaryDirectory() as tmp_dir:
+                        index_path = os.path.join(tmp_dir, 'fasta.idx')
+                        self.save(index_path)
+                        self._cache.put(key, index_path)
+        return self._records
+
+
+    @staticmethod
+    def scan(fasta_path):
+        """
+        Read the fasta file once to find where each record starts.
+        As in :func:`Bio.SeqIO.index` the id of a record is the first word of its header.
+
+        :param str fasta_path: the path to the fasta file to scan
+        :return: the id, the offset of the first byte and the length in bytes of each record
+                 in the order of the fasta file
+        :rtype: generator of tuple (str seq_id, int offset, int length)
+        """
+        seq_id = None
+        start = offset = 0
+        with open(fasta_path, 'rb') as fasta_file:
+            for line in fasta_file:
+                if line.startswith(b'>'):
+                    if seq_id is not None:
+                        yield seq_id, start, offset - start
+                    title = line[1:].split(None, 1)
+                    seq_id = title[0].decode() if title else ''
+                    start = offset
+                offset += len(line)
+        if seq_id is not None:
+            yield seq_id, start, offset - start
+
+
+    @classmethod
+    def build(cls, fasta_path):
+        """
+        :param str fasta_path: the path to the fasta file to index
+        :return: the offset of the first byte and the length in bytes of each record,
+                 if several records have the same id the first one is indexed.
+        :rtype: dict {str seq_id: (int offset, int length)}
+        """
+        records = {}
+        for seq_id, offset, length in cls.scan(fasta_path):
+            if seq_id not in records:
+                records[seq_id] = (offset, length)
+        return records
+
+
+    def save(self, index_path):
+        """
+        :param str index_path: the path of the index file to write
+        """
+        with open(index_path, 'w') as index_file:
+            index_file.write(f"{self._header}\n")
+            for seq_id, (offset, length) in self.records.items():
+                index_file.write(f"{seq_id}\t{offset}\t{length}\n")
+
+
+    @classmethod
+    def load(cls, index_path):
+        """
+        :param str index_path: the path of an index file written by :meth:`save`
+        :return: the offset of the first byte and the length in bytes of each record,
+                 None if the file is not a fasta index
+        :rtype: dict {str seq_id: (int offset, int length)} or None
+        """
+        records = {}
+        with open(index_path) as index_file:
+            if index_file.readline().rstrip('\n') != cls._header:
+                return None
+            for line in index_file:
+                seq_id, offset, length = line.rstrip('\n').rsplit('\t', 2)
+                records[seq_id] = (int(offset), int(length))
+        return records
+
+
+    def __contains__(self, seq_id):
+        return seq_id in self.records
+
+
+    def __len__(self):
+        return len(self.records)
+
+
+    def copy_records(self, seq_ids, dest):
+        """
+        Copy the records of the fasta file in the order of *seq_ids*.
+        The records which follow each other in the fasta file are copied with one read.
+
+        :param seq_ids: the ids of the records to copy
+        :type seq_ids: iterable of str
+        :param dest: where to write the records
+        :type dest: file object open in binary mode
+        :return: the ids which are not in the fasta file
+        :rtype: list of str
+        """
+        records = self.records
+        missing = []
+        ranges = []
+        for seq_id in seq_ids:
+            try:
+                offset, length = records[seq_id]
+            except KeyError:
+                missing.append(seq_id)
+                continue
+            if ranges and ranges[-1][1] == offset:
+                ranges[-1][1] = offset + length
+            else:
+                ranges.append([offset, offset + length])
+        with open(self.fasta_path, 'rb') as fasta_file:
+            for start, end in ranges:
+                fasta_file.seek(start)
+                data = fasta_file.read(end - start)
+                dest.write(data)
+                if not data.endswith(b'\n'):
+                    # the last record of the fasta file
+                    dest.write(b'\n')
+        return missing
+
+
+class ProteinStore:
+    """
+    A read only access to the proteins of a fasta file, the replacement of :func:`Bio.SeqIO.index`
+    for the :class:`ProteinDB`.
+    The offsets of the records are kept in arrays and the fasta file is memory mapped,
+    so a protein is parsed from the mapped bytes without reading the file,
+    and the memory used does not depend on the size of the sequences.
+    The mapping is opened the first time a protein is accessed, and it is not pickled,
+    so a store can be sent to worker processes at the cost of its offsets table.
+    """
+
+    def __init__(self, fasta_path):
+        """
+        :param str fasta_path: the path to the fasta file of the proteins
+        :raise ValueError: if several records have the same id (as :func:`Bio.SeqIO.index`)
+        """
+        self.fasta_path = fasta_path
+        ids = []
+        rows = {}
+        offsets = []
+        lengths = []
+        for seq_id, offset, length in FastaIndex.scan(fasta_path):
+            if seq_id in rows:
+                raise ValueError(f"Duplicate key '{seq_id}'")
+            rows[seq_id] = len(ids)
+            ids.append(seq_id)
+            offsets.append(offset)
+            lengths.append(length)
+        self._ids = ids
+        self._rows = rows
+        self._offsets = np.array(offsets, dtype=np.int64)
+        self._lengths = np.array(lengths, dtype=np.int64)
+        self._map = None
+
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_map'] = None
+        return state
+
+
+    def _mapped(self):
+        """
+        :return: the content of the fasta file
+        :rtype: :class:`mmap.mmap` object
+        """
+        if self._map is None:
+            with open(self.fasta_path, 'rb') as fasta_file:
+                self._map = mmap.mmap(fasta_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+
+    def raw(self, seq_id):
+        """
+        :param str seq_id: the id of a protein
+        :return: the record of the protein as it is in the fasta file (header included)
+        :rtype: bytes
+        :raise KeyError: if seq_id is not in the store
+        """
+        row = self._rows[seq_id]
+        offset = int(self._offsets[row])
+        return self._mapped()[offset:offset + int(self._lengths[row])]
+
+
+    def __getitem__(self, seq_id):
+        """
+        :param str seq_id: the id of a protein
+        :return: the protein
+        :rtype: :class:`Bio.SeqRecord.SeqRecord` object
+        :raise KeyError: if seq_id is not in the store
+        """
+        header, _, seq = self.raw(seq_id).partition(b'\n')
+        description = header[1:].rstrip().decode()
+        seq = b''.join(seq.split()).decode()
+        return SeqRecord(Seq(seq), id=seq_id, name=seq_id, description=description)
+
+
+    def __contains__(self, seq_id):
+        return seq_id in self._rows
+
+
+    def __iter__(self):
+        """
+        :return: the ids of the proteins in the order of the fasta file
+        :rtype: iterator
+        """
+        return iter(self._ids)
+
+
+    def __len__(self):
+        return len(self._ids)
+
+
+    def close(self):
+        """
+        Close the mapping of the fasta file, it is reopened if a protein is accessed
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+class GembaseGenome:
+    """
+    The LSTINFO and the proteins of a Gembase genome, shared by all the replicons (contigs) of the genome.
+    The LSTINFO is parsed once and its genes are indexed by id, so the genes of a replicon
+    are found without scanning the whole file, and the protein file is indexed once.
+    """
+
+    def __init__(self, lst_path, prot_path, cache=None):
+        """
+        :param str lst_path: the path to the LSTINFO file of the genome
+        :param str prot_path: the path to the protein file of the genome
+        :param cache: where to keep the index of the protein file between runs
+        :type cache: :class:`integron_finder.cache.ResultCache` object or None
+        """
+        self.lst_path = lst_path
+        self.prot_path = prot_path
+        self._cache = cache
+        self.gembase_type = GembaseDB.gembase_sniffer(lst_path)
+        self._info = self._read_lst()
+        ids = self._info[4].to_numpy(dtype=object)
+        # the genes sorted by id, the genes of a replicon are contiguous as their ids start with the replicon id
+        self._order = np.argsort(ids, kind='stable')
+        self._sorted_ids = ids[self._order].tolist()
+        self._proteins = None
+
+    def _read_lst(self):
+        """
+        :return: the CDS of the genome
+        :rtype: `class`:pandas.DataFrame` object
+        :raise IntegronError: when the gembase type is unknown
+        """
+        if self.gembase_type == GembaseType.DRAFT_1:
+            prots_info = GembaseDB.read_gembase1_draft(self.lst_path)
+        elif self.gembase_type == GembaseType.COMPLETE_1:
+            prots_info = GembaseDB.read_gembase1_complete(self.lst_path)
+        elif self.gembase_type.version in ('2', '2plus'):
+            prots_info = GembaseDB.read_gembase2(self.lst_path)
+        else:
+            msg = f"Unknow gembase format: {self.gembase_type}"
+            _log.critical(msg)
+            raise IntegronError(msg)
+        return prots_info
+
+    def replicon_info(self, replicon_id):
+        """
+        :param str replicon_id: the id of a replicon of the genome
+        :return: the information related to the CDS of the replicon in the LSTINFO order
+        :rtype: `class`:pandas.DataFrame` object
+        """
+        if self.gembase_type == GembaseType.DRAFT_1:
+            # ACBA.0917.00019.0001 => ACBA.0917.00019.b0001_00001 or ACBA.0917.00019.i0001_00002
+            specie, date, strain, contig = replicon_id.split('.')
+            prefixes = [f"{specie}.{date}.{strain}.{gene_type}{contig}" for gene_type in 'bi']
+        else:
+            prefixes = [replicon_id]
+        rows = []
+        for prefix in prefixes:
+            start = bisect.bisect_left(self._sorted_ids, prefix)
+            end = bisect.bisect_left(self._sorted_ids, prefix + chr(0x10ffff), lo=start)
+            rows.extend(self._order[start:end])
+        rows.sort()
+        return self._info.iloc[rows]
+
+    @property
+    def proteins(self):
+        """
+        :return: the byte offsets of the proteins of the genome
+        :rtype: :class:`FastaIndex` object
+        """
+        if self._proteins is None:
+            self._proteins = FastaIndex(self.prot_path, cache=self._cache)
+        return self._proteins
+
+    def close(self):
+        """
+        Release the index of the protein file
+        """
+        self._proteins = None
+
+
 class GembaseDB(ProteinDB):
     """
     Implements :class:`ProteinDB` from a Gembase.
@@ -234,6 +690,9 @@ class GembaseDB(ProteinDB):
         GembaseType.DRAFT_1: r'(\w{4})\.(\d{4})\.(\d{5})\.(?P<g_type>[ib])(\d{4})_(\d{5})'
     }
 
+    # (key, genome) of the last GembaseDB created, the genome is shared by all replicons of this genome
+    _genome_cache = None
+
     _rep_patterns = [
         r'(\w+)\.(\d{4})\.(\d{5})\.(\d{3,4})(?P<g_type>[CPVOD])',  # Complete + Draft V2_plus
         r'(\w{7})\.(\d{4})\.(\d{5})\.(\d{3})(?P<g_type>[CPVO])',  # Complete V2
@@ -274,13 +733,17 @@ class GembaseDB(ProteinDB):
         self._lst_dir = self.get_lst_dir(self._gembase_path)
         self._gembase_file_basename = self.find_gembase_file_basename(self._gembase_path, self.cfg.input_seq_path)
         self._lst_path = self._get_lst_path()
-
-        self._gembase_type = self.gembase_sniffer(self._lst_path)
+        self._genome = self.get_genome(self._lst_path,
+                                       os.path.join(self._gembase_path, 'Proteins',
+                                                    self._gembase_file_basename + '.prt'),
+                                       cache=self.cfg.result_cache)
+        self._gembase_type = self._genome.gembase_type
         self._replicon_name = os.path.splitext(os.path.basename(self.cfg.input_seq_path))[0]
-        self._info = self._parse_lst(self._lst_path)
+        self._info = self._genome.replicon_info(self.replicon.id)
         if self._info.empty:
             msg = f"No CDS reported in {self._lst_path} for the replicon {replicon.id} ."
             _log.warning(msg)
+        self._desc_index, self._desc_table = self._index_genes(self._info)
         self.replicon_tye = self.get_replicon_type(seq_id=self.replicon.id)
         if prot_file is None:
             self._prot_file = self._make_protfile()
@@ -316,25 +779,31 @@ class GembaseDB(ProteinDB):
         return lst_path
 
 
-    def _parse_lst(self, lst_path):
-        """
-        Parse the LSTINFO file and extract information specific to the replicon
-        :return: `class`:pandas.DataFrame` object
-        :raise IntegronError: when LST dir is not found
-        """
-        if self.gembase_type == GembaseType.DRAFT_1:
-            prots_info = self.gembase1_draft_parser(lst_path, self.replicon.id)
-        elif self.gembase_type == GembaseType.COMPLETE_1:
-            prots_info = self.gembase1_complete_parser(lst_path, self.replicon.id)
-        elif self.gembase_type.version == '2':
-            prots_info = self.gembase2_parser(lst_path, self.replicon.id)
-        elif self.gembase_type.version == '2plus':
-            prots_info = self.gembase2_parser(lst_path, self.replicon.id)
-        else:
-            msg = f"Unknow gembase format: {self.gembase_type}"
-            _log.critical(msg)
-            raise IntegronError(msg)
-        return prots_info
+    @classmethod
+    def get_genome(cls, lst_path, prot_path, cache=None):
+        """
+        All replicons of a Gembase genome share the same LSTINFO and protein files,
+        they are parsed and indexed once for the genome, then reused until an other genome is used.
+
+        :param str lst_path: the path to the LSTINFO file of the genome
+        :param str prot_path: the path to the protein file of the genome
+        :param cache: where to keep the index of the protein file between runs
+        :type cache: :class:`integron_finder.cache.ResultCache` object or None
+        :return: the genome
+        :rtype: :class:`GembaseGenome` object
+        """
+        # the genome is parsed again if one of its files has been modified
+        lst_stat = os.stat(lst_path)
+        prot_stat = os.stat(prot_path)
+        key = (lst_path, lst_stat.st_size, lst_stat.st_mtime_ns,
+               prot_path, prot_stat.st_size, prot_stat.st_mtime_ns)
+        if cls._genome_cache is None or cls._genome_cache[0] != key:
+            if cls._genome_cache is not None:
+                cls._genome_cache[1].close()
+            # set it only when the genome is parsed (parsing can fail)
+            genome = GembaseGenome(lst_path, prot_path, cache=cache)
+            cls._genome_cache = (key, genome)
+        return cls._genome_cache[1]
 
 
     @classmethod
@@ -396,22 +865,17 @@ class GembaseDB(ProteinDB):
         if path:
             prot_file_path = path
         else:
-            all_prot_path = os.path.join(self._gembase_path, 'Proteins', self._gembase_file_basename + '.prt')
-            try:
-                all_prots = SeqIO.index(all_prot_path, "fasta")
-                if not os.path.exists(self.cfg.tmp_dir(self.replicon.id)):
-                    os.makedirs(self.cfg.tmp_dir(self.replicon.id))
-                prot_file_path = os.path.join(self.cfg.tmp_dir(self.replicon.id), self.replicon.id + '.prt')
-                with open(prot_file_path, 'w') as prot_file:
-                    for seq_id in self._info[4]:
-                        try:
-                            seq = all_prots[seq_id]
-                            SeqIO.write(seq, prot_file, 'fasta')
-                        except KeyError:
-                            self._pseudo_genes.add(seq_id)
-                            _log.warning(f'Sequence describe in LSTINF file {seq_id} is not present in {all_prot_path}')
-            finally:
-                all_prots.close()
+            all_prot_path = self._genome.prot_path
+            if not os.path.exists(self.cfg.tmp_dir(self.replicon.id)):
+                os.makedirs(self.cfg.tmp_dir(self.replicon.id))
+            prot_file_path = os.path.join(self.cfg.tmp_dir(self.replicon.id), self.replicon.id + '.prt')
+            # the protein file is indexed once for all replicons of the genome
+            # and the records are copied as they are in the gembase protein file
+            with open(prot_file_path, 'wb') as prot_file:
+                missing = self._genome.proteins.copy_records(self._info[4], prot_file)
+            for seq_id in missing:
+                self._pseudo_genes.add(seq_id)
+                _log.warning(f'Sequence describe in LSTINF file {seq_id} is not present in {all_prot_path}')
 
         return prot_file_path
 
@@ -512,11 +976,10 @@ class GembaseDB(ProteinDB):
 
 
     @staticmethod
-    def gembase1_complete_parser(lst_path, sequence_id):
+    def read_gembase1_complete(lst_path):
         """
         :param str lst_path: the path of the LSTINFO file Gembase Complet
-        :param str sequence_id: the id of the genomic sequence to analyse
-        :return: the information related to the 'valid' CDS corresponding to the sequence_id
+        :return: the information related to the 'valid' CDS of all the sequences of the LSTINFO
         :rtype: `class`:pandas.DataFrame` object
         """
         dtype = {0: 'int', # start
@@ -537,19 +1000,29 @@ class GembaseDB(ProteinDB):
 
             lst = pd.DataFrame(lst_data)
             lst = lst.astype(dtype)
-            genome_info = lst.loc[lst[4].str.contains(sequence_id, regex=True)]
-            prots_info = genome_info.loc[(genome_info[3] == 'CDS') & (genome_info[5] == 'Valid')]
+            prots_info = lst.loc[(lst[3] == 'CDS') & (lst[5] == 'Valid')]
             return prots_info
 
 
     @staticmethod
-    def gembase1_draft_parser(lst_path, replicon_id):
+    def gembase1_complete_parser(lst_path, sequence_id):
         """
-        :param str lst_path: the path of the LSTINFO file from a Gembase Draft
+        :param str lst_path: the path of the LSTINFO file Gembase Complet
         :param str sequence_id: the id of the genomic sequence to analyse
         :return: the information related to the 'valid' CDS corresponding to the sequence_id
         :rtype: `class`:pandas.DataFrame` object
         """
+        prots_info = GembaseDB.read_gembase1_complete(lst_path)
+        return prots_info.loc[prots_info[4].str.contains(sequence_id, regex=True)]
+
+
+    @staticmethod
+    def read_gembase1_draft(lst_path):
+        """
+        :param str lst_path: the path of the LSTINFO file from a Gembase Draft
+        :return: the information related to the CDS of all the sequences of the LSTINFO
+        :rtype: `class`:pandas.DataFrame` object
+        """
         try:
             lst = pd.read_csv(lst_path,
                               header=None,
@@ -558,26 +1031,35 @@ class GembaseDB(ProteinDB):
             msg = f"Error while parsing {lst_path} file: {err}"
             _log.error(msg)
             raise IntegronError(msg)
-        specie, date, strain, contig = replicon_id.split('.')
-        pattern = fr'{specie}\.{date}\.{strain}\.[bi]{contig}'
-        try:
-            genome_info = lst.loc[lst[4].str.contains(pattern, regex=True)]
-        except KeyError:
+        if 4 not in lst.columns:
             msg = f"The LST file '{lst_path}' seems not to be in gembase V1 draft format."
             _log.error(msg)
             raise IntegronError(msg) from None
-        prots_info = genome_info.loc[genome_info[3] == 'CDS']
+        prots_info = lst.loc[lst[3] == 'CDS']
         return prots_info
 
 
     @staticmethod
-    def gembase2_parser(lst_path, replicon_id):
+    def gembase1_draft_parser(lst_path, replicon_id):
         """
         :param str lst_path: the path of the LSTINFO file from a Gembase Draft
         :param str sequence_id: the id of the genomic sequence to analyse
         :return: the information related to the 'valid' CDS corresponding to the sequence_id
         :rtype: `class`:pandas.DataFrame` object
         """
+        prots_info = GembaseDB.read_gembase1_draft(lst_path)
+        specie, date, strain, contig = replicon_id.split('.')
+        pattern = fr'{specie}\.{date}\.{strain}\.[bi]{contig}'
+        return prots_info.loc[prots_info[4].str.contains(pattern, regex=True)]
+
+
+    @staticmethod
+    def read_gembase2(lst_path):
+        """
+        :param str lst_path: the path of the LSTINFO file from a Gembase
+        :return: the information related to the CDS of all the sequences of the LSTINFO
+        :rtype: `class`:pandas.DataFrame` object
+        """
         try:
             lst = pd.read_csv(lst_path,
                               header=None,
@@ -592,8 +1074,25 @@ class GembaseDB(ProteinDB):
             dtype = {i: 'str' for i in range(lst.shape[1])}
             dtype[0] = dtype[1] = 'int'
             lst = lst.astype(dtype)
-            genome_info = lst.loc[lst[4].str.contains(replicon_id, regex=True)]
-            prots_info = genome_info.loc[genome_info[3] == 'CDS']
+            prots_info = lst.loc[lst[3] == 'CDS']
+        except Exception:
+            msg = f"The LST file '{lst_path}' seems not to be in gembase V2 draft format."
+            _log.error(msg)
+            raise IntegronError(msg) from None
+        return prots_info
+
+
+    @staticmethod
+    def gembase2_parser(lst_path, replicon_id):
+        """
+        :param str lst_path: the path of the LSTINFO file from a Gembase Draft
+        :param str sequence_id: the id of the genomic sequence to analyse
+        :return: the information related to the 'valid' CDS corresponding to the sequence_id
+        :rtype: `class`:pandas.DataFrame` object
+        """
+        prots_info = GembaseDB.read_gembase2(lst_path)
+        try:
+            prots_info = prots_info.loc[prots_info[4].str.contains(replicon_id, regex=True)]
         except Exception:
             msg = f"The LST file '{lst_path}' seems not to be in gembase V2 draft format."
             _log.error(msg)
@@ -601,6 +1100,95 @@ class GembaseDB(ProteinDB):
         return prots_info
 
 
+    @staticmethod
+    def _gene_key(gene_id):
+        """
+        :param str gene_id: a Gembase gene identifier
+        :return: the normalized gene identifier: the first character of the contig/gene part is removed
+                 for instance ACBA.0917.00019.i0001_00298 and ACBA.0917.00019.b0001_00298 give
+                 the same key ('ACBA', '0917', '00019', '0001_00298')
+        :rtype: tuple of 4 str
+        :raise ValueError: if gene_id is not made of 4 fields separated by a dot
+        """
+        specie, date, strain, contig_gene = gene_id.split('.')
+        return specie, date, strain, contig_gene[1:]
+
+
+    @classmethod
+    def _index_genes(cls, info):
+        """
+        Index the genes of the replicon once, so that :meth:`get_description` does not need
+        to scan the whole LSTINFO for each gene.
+
+        :param info: the LSTINFO information related to the replicon (see :meth:`_parse_lst`)
+        :type info: `class`:pandas.DataFrame` object
+        :return: the normalized gene id (see :meth:`_gene_key`) associated to its row in the descriptions table,
+                 and the descriptions table
+        :rtype: tuple (dict, :class:`SeqDescTable` namedtuple object)
+        """
+        gene_index = {}
+        for row, seq_id in enumerate(info[4]):
+            try:
+                # keep the first gene like the former regex based lookup
+                gene_index.setdefault(cls._gene_key(seq_id), row)
+            except ValueError:
+                continue
+        table = SeqDescTable(info[4].to_numpy(dtype=object),
+                             np.where(info[2].to_numpy() == "D", 1, -1).astype(np.int64),
+                             info[0].to_numpy(dtype=np.int64),
+                             info[1].to_numpy(dtype=np.int64))
+        return gene_index, table
+
+
+    def _parse_description(self, seq_id, description):
+        """
+        The headers of the Gembase protein files do not contain the coordinates of the genes,
+        the description is taken from the LSTINFO file.
+
+        :param str seq_id: the id of the protein
+        :param str description: the description of the protein (not used)
+        :return: The description of the protein
+        :rtype: :class:`SeqDesc` namedtuple object
+        :raise IntegronError: when seq_id is not a valid Gembase gene identifier
+        :raise KeyError: if seq_id is not found in GembaseDB instance
+        """
+        return self.get_description(seq_id)
+
+
+    def _get_desc_table(self):
+        """
+        :return: the descriptions of the genes of the replicon in the LSTINFO order
+        :rtype: :class:`SeqDescTable` namedtuple object
+        """
+        return self._desc_table
+
+
+    def _get_row(self, gene_id):
+        """
+        :param str gene_id: a protein/gene identifier
+        :return: the row of the gene_id in the descriptions table
+        :rtype: int
+        :raise IntegronError: when gene_id is not a valid Gembase gene identifier
+        :raise KeyError: if gene_id is not found in GembaseDB instance
+        """
+        try:
+            key = self._gene_key(gene_id)
+        except ValueError:
+            raise IntegronError(f"'{gene_id}' is not a valid Gembase protein identifier.")
+        try:
+            return self._desc_index[key]
+        except KeyError:
+            raise KeyError(gene_id) from None
+
+
+    def descriptions(self):
+        """
+        :return: The descriptions of all genes of the replicon (genes and pseudogenes) in the iteration order
+        :rtype: :class:`SeqDescTable` namedtuple object
+        """
+        return self._desc_table
+
+
     def __getitem__(self, prot_seq_id):
         """
         :param str prot_seq_id: the id of a protein sequence
@@ -629,39 +1217,14 @@ class GembaseDB(ProteinDB):
         return (seq_id for seq_id in coding_seqid)
 
 
-    def get_description(self, gene_id):
-        """
-        :param str gene_id: a protein/gene identifier
-        :return: The description of the protein corresponding to the gene_id
-        :rtype: :class:`SeqDesc` namedtuple object
-        :raise IntegronError: when gene_id is not a valid Gembase gene identifier
-        :raise KeyError: if gene_id is not found in GembaseDB instance
-        """
-        try:
-            specie, date, strain, contig_gene = gene_id.split('.')
-            contig_gene = contig_gene[1:]  # remove the first letter b/i
-        except ValueError:
-            raise IntegronError(f"'{gene_id}' is not a valid Gembase protein identifier.")
-        pattern = fr'{specie}\.{date}\.{strain}\.\w?{contig_gene}'
-        seq_info = self._info.loc[self._info[4].str.contains(pattern, regex=True)]
-        if not seq_info.empty:
-            return SeqDesc(seq_info[4].values[0],
-                           1 if seq_info[2].values[0] == "D" else -1,
-                           seq_info[0].values[0],
-                           seq_info[1].values[0],
-                           )
-        else:
-            raise KeyError(gene_id)
-
-
-
-
-
 class ProdigalDB(ProteinDB):
     """
     Creates proteins from Replicon/contig using prodigal and provide facilities to access them.
     """
 
+    # the replicons up to this length are analysed in metagenomic mode
+    meta_max_len = 200000
+
 
     def _make_protfile(self, path=None):
         """
@@ -678,24 +1241,64 @@ class ProdigalDB(ProteinDB):
                 os.makedirs(self.cfg.tmp_dir(self.replicon.id))
             prot_file_path = os.path.join(self.cfg.tmp_dir(self.replicon.id), self.replicon.id + ".prt")
             if not os.path.exists(prot_file_path):
-                prodigal_cmd = '{prodigal} {meta} -i {replicon} -a {prot} -o {out} -q '.format(
-                    prodigal=self.cfg.prodigal.replace(' ', '\\ '),
-                    meta='' if len(self.replicon) > 200000 else '-p meta',
-                    replicon=self.replicon.path.replace(' ', '\\ '),
-                    prot=prot_file_path.replace(' ', '\\ '),
-                    out=os.devnull,
-                )
-                try:
-                    _log.debug("run prodigal: {}".format(prodigal_cmd))
-                    completed_process = subprocess.run(shlex.split(prodigal_cmd))
-                except Exception as err:
-                    raise RuntimeError(f"{prodigal_cmd} : failed : {err}")
-                if completed_process.returncode != 0:
-                    raise RuntimeError(f"{prodigal_cmd} : failed : prodigal returncode = {completed_process.returncode}")
+                meta = self.meta_option(len(self.replicon))
+                cache = self.cfg.result_cache
+                if cache:
+                    # the proteins ids are built from the replicon id
+                    cache_key = cache.key('prodigal', tool_version(self.cfg.prodigal), meta,
+                                          self.replicon.id, str(self.replicon.seq))
+                    if not cache.get(cache_key, prot_file_path):
+                        self._run_prodigal(prot_file_path, meta)
+                        cache.put(cache_key, prot_file_path)
+                else:
+                    self._run_prodigal(prot_file_path, meta)
 
         return prot_file_path
 
 
+    @staticmethod
+    def meta_option(replicon_len):
+        """
+        :param int replicon_len: the length of the replicon
+        :return: the prodigal option to use the metagenomic mode for the short replicons or ''
+        :rtype: str
+        """
+        return '' if replicon_len > ProdigalDB.meta_max_len else '-p meta'
+
+
+    def _run_prodigal(self, prot_file_path, meta):
+        """
+        :param str prot_file_path: the path of the proteins file to create
+        :param str meta: the prodigal option to use the metagenomic mode or ''
+        """
+        self.run_prodigal(self.cfg.prodigal, self.replicon.path, prot_file_path, meta)
+
+
+    @staticmethod
+    def run_prodigal(prodigal, seq_path, prot_file_path, meta):
+        """
+        :param str prodigal: the path to the prodigal binary
+        :param str seq_path: the path of the nucleic sequences in fasta format
+        :param str prot_file_path: the path of the proteins file to create
+        :param str meta: the prodigal option to use the metagenomic mode or ''
+        :raise RuntimeError: if prodigal failed
+        """
+        prodigal_cmd = '{prodigal} {meta} -i {replicon} -a {prot} -o {out} -q '.format(
+            prodigal=prodigal.replace(' ', '\\ '),
+            meta=meta,
+            replicon=seq_path.replace(' ', '\\ '),
+            prot=prot_file_path.replace(' ', '\\ '),
+            out=os.devnull,
+        )
+        try:
+            _log.debug("run prodigal: {}".format(prodigal_cmd))
+            completed_process = subprocess.run(shlex.split(prodigal_cmd))
+        except Exception as err:
+            raise RuntimeError(f"{prodigal_cmd} : failed : {err}")
+        if completed_process.returncode != 0:
+            raise RuntimeError(f"{prodigal_cmd} : failed : prodigal returncode = {completed_process.returncode}")
+
+
     def __getitem__(self, prot_seq_id):
         """
         :param str prot_seq_id: the id of a protein sequence
@@ -724,25 +1327,118 @@ class ProdigalDB(ProteinDB):
         return self.__iter__()
 
 
-    def get_description(self, gene_id):
+    def _parse_description(self, seq_id, description):
         """
-        :param str gene_id: a protein/gene identifier
-        :returns: The description of the protein corresponding to the gene_id
+        :param str seq_id: the id of the protein
+        :param str description: the description of the protein generated by prodigal
+        :returns: The description of the protein corresponding to the seq_id
         :rtype: :class:`SeqDesc` namedtuple object
-        :raise IntegronError: when gene_id is not a valid Gembase gene identifier
-        :raise KeyError: if gene_id is not found in ProdigalDB instance
+        :raise IntegronError: when the description is not a valid Prodigal description
         """
-        seq = self[gene_id]
         try:
-            id_, start, stop, strand, *_ = seq.description.split(" # ")
+            id_, start, stop, strand, *_ = description.split(" # ")
         except ValueError:
-            raise IntegronError(f"'{gene_id}' is not a valid Prodigal protein identifier.")
+            raise IntegronError(f"'{seq_id}' is not a valid Prodigal protein identifier.")
         start = int(start)
         stop = int(stop)
         strand = int(strand)
         return SeqDesc(id_, strand, start, stop)
 
 
+def prodigal_batch(replicons, cfg, out_dir):
+    """
+    Predict the proteins of all the short replicons with one prodigal run in metagenomic mode,
+    instead of one run per replicon.
+    In metagenomic mode each sequence is analysed independently, so the proteins of each replicon
+    are split in the protein file used by :meth:`ProdigalDB._make_protfile`
+    with the same ids and coordinates as a replicon by replicon run.
+    The replicons which are too long for the metagenomic mode or which already have a protein file
+    (from a previous run or from the cache) are skipped.
+
+    :param replicons: the replicons to analyse
+    :type replicons: iterable of :class:`Bio.SeqRecord` objects
+    :param cfg: The integron_finder configuration
+    :type cfg: :class:`integron_finder.config.Config` object
+    :param str out_dir: the directory where to write the sequences and the proteins of the batch
+    :return: the path of the protein file of each replicon analysed by the batch
+    :rtype: dict {str replicon_id: str prot_file_path}
+    :raise RuntimeError: if prodigal failed
+    """
+    assert cfg.prodigal, "'prodigal' not found."
+    meta = '-p meta'
+    cache = cfg.result_cache
+    batch = []
+    seq_path = os.path.join(out_dir, 'prodigal_batch.fst')
+    with open(seq_path, 'w') as seq_file:
+        for replicon in replicons:
+            if ProdigalDB.meta_option(len(replicon)) != meta:
+                continue
+            prot_file_path = os.path.join(cfg.tmp_dir(replicon.id), replicon.id + ".prt")
+            if os.path.exists(prot_file_path):
+                continue
+            os.makedirs(cfg.tmp_dir(replicon.id), exist_ok=True)
+            cache_key = None
+            if cache:
+                # the same key as ProdigalDB._make_protfile
+                cache_key = cache.key('prodigal', tool_version(cfg.prodigal), meta,
+                                      replicon.id, str(replicon.seq))
+                if cache.get(cache_key, prot_file_path):
+                    continue
+            SeqIO.write(replicon, seq_file, 'fasta')
+            batch.append((replicon.id, prot_file_path, cache_key))
+    prot_path = os.path.join(out_dir, 'prodigal_batch.prt')
+    try:
+        if batch:
+            _log.info(f"Predicting the proteins of {len(batch)} replicons with one prodigal run")
+            ProdigalDB.run_prodigal(cfg.prodigal, seq_path, prot_path, meta)
+            _split_prodigal_batch(prot_path, [prot_file_path for _, prot_file_path, _ in batch])
+            if cache:
+                for _, prot_file_path, cache_key in batch:
+                    cache.put(cache_key, prot_file_path)
+    finally:
+        if not cfg.keep_tmp:
+            for path in (seq_path, prot_path):
+                if os.path.exists(path):
+                    os.unlink(path)
+    return {rep_id: prot_file_path for rep_id, prot_file_path, _ in batch}
+
+
+def _split_prodigal_batch(prot_path, prot_file_paths):
+    """
+    Split the proteins predicted by prodigal on several sequences, sequence by sequence.
+    The *ID* field of the description (<sequence number>_<gene number>) is renumbered
+    as if each sequence had been analysed alone.
+
+    :param str prot_path: the proteins of all the sequences
+    :param prot_file_paths: the path of the protein file of each sequence in the order of the prodigal input
+    :type prot_file_paths: list of str
+    :raise RuntimeError: if a protein does not belong to any sequence
+    """
+    id_field = re.compile(r' # ID=(\d+)_')
+    files = [open(path, 'w') for path in prot_file_paths]
+    try:
+        prot_file = None
+        with open(prot_path) as all_prots:
+            for line in all_prots:
+                if line.startswith('>'):
+                    match = id_field.search(line)
+                    if match is None or not 0 < int(match.group(1)) <= len(files):
+                        raise RuntimeError(f"Cannot find the sequence of the protein '{line.rstrip()}' "
+                                           f"in prodigal results {prot_path}")
+                    prot_file = files[int(match.group(1)) - 1]
+                    line = f"{line[:match.start()]} # ID=1_{line[match.end():]}"
+                if prot_file is not None:
+                    prot_file.write(line)
+    except BaseException:
+        for f, path in zip(files, prot_file_paths):
+            f.close()
+            os.unlink(path)
+        raise
+    else:
+        for f in files:
+            f.close()
+
+
 class CustomDB(ProteinDB):
     """
     Creates proteins from Replicon/contig using prodigal and provide facilities to access them.
@@ -751,16 +1447,36 @@ class CustomDB(ProteinDB):
 
     def __init__(self, replicon, cfg, prot_file):
         super().__init__(replicon, cfg, prot_file=prot_file)
+        self._parser = self._load_parser()
+
+
+    def _load_parser(self):
+        """
+        :return: the *description_parser* function of the custom --annot-parser module
+        :raise RuntimeError: if the module cannot be imported
+        """
         try:
             parser_path = self.cfg.annot_parser
             spec = importlib.util.spec_from_file_location('custom_module', parser_path)
             custom_module = importlib.util.module_from_spec(spec)
             spec.loader.exec_module(custom_module)
-            self._parser = custom_module.description_parser
+            return custom_module.description_parser
         except Exception as err:
             raise RuntimeError(f"Cannot import custom --annot-parser '{parser_path}': {err}")
 
 
+    def __getstate__(self):
+        # the custom module is not importable by name, it is loaded again when unpickled
+        state = self.__dict__.copy()
+        del state['_parser']
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._parser = self._load_parser()
+
+
     def _make_protfile(self, path=None):
         if path is None:
             raise IntegronError("If use CustomDB prot_file must be specified")
@@ -797,13 +1513,13 @@ class CustomDB(ProteinDB):
         return self.__iter__()
 
 
-    def get_description(self, gene_id):
+    def _parse_description(self, seq_id, description):
         """
-        :param str gene_id: a protein/gene identifier
-        :returns: The description of the protein corresponding to the gene_id
+        :param str seq_id: the id of the protein
+        :param str description: the description of the protein
+        :returns: The description of the protein parsed with the custom --annot-parser
         :rtype: :class:`SeqDesc` namedtuple object
-        :raise IntegronError: when gene_id is not a valid Gembase gene identifier
-        :raise KeyError: if gene_id is not found in ProdigalDB instance
+        :raise IntegronError: when the description cannot be parsed by the custom --annot-parser
         """
         def check_id(x):
             return isinstance(x, str)
@@ -816,22 +1532,33 @@ class CustomDB(ProteinDB):
 
         check_stop = check_start
 
-        seq = self[gene_id]
-
         try:
-            id_, start, stop, strand = self._parser(seq.description)
+            id_, start, stop, strand = self._parser(description)
         except ValueError:
-            msg = f"'{gene_id}' protein is not compliant with custom --annot-parser '{self.cfg.annot_parser}'."
-            _log.critical(msg)
+            msg = f"'{seq_id}' protein is not compliant with custom --annot-parser '{self.cfg.annot_parser}'."
             raise IntegronError(msg)
         except Exception as err:
             msg = f"Cannot parse protein file '{self._prot_file}' with annot-parser '{self.cfg.annot_parser}': {err}"
-            _log.critical(msg)
             raise IntegronError(msg) from None
 
         if not all((check_id(id_), check_start(start), check_stop(stop), check_strand(strand))):
             msg = "Error during protein file parsing: expected seq_id: str, start: positive int, stop: positive int, " \
                   f"strand 1/-1. got: {id_}, {start}, {stop}, {strand}"
-            _log.critical(msg)
             raise IntegronError(msg)
         return SeqDesc(id_, strand, start, stop)
+
+
+    def _read_description(self, gene_id):
+        """
+        Get the protein from the protein file and parse its description.
+
+        :param str gene_id: a protein/gene identifier
+        :return: The description of the protein corresponding to the gene_id
+        :rtype: :class:`SeqDesc` namedtuple object
+        """
+        seq = self[gene_id]
+        try:
+            return self._parse_description(gene_id, seq.description)
+        except IntegronError as err:
+            _log.critical(str(err))
+            raise
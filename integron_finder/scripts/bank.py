@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+####################################################################################
+# Integron_Finder - Integron Finder aims at detecting integrons in DNA sequences   #
+# by finding particular features of the integron:                                  #
+#   - the attC sites                                                               #
+#   - the integrase                                                                #
+#   - and when possible attI site and promoters.                                   #
+#                                                                                  #
+# Authors: Jean Cury, Bertrand Neron, Eduardo PC Rocha                             #
+# Copyright (c) 2015 - 2025  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                               #
+#                                                                                  #
+# integron_finder is free software: you can redistribute it and/or modify          #
+# it under the terms of the GNU General Public License as published by             #
+# the Free Software Foundation, either version 3 of the License, or                #
+# (at your option) any later version.                                              #
+#                                                                                  #
+# integron_finder is distributed in the hope that it will be useful,               #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of                   #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                    #
+# GNU General Public License for more details.                                     #
+#                                                                                  #
+# You should have received a copy of the GNU General Public License                #
+# along with this program (COPYING file).                                          #
+# If not, see <http://www.gnu.org/licenses/>.                                      #
+####################################################################################
+import sys
+import argparse
+
+import integron_finder
+
+# must be done after import 'integron_finder'
+import colorlog
+
+from integron_finder import logger_set_level
+from integron_finder import utils
+from integron_finder.hmm import scan_hmm_bank
+from integron_finder.bank import build_bank
+
+_log = None
+
+
+def parse_args(args):
+    """
+
+    :param args: The arguments passed on the command line (without the name of the program)
+                 Typically sys.argv[1:]
+    :type args: list of string.
+    :return: the arguments parsed.
+    :rtype: a :class:`argparse.Namespace` object.
+    """
+    parser = argparse.ArgumentParser(formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     description="Manage the banks of hmm profiles used for the functional annotation.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build',
+                                         help="Compile hmm files in one bank. "
+                                              "The bank can be used with 'integron_finder --path-func-annot'.")
+    build_parser.add_argument('hmm',
+                              help="The hmm files to compile: a directory containing .hmm files "
+                                   "or a file with one path (or glob expression) per line "
+                                   "as for 'integron_finder --path-func-annot'")
+    build_parser.add_argument('bank',
+                              help="The path to the bank directory, it is created if needed.")
+    build_parser.add_argument('--force',
+                              action='store_true',
+                              default=False,
+                              help="Rebuild the bank even if the hmm files have not changed.")
+
+    verbosity_grp = parser.add_argument_group()
+    verbosity_grp.add_argument('-v', '--verbose',
+                               action='count',
+                               default=0,
+                               help='Increase verbosity of output (can be cumulative : -vv)')
+    verbosity_grp.add_argument('-q', '--quiet',
+                               action='count',
+                               default=0,
+                               help='Decrease verbosity of output (can be cumulative : -qq)'
+                               )
+    parsed_args = parser.parse_args(args)
+    return parsed_args
+
+
+def main(args=None, log_level=None):
+    """
+     main entry point to integron_bank
+
+    :param str args: the arguments passed on the command line
+    :param log_level: the output verbosity
+    :type log_level: a positive int or a string among 'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'
+    """
+    global _log
+
+    args = sys.argv[1:] if args is None else args
+    parsed_args = parse_args(args)
+
+    integron_finder.init_logger()
+    _log = colorlog.getLogger('integron_finder.bank')
+
+    if not log_level:
+        # logs are specify from args options
+        logger_set_level(utils.log_level(parsed_args.verbose, parsed_args.quiet))
+    else:
+        # used by unit tests to mute or unmute logs
+        logger_set_level(log_level)
+
+    if parsed_args.command == 'build':
+        try:
+            hmm_files = scan_hmm_bank(parsed_args.hmm)
+            build_bank(hmm_files, parsed_args.bank, force=parsed_args.force)
+        except (ValueError, OSError) as err:
+            _log.critical(f"Cannot build the bank '{parsed_args.bank}': {err}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
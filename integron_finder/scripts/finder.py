@@ -35,6 +35,8 @@ import os
 import sys
 import argparse
 import shutil
+import collections
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import pandas as pd
 pd.options.mode.chained_assignment = 'raise'
@@ -52,13 +54,13 @@ from integron_finder import results
 from integron_finder import __commit__ as _if_commit , __version__ as _if_version
 from integron_finder.topology import Topology
 from integron_finder.config import Config
-from integron_finder.hmm import scan_hmm_bank
-from integron_finder.integrase import find_integrase
+from integron_finder.hmm import scan_hmm_bank, hmm_result_exists
+from integron_finder.integrase import find_integrase, find_integrase_batch
 from integron_finder.attc import find_attc_max
-from integron_finder.infernal import find_attc
+from integron_finder.infernal import find_attc, find_attc_batch
 from integron_finder.integron import find_integron
 from integron_finder.annotation import func_annot, add_feature
-from integron_finder.prot_db import GembaseDB, ProdigalDB, CustomDB
+from integron_finder.prot_db import GembaseDB, ProdigalDB, CustomDB, prodigal_batch
 from integron_finder import argparse_utils
 
 
@@ -85,6 +87,23 @@ def parse_args(args):
                         type=int,
                         help='Number of CPUs used by INFERNAL and HMMER. Increasing too much (usually above 4) may decrease performance.')
 
+    parser.add_argument('--jobs',
+                        default=1,
+                        type=int,
+                        help='Number of replicons analysed in parallel. '
+                             'The CPUs set with --cpu are shared between the jobs (default: 1)')
+
+    parser.add_argument('--cache-dir',
+                        help='Directory where the results of prodigal, hmmsearch and cmsearch are kept between runs. '
+                             'The results are reused if the sequence, the model, the tool version '
+                             'and the options are the same (default: no cache)')
+
+    parser.add_argument('--cache-size',
+                        default=2048,
+                        type=float,
+                        help='The maximum size of the cache directory in MiB, '
+                             'the least recently used results are removed first (default: 2048)')
+
     parser.add_argument('-dt', '--distance-thresh',
                         dest='distance_threshold',
                         default=4000,
@@ -145,6 +164,35 @@ def parse_args(args):
                         type=float,
                         help='Set evalue threshold to filter out hits above it (default: 1)')
 
+    parser.add_argument('--attc-batch',
+                        default=False,
+                        help="Search the attC sites of all replicons with one cmsearch run on the whole input file "
+                             "instead of one run per replicon (faster for draft genomes with many contigs). "
+                             "The E-values are rescaled to the length of each replicon.",
+                        action="store_true")
+
+    parser.add_argument('--integrase-batch',
+                        default=False,
+                        help="Search the integrases of all replicons with one hmmsearch run on all proteins "
+                             "instead of one run per replicon (faster for draft genomes with many contigs). "
+                             "The E-values are rescaled to the proteins of each replicon.",
+                        action="store_true")
+
+    parser.add_argument('--prodigal-batch',
+                        default=False,
+                        help="Predict the proteins of all replicons shorter than 200 kb with one Prodigal run "
+                             "in metagenomic mode instead of one run per replicon "
+                             "(faster for draft genomes or metagenomes with many contigs). "
+                             "The proteins are the same as with a run per replicon.",
+                        action="store_true")
+
+    parser.add_argument('--prodigal-prefetch',
+                        default=0,
+                        type=int,
+                        help="Predict the proteins of the next N replicons with Prodigal (up to N Prodigal runs "
+                             "at the same time) while the current replicon is analysed. "
+                             "The temporary files of at most N replicons are created in advance (default: 0)")
+
     parser.add_argument('--calin-threshold',
                         default=2,
                         type=int,
@@ -257,6 +305,47 @@ def parse_args(args):
     return Config(parsed_args)
 
 
+def _protein_db(replicon, config):
+    """
+    :param replicon: the replicon to analyse
+    :type replicon: a :class:`Bio.SeqRecord` object with a *path* attribute.
+    :param config: The configuration
+    :type config: a :class:`integron_finder.config.Config` object.
+    :return: the proteins of the replicon, from Gembase, the file provided by the user or Prodigal.
+    :rtype: :class:`integron_finder.prot_db.ProteinDB` object
+    :raise IntegronError: when the options to get the proteins are not consistent.
+    """
+    custom_annot_files = (config.prot_file, config.annot_parser)
+
+    if any(custom_annot_files) and config.gembase:
+        raise IntegronError("The --prot-file or --annot-parser are not compatible with --gembase option.")
+    elif any(custom_annot_files) and not all(custom_annot_files):
+        msg = "If you provide your own proteins file for annotation (--prot-file) " \
+              "you have to provide also the parser (--annot-parser)"
+        colorlog.critical(msg)
+        raise IntegronError(msg)
+
+    if config.gembase_path:
+        protein_db = GembaseDB(replicon, config, gembase_path=config.gembase_path)
+    elif config.gembase:
+        protein_db = GembaseDB(replicon, config)
+    elif config.prot_file:
+        protein_db = CustomDB(replicon, config, prot_file=config.prot_file)
+    else:
+        protein_db = ProdigalDB(replicon, config)
+    return protein_db
+
+
+def _use_prodigal(config):
+    """
+    :param config: The configuration
+    :type config: a :class:`integron_finder.config.Config` object.
+    :return: True if the proteins are predicted by prodigal (see :func:`_protein_db`)
+    :rtype: bool
+    """
+    return not (config.no_proteins or config.gembase or config.gembase_path or config.prot_file)
+
+
 def find_integron_in_one_replicon(replicon, config):
     """
     scan replicon for integron.
@@ -276,7 +365,9 @@ def find_integron_in_one_replicon(replicon, config):
         * produce genbank file with replicon and annotations with integrons
         * produce schema of replicon with integrons (in pdf)
 
-    :param replicon: the replicon to analyse.
+    :param replicon: the replicon to analyse. If it has a *path* attribute (a fasta file which contains
+                     only this replicon) this file is used by prodigal and cmsearch
+                     instead of writing the replicon in the temporary directory (unless --keep-tmp).
     :type replicon: a :class:`Bio.SeqRecord` object.
     :param config: The configuration
     :type config: a :class:`integron_finder.config.Config` object.
@@ -290,11 +381,16 @@ def find_integron_in_one_replicon(replicon, config):
         os.mkdir(result_tmp_dir)
     except OSError:
         pass
-    tmp_replicon_path = os.path.join(result_tmp_dir, replicon.id + '.fst')
-    SeqIO.write(replicon, tmp_replicon_path, "fasta")
-    # create attr path
-    # used to generate protein file with prodigal
-    replicon.path = tmp_replicon_path
+    if getattr(replicon, 'path', None) and not config.keep_tmp:
+        # the input file contains only this replicon
+        # prodigal and cmsearch can read it directly
+        tmp_replicon_path = replicon.path
+    else:
+        tmp_replicon_path = os.path.join(result_tmp_dir, replicon.id + '.fst')
+        SeqIO.write(replicon, tmp_replicon_path, "fasta")
+        # create attr path
+        # used to generate protein file with prodigal
+        replicon.path = tmp_replicon_path
 
     # func_annot_path is the canonical path for Functional_annotation
     # path_func_annot is the path provide on the command line
@@ -317,24 +413,7 @@ def find_integron_in_one_replicon(replicon, config):
     if is_func_annot and not fa_hmm:
         _log.warning("No hmm profiles for functional annotation detected, skip functional annotation step.")
 
-    custom_annot_files = (config.prot_file, config.annot_parser)
-
-    if any(custom_annot_files) and config.gembase:
-        raise IntegronError("The --prot-file or --annot-parser are not compatible with --gembase option.")
-    elif any(custom_annot_files) and not all(custom_annot_files):
-        msg = "If you provide your own proteins file for annotation (--prot-file) " \
-              "you have to provide also the parser (--annot-parser)"
-        colorlog.critical(msg)
-        raise IntegronError(msg)
-
-    if config.gembase_path:
-        protein_db = GembaseDB(replicon, config, gembase_path=config.gembase_path)
-    elif config.gembase:
-        protein_db = GembaseDB(replicon, config)
-    elif config.prot_file:
-        protein_db = CustomDB(replicon, config, prot_file=config.prot_file)
-    else:
-        protein_db = ProdigalDB(replicon, config)
+    protein_db = _protein_db(replicon, config)
 
     ##################
     # Default search #
@@ -345,14 +424,15 @@ def find_integron_in_one_replicon(replicon, config):
 
     try:
         if not config.no_proteins:
-            if not os.path.isfile(intI_file) or not os.path.isfile(phageI_file):
+            if not hmm_result_exists(intI_file) or not hmm_result_exists(phageI_file):
                 find_integrase(replicon.id, protein_db.protfile, result_tmp_dir, config)
         _log.info("Starting Default search ... :")
         if not os.path.isfile(attC_default_file):
             # find attc with cmsearch
             find_attc(tmp_replicon_path, replicon.name, config.cmsearch, result_tmp_dir, config.model_attc_path,
                       incE=config.evalue_attc,
-                      cpu=config.cpu)
+                      cpu=config.cpu,
+                      cache=config.result_cache)
 
         _log.info("Default search done... : ")
         integrons = find_integron(replicon, protein_db, intI_file, phageI_file, config, attc_file=attC_default_file)
@@ -371,7 +451,9 @@ def find_integron_in_one_replicon(replicon, config):
                                              circular=circular, out_dir=result_tmp_dir,
                                              cpu=config.cpu,
                                              evalue_attc=config.evalue_attc,
-                                             cmsearch_bin=config.cmsearch)
+                                             cmsearch_bin=config.cmsearch,
+                                             cache=config.result_cache,
+                                             keep_tmp=config.keep_tmp)
                 integron_max.to_pickle(os.path.join(result_tmp_dir, "integron_max.pickle"))
                 _log.info("Search with local_max done... :")
 
@@ -459,6 +541,257 @@ def find_integron_in_one_replicon(replicon, config):
     return integron_file, summary_file
 
 
+def find_integrase_in_replicons(sequences_db, config):
+    """
+    Search the integrases of all replicons of sequences_db with one hmmsearch run.
+    The proteins of each replicon are computed (or extracted) first.
+    The results of each replicon are written in its temporary directory
+    where :func:`find_integron_in_one_replicon` use them instead of running hmmsearch.
+
+    :param sequences_db: the replicons to analyse
+    :type sequences_db: :class:`integron_finder.utils.FastaIterator` object
+    :param config: The configuration
+    :type config: a :class:`integron_finder.config.Config` object.
+    """
+    _, replicons_size = sequences_db.sizes()
+    prot_files = {}
+    out_dirs = {}
+    for rep_id in replicons_size:
+        out_dir = config.tmp_dir(rep_id)
+        if all(hmm_result_exists(os.path.join(out_dir, f"{rep_id}_{suffix}.res")) for suffix in ('intI', 'phage_int')):
+            continue
+        os.makedirs(out_dir, exist_ok=True)
+        replicon = sequences_db.seq_index[rep_id]
+        replicon.path = os.path.join(out_dir, rep_id + '.fst')
+        SeqIO.write(replicon, replicon.path, "fasta")
+        protein_db = _protein_db(replicon, config)
+        prot_files[rep_id] = protein_db.protfile
+        out_dirs[rep_id] = out_dir
+        protein_db.close()
+    if not prot_files:
+        return
+    _log.info(f"Searching integrases of {len(prot_files)} replicons with one hmmsearch run")
+    try:
+        find_integrase_batch(prot_files, out_dirs, config.result_dir, config)
+    except RuntimeError as err:
+        _log.warning(f"{err}: the integrases are searched replicon by replicon")
+
+
+def find_proteins_in_replicons(sequences_db, config):
+    """
+    Predict the proteins of all short replicons of sequences_db with one prodigal run.
+    The proteins of each replicon are written in its temporary directory
+    where :class:`integron_finder.prot_db.ProdigalDB` use them instead of running prodigal.
+    The long replicons are analysed replicon by replicon.
+
+    :param sequences_db: the replicons to analyse
+    :type sequences_db: :class:`integron_finder.utils.FastaIterator` object
+    :param config: The configuration
+    :type config: a :class:`integron_finder.config.Config` object.
+    """
+    _, replicons_size = sequences_db.sizes()
+    replicons = (sequences_db.seq_index[rep_id] for rep_id in replicons_size)
+    try:
+        prodigal_batch(replicons, config, config.result_dir)
+    except RuntimeError as err:
+        _log.warning(f"{err}: the proteins are predicted replicon by replicon")
+
+
+def find_attc_in_replicons(sequences_db, config):
+    """
+    Search the attC sites of all replicons of sequences_db with one cmsearch run on the input file.
+    The results of each replicon are written in its temporary directory
+    where :func:`find_integron_in_one_replicon` use them instead of running cmsearch.
+
+    :param sequences_db: the replicons to analyse
+    :type sequences_db: :class:`integron_finder.utils.FastaIterator` object
+    :param config: The configuration
+    :type config: a :class:`integron_finder.config.Config` object.
+    """
+    seq_size, replicons_size = sequences_db.sizes()
+    out_dirs = {rep_id: config.tmp_dir(rep_id) for rep_id in replicons_size}
+    if not replicons_size or all(os.path.isfile(os.path.join(out_dirs[rep_id], rep_id + "_attc_table.res"))
+                                 for rep_id in replicons_size):
+        return
+    for out_dir in out_dirs.values():
+        os.makedirs(out_dir, exist_ok=True)
+    tblout_path = os.path.join(config.result_dir,
+                               utils.get_name_from_path(config.input_seq_path) + "_attc_table.res")
+    _log.info(f"Searching attC sites of {len(replicons_size)} replicons with one cmsearch run")
+    try:
+        find_attc_batch(config.input_seq_path, replicons_size, seq_size, config.cmsearch, out_dirs,
+                        config.model_attc_path, tblout_path,
+                        cpu=config.cpu,
+                        cache=config.result_cache)
+    except RuntimeError as err:
+        # for instance a sequence with illegal characters in the input file
+        _log.warning(f"{err}: the attC sites are searched replicon by replicon")
+    if not config.keep_tmp and os.path.exists(tblout_path):
+        os.unlink(tblout_path)
+
+
+def _init_job(log_file, mute, log_level):
+    """
+    Initialize the loggers of a worker process used to analyse replicons in parallel.
+
+    :param str log_file: the path to the integron_finder.out file
+    :param bool mute: True if the log must not be displayed on stdout
+    :param int log_level: the level of the 'integron_finder' logger
+    """
+    logger = colorlog.getLogger('integron_finder')
+    # with fork start method the handlers of the parent are inherited
+    logger.handlers.clear()
+    integron_finder.init_logger(log_file=log_file, out=not mute)
+    logger_set_level(log_level)
+
+
+def _process_replicon(replicon, config, rep_no, replicons_nb):
+    """
+    Analyse a replicon, in the main process or in a worker process.
+    The replicon is announced when its analysis starts, not when it is queued.
+
+    :param replicon: the replicon to analyse
+    :type replicon: a :class:`Bio.SeqRecord` object.
+    :param config: The configuration
+    :type config: a :class:`integron_finder.config.Config` object.
+    :param int rep_no: the rank of the replicon in the input file (starting at 1)
+    :param int replicons_nb: the number of replicons in the input file
+    :returns: see :func:`find_integron_in_one_replicon`
+    """
+    _log.info("############ Processing replicon {} ({}/{}) ############\n".format(replicon.id,
+                                                                              rep_no,
+                                                                              replicons_nb))
+    return find_integron_in_one_replicon(replicon, config)
+
+
+def _predict_proteins(replicon, config):
+    """
+    Predict the proteins of a replicon with prodigal before its analysis.
+    The replicon is written in its temporary directory and its *path* attribute is set,
+    so :func:`find_integron_in_one_replicon` reuses both the sequence and the proteins.
+
+    :param replicon: the replicon to analyse
+    :type replicon: a :class:`Bio.SeqRecord` object.
+    :param config: The configuration
+    :type config: a :class:`integron_finder.config.Config` object.
+    """
+    result_tmp_dir = config.tmp_dir(replicon.id)
+    os.makedirs(result_tmp_dir, exist_ok=True)
+    replicon_path = os.path.join(result_tmp_dir, replicon.id + '.fst')
+    SeqIO.write(replicon, replicon_path, "fasta")
+    replicon.path = replicon_path
+    try:
+        protein_db = ProdigalDB(replicon, config)
+    except Exception:
+        # do not let a partial protein file, the error will be raised when the replicon is analysed
+        prot_file_path = os.path.join(result_tmp_dir, replicon.id + ".prt")
+        if os.path.exists(prot_file_path):
+            os.unlink(prot_file_path)
+        raise
+    protein_db.close()
+
+
+def prefetch_proteins(replicons, config, depth):
+    """
+    Predict the proteins of the next replicons in a pool of prodigal runs
+    while the current replicon is analysed.
+    At most *depth* replicons are prefetched ahead of the current one,
+    so the temporary files created in advance are bounded.
+
+    :param replicons: the replicons to analyse, some of them can be None (skipped replicons)
+    :type replicons: iterable of :class:`Bio.SeqRecord` objects
+    :param config: The configuration
+    :type config: a :class:`integron_finder.config.Config` object.
+    :param int depth: the maximum number of replicons prefetched
+    :return: the replicons in the same order, each one when its proteins are predicted
+    :rtype: generator of :class:`Bio.SeqRecord` objects
+    """
+    # prodigal runs in its own process, a thread is enough to wait for it
+    executor = ThreadPoolExecutor(max_workers=depth)
+    window = collections.deque()
+
+    def ready(replicon, future):
+        if future is not None:
+            try:
+                future.result()
+            except Exception as err:
+                _log.debug(f"cannot prefetch the proteins of {replicon.id}: {err}")
+        return replicon
+
+    try:
+        for replicon in replicons:
+            future = executor.submit(_predict_proteins, replicon, config) if replicon is not None else None
+            window.append((replicon, future))
+            if len(window) > depth:
+                yield ready(*window.popleft())
+        while window:
+            yield ready(*window.popleft())
+    finally:
+        for _, future in window:
+            if future is not None:
+                future.cancel()
+        executor.shutdown(wait=True)
+
+
+def find_integron_in_replicons(sequences_db, config, log_file=None):
+    """
+    scan all replicons of sequences_db for integrons.
+    If config.jobs is greater than 1, the replicons are dispatched to a pool of processes
+    and the --cpu budget is split between the concurrent jobs.
+
+    :param sequences_db: the replicons to analyse
+    :type sequences_db: :class:`integron_finder.utils.FastaIterator` object
+    :param config: The configuration
+    :type config: a :class:`integron_finder.config.Config` object.
+    :param str log_file: the path to the log file used by the worker processes
+    :returns: a generator on the results of :func:`find_integron_in_one_replicon`
+              **in the same order** as the replicons in sequences_db.
+              The replicons which are skipped (illegal characters or too short) do not produce any result.
+    :rtype: generator of tuples (str integron_file, str summary_file)
+    """
+    sequences_db_len = len(sequences_db)
+    job_config = config.job_config()
+    executor = None
+    pending = collections.deque()
+    if config.jobs > 1:
+        executor = ProcessPoolExecutor(max_workers=config.jobs,
+                                       initializer=_init_job,
+                                       initargs=(log_file, config.mute, _log.getEffectiveLevel()))
+    replicons = sequences_db
+    if config.prodigal_prefetch and _use_prodigal(config) and sequences_db_len > 1:
+        replicons = prefetch_proteins(sequences_db, config, config.prodigal_prefetch)
+    try:
+        for rep_no, replicon in enumerate(replicons, 1):
+            # if replicon contains illegal characters
+            # or replicon is too short < 50 bp
+            # then replicon is None
+            if replicon is None:
+                _log.warning("############ Skipping replicon {}/{} ############".format(rep_no,
+                                                                                        sequences_db_len))
+                continue
+            if sequences_db_len == 1:
+                # no need to write the replicon in a new file to run prodigal or cmsearch on it
+                replicon.path = config.input_seq_path
+            if executor is None:
+                yield _process_replicon(replicon, job_config, rep_no, sequences_db_len)
+            else:
+                _log.debug(f"queue replicon {replicon.id} ({rep_no}/{sequences_db_len})")
+                pending.append(executor.submit(_process_replicon, replicon, job_config, rep_no, sequences_db_len))
+                # bound the number of replicons waiting in the queue
+                # and keep the results in input order
+                if len(pending) >= 2 * config.jobs:
+                    yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        if executor is not None:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+        if replicons is not sequences_db:
+            replicons.close()
+
+
 def header(args, hmmsearch, cmsearch, prodigal):
     """
 
@@ -639,25 +972,19 @@ Please install prodigal package or setup 'prodigal' binary path with --prodigal
         ##############
         # do the job #
         ##############
-        sequences_db_len = len(sequences_db)
+        if config.prodigal_batch and _use_prodigal(config) and len(sequences_db) > 1:
+            find_proteins_in_replicons(sequences_db, config)
+        if config.integrase_batch and not config.no_proteins and len(sequences_db) > 1:
+            find_integrase_in_replicons(sequences_db, config)
+        if config.attc_batch and len(sequences_db) > 1:
+            find_attc_in_replicons(sequences_db, config)
         all_integrons = []
         all_summaries = []
-        for rep_no, replicon in enumerate(sequences_db, 1):
-            # if replicon contains illegal characters
-            # or replicon is too short < 50 bp
-            # then replicon is None
-            if replicon is not None:
-                _log.info("############ Processing replicon {} ({}/{}) ############\n".format(replicon.id,
-                                                                                              rep_no,
-                                                                                              sequences_db_len))
-                integron_res, summary = find_integron_in_one_replicon(replicon, config)
-                if integron_res:
-                    all_integrons.append(integron_res)
-                if summary:
-                    all_summaries.append(summary)
-            else:
-                _log.warning("############ Skipping replicon {}/{} ############".format(rep_no,
-                                                                                        sequences_db_len))
+        for integron_res, summary in find_integron_in_replicons(sequences_db, config, log_file=log_file):
+            if integron_res:
+                all_integrons.append(integron_res)
+            if summary:
+                all_summaries.append(summary)
     if not config.split_results:
         _log.info("Merging integrons results.\n")
         agg_integrons = results.merge_results(*all_integrons)
@@ -190,6 +190,21 @@ class FastaIterator:
         """:returns: The number of sequence in the file"""
         return len(self.seq_index)
 
+    def sizes(self):
+        """
+        :return: the total length of the sequences in the file
+                 and the length of each sequence which will be analysed
+                 (the sequences skipped by the iteration, illegal characters or too short, are not included).
+        :rtype: tuple (int total length, dict {str seq_id: int length})
+        """
+        total = 0
+        sizes = {}
+        for seq in self.seq_index.values():
+            total += len(seq)
+            if len(seq) >= 50 and self._check_seq_alphabet_compliance(seq.seq):
+                sizes[seq.id] = len(seq)
+        return total, sizes
+
     def __enter__(self):
         return self
 
@@ -30,6 +30,7 @@ import os
 import sys
 import unittest
 import functools
+import time
 import colorlog
 from io import StringIO
 from contextlib import contextmanager
@@ -41,6 +42,16 @@ import pandas.testing as pdt
 from integron_finder import IntegronError, logger_set_level, get_logging_module
 
 
+def benchmark(test):
+    """
+    Decorator for the tests which measure the performances of a function.
+    These tests are too long to be part of the regular test suite,
+    they are run only if the environment variable INTEGRON_FINDER_BENCHMARK is set.
+    """
+    return unittest.skipUnless(os.environ.get('INTEGRON_FINDER_BENCHMARK'),
+                               'set INTEGRON_FINDER_BENCHMARK to run the benchmarks.')(test)
+
+
 class IntegronTest(unittest.TestCase):
     # the data for tests
     _data_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), "data"))
@@ -131,6 +142,22 @@ class IntegronTest(unittest.TestCase):
         return wrapper
 
 
+    @contextmanager
+    def timer(self, label):
+        """
+        Measure the time spent in the block and report it on stderr.
+
+        :param str label: the label used to report the elapsed time
+        :return: a dict where the elapsed time (in sec) is stored under the 'time' key when the block exits
+        """
+        elapsed = {}
+        start = time.perf_counter()
+        try:
+            yield elapsed
+        finally:
+            elapsed['time'] = time.perf_counter() - start
+            sys.__stderr__.write(f"\n{label}: {elapsed['time']:.3f}s\n")
+
     def assertFileEqual(self, f1, f2, msg=None):
         #self.maxDiff = None
         with open(f1) as fh1, open(f2) as fh2:
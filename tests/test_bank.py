@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+####################################################################################
+# Integron_Finder - Integron Finder aims at detecting integrons in DNA sequences   #
+# by finding particular features of the integron:                                  #
+#   - the attC sites                                                               #
+#   - the integrase                                                                #
+#   - and when possible attI site and promoters.                                   #
+#                                                                                  #
+# Authors: Jean Cury, Bertrand Neron, Eduardo PC Rocha                             #
+# Copyright (c) 2015 - 2025  Institut Pasteur, Paris and CNRS.                     #
+# See the COPYRIGHT file for details                                               #
+#                                                                                  #
+# integron_finder is free software: you can redistribute it and/or modify          #
+# it under the terms of the GNU General Public License as published by             #
+# the Free Software Foundation, either version 3 of the License, or                #
+# (at your option) any later version.                                              #
+#                                                                                  #
+# integron_finder is distributed in the hope that it will be useful,               #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of                   #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                    #
+# GNU General Public License for more details.                                     #
+#                                                                                  #
+# You should have received a copy of the GNU General Public License                #
+# along with this program (COPYING file).                                          #
+# If not, see <http://www.gnu.org/licenses/>.                                      #
+####################################################################################
+
+import os
+import sys
+import json
+import tempfile
+import shutil
+
+try:
+    from tests import IntegronTest
+except ImportError as err:
+    msg = "Cannot import integron_finder: {0!s}".format(err)
+    raise ImportError(msg)
+
+from integron_finder import bank
+from integron_finder.cache import file_digest
+from integron_finder.hmm import scan_hmm_bank
+import integron_finder.scripts.bank as bank_script
+
+
+class TestBank(IntegronTest):
+
+    @classmethod
+    def setUpClass(cls):
+        # mute the logs
+        cls.set_log_level('WARNING')
+
+    @classmethod
+    def tearDownClass(cls):
+        # restore the log level for the other tests
+        # loggers are singleton
+        cls.set_log_level('INFO')
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory(prefix='tmp_test_integron_finder')
+        self.tmp_dir = self._tmp_dir.name
+        self.src_dir = os.path.join(self.tmp_dir, 'hmm')
+        os.mkdir(self.src_dir)
+        self.hmm_files = []
+        for name in ('integron_integrase.hmm', 'phage-int.hmm'):
+            path = os.path.join(self.src_dir, name)
+            shutil.copyfile(self.find_data(os.path.join('Models', name)), path)
+            self.hmm_files.append(path)
+        self.bank_dir = os.path.join(self.tmp_dir, 'my_bank')
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+
+    def test_build_bank(self):
+        self.assertTrue(bank.build_bank(self.hmm_files, self.bank_dir))
+        bank_path = os.path.join(self.bank_dir, 'my_bank.hmm')
+        with open(bank_path) as bank_file:
+            content = bank_file.read()
+        expected = ''
+        for path in self.hmm_files:
+            with open(path) as hmm_file:
+                expected += hmm_file.read()
+        self.assertEqual(content, expected)
+
+        with open(os.path.join(self.bank_dir, bank.MANIFEST)) as manifest_file:
+            manifest = json.load(manifest_file)
+        self.assertEqual(manifest['bank'], 'my_bank.hmm')
+        self.assertEqual(manifest['sha256'], file_digest(bank_path))
+        self.assertEqual([src['path'] for src in manifest['sources']], [os.path.realpath(p) for p in self.hmm_files])
+        self.assertEqual([src['sha256'] for src in manifest['sources']], [file_digest(p) for p in self.hmm_files])
+        profiles = [profile for src in manifest['sources'] for profile in src['profiles']]
+        self.assertEqual([(p['name'], p['acc'], p['ga']) for p in profiles],
+                         [('intI_Cterm', None, [29.9, 29.9]), ('Phage_integrase', 'PF00589.16', [21.4, 21.4])])
+        with open(bank_path, 'rb') as bank_file:
+            for profile in profiles:
+                bank_file.seek(profile['offset'])
+                self.assertTrue(bank_file.readline().startswith(b'HMMER3'))
+                self.assertEqual(bank_file.readline().split()[1].decode(), profile['name'])
+
+
+    def test_build_bank_up_to_date(self):
+        self.assertTrue(bank.build_bank(self.hmm_files, self.bank_dir))
+        self.assertFalse(bank.build_bank(self.hmm_files, self.bank_dir))
+        self.assertTrue(bank.build_bank(self.hmm_files, self.bank_dir, force=True))
+        # a source has changed
+        with open(self.hmm_files[1], 'a') as hmm_file:
+            hmm_file.write('\n')
+        self.assertTrue(bank.build_bank(self.hmm_files, self.bank_dir))
+        # a source has been removed
+        self.assertTrue(bank.build_bank(self.hmm_files[:1], self.bank_dir))
+        self.assertFalse(bank.build_bank(self.hmm_files[:1], self.bank_dir))
+
+
+    def test_build_bank_no_ga(self):
+        no_ga = os.path.join(self.src_dir, 'no_ga.hmm')
+        with open(self.hmm_files[0]) as hmm_file, open(no_ga, 'w') as no_ga_file:
+            no_ga_file.writelines(line for line in hmm_file if not line.startswith('GA '))
+        with self.assertRaises(ValueError) as ctx:
+            bank.build_bank(self.hmm_files + [no_ga], self.bank_dir)
+        self.assertRegex(str(ctx.exception), r"The profiles intI_Cterm \(.*no_ga.hmm\) have no GA cutoffs.")
+        self.assertFalse(os.path.exists(os.path.join(self.bank_dir, bank.MANIFEST)))
+
+        with self.assertRaises(ValueError):
+            bank.build_bank([], self.bank_dir)
+
+
+    def test_load_bank(self):
+        bank.build_bank(self.hmm_files, self.bank_dir)
+        bank_path = os.path.join(self.bank_dir, 'my_bank.hmm')
+        self.assertTrue(bank.is_bank(self.bank_dir))
+        self.assertTrue(bank.is_bank(os.path.join(self.bank_dir, bank.MANIFEST)))
+        self.assertFalse(bank.is_bank(self.src_dir))
+        self.assertEqual(bank.load_bank(self.bank_dir), bank_path)
+        self.assertEqual(bank.load_bank(os.path.join(self.bank_dir, bank.MANIFEST)), bank_path)
+        self.assertEqual(scan_hmm_bank(self.bank_dir), [os.path.realpath(bank_path)])
+
+        with open(self.hmm_files[0], 'a') as hmm_file:
+            hmm_file.write('\n')
+        with self.catch_log() as log:
+            self.assertEqual(bank.load_bank(self.bank_dir), bank_path)
+            got_warning = log.get_value().strip()
+        self.assertRegex(got_warning, "The source '.*integron_integrase.hmm' of the bank '.*' has changed.")
+
+        os.unlink(bank_path)
+        with self.assertRaises(IOError):
+            bank.load_bank(self.bank_dir)
+        with self.assertRaises(IOError):
+            bank.load_bank(self.src_dir)
+
+
+    def test_script_build(self):
+        bank_script.main(['build', self.src_dir, self.bank_dir], log_level='WARNING')
+        self.assertTrue(os.path.exists(os.path.join(self.bank_dir, 'my_bank.hmm')))
+        self.assertTrue(bank.is_bank(self.bank_dir))
+
+
+    def test_script_build_no_ga(self):
+        no_ga = os.path.join(self.src_dir, 'no_ga.hmm')
+        with open(self.hmm_files[0]) as hmm_file, open(no_ga, 'w') as no_ga_file:
+            no_ga_file.writelines(line for line in hmm_file if not line.startswith('GA '))
+        real_exit = sys.exit
+        sys.exit = self.fake_exit
+        try:
+            with self.catch_log() as log:
+                with self.assertRaises(TypeError) as ctx:
+                    bank_script.main(['build', self.src_dir, self.bank_dir], log_level='WARNING')
+                msg = log.get_value()
+        finally:
+            sys.exit = real_exit
+        # the script exit with a non zero return code
+        self.assertEqual(ctx.exception.args[0], 1)
+        self.assertRegex(msg, r"Cannot build the bank '.*my_bank': The profiles intI_Cterm \(.*no_ga.hmm\) "
+                              r"have no GA cutoffs.")
+        self.assertFalse(bank.is_bank(self.bank_dir))
+
+
+    def test_script_build_no_hmm(self):
+        missing = os.path.join(self.tmp_dir, 'nonexistent', 'dir.hmm')
+        real_exit = sys.exit
+        sys.exit = self.fake_exit
+        try:
+            with self.catch_log() as log:
+                with self.assertRaises(TypeError) as ctx:
+                    bank_script.main(['build', missing, self.bank_dir], log_level='WARNING')
+                msg = log.get_value()
+        finally:
+            sys.exit = real_exit
+        # the script exit with a non zero return code
+        self.assertEqual(ctx.exception.args[0], 1)
+        self.assertIn(f"Cannot build the bank '{self.bank_dir}': {missing} no such file or directory", msg)
+        self.assertFalse(os.path.exists(self.bank_dir))
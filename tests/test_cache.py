@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+####################################################################################
+# Integron_Finder - Integron Finder aims at detecting integrons in DNA sequences   #
+# by finding particular features of the integron:                                  #
+#   - the attC sites                                                               #
+#   - the integrase                                                                #
+#   - and when possible attI site and promoters.                                   #
+#                                                                                  #
+# Authors: Jean Cury, Bertrand Neron, Eduardo PC Rocha                             #
+# Copyright (c) 2015 - 2025  Institut Pasteur, Paris and CNRS                      #
+# See the COPYRIGHT file for details                                               #
+#                                                                                  #
+# integron_finder is free software: you can redistribute it and/or modify          #
+# it under the terms of the GNU General Public License as published by             #
+# the Free Software Foundation, either version 3 of the License, or                #
+# (at your option) any later version.                                              #
+#                                                                                  #
+# integron_finder is distributed in the hope that it will be useful,               #
+# but WITHOUT ANY WARRANTY; without even the implied warranty of                   #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the                    #
+# GNU General Public License for more details.                                     #
+#                                                                                  #
+# You should have received a copy of the GNU General Public License                #
+# along with this program (COPYING file).                                          #
+# If not, see <http://www.gnu.org/licenses/>.                                      #
+####################################################################################
+
+
+import os
+import time
+import pickle
+import tempfile
+
+try:
+    from tests import IntegronTest
+except ImportError as err:
+    msg = "Cannot import integron_finder: {0!s}".format(err)
+    raise ImportError(msg)
+
+from integron_finder import cache
+from integron_finder.cache import ResultCache
+from integron_finder import infernal
+
+
+class TestResultCache(IntegronTest):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory(prefix='tmp_test_integron_finder')
+        self.tmp_dir = self._tmp_dir.name
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_key(self):
+        self.assertEqual(ResultCache.key('a', 'bc'), ResultCache.key('a', b'bc'))
+        self.assertNotEqual(ResultCache.key('ab', 'c'), ResultCache.key('a', 'bc'))
+
+    def test_put_get(self):
+        res_cache = ResultCache(self.cache_dir, 1024)
+        key = res_cache.key('foo')
+        dest_1 = os.path.join(self.tmp_dir, 'dest_1')
+        dest_2 = os.path.join(self.tmp_dir, 'dest_2')
+        self.assertFalse(res_cache.get(key, dest_1, dest_2))
+        self.assertFalse(os.path.exists(dest_1))
+
+        src_1 = self.write('src_1', 'content 1')
+        src_2 = self.write('src_2', 'content 2')
+        res_cache.put(key, src_1, src_2)
+        self.assertTrue(res_cache.get(key, dest_1, dest_2))
+        for src, dest in ((src_1, dest_1), (src_2, dest_2)):
+            with open(src) as expected, open(dest) as received:
+                self.assertEqual(expected.read(), received.read())
+        # the cache is shared between runs
+        self.assertTrue(ResultCache(self.cache_dir, 1024).get(key, dest_1, dest_2))
+
+    def test_put_missing_file(self):
+        res_cache = ResultCache(self.cache_dir, 1024)
+        key = res_cache.key('foo')
+        src_1 = self.write('src_1', 'content 1')
+        res_cache.put(key, src_1, os.path.join(self.tmp_dir, 'not_produced'))
+        dest_1 = os.path.join(self.tmp_dir, 'dest_1')
+        dest_2 = os.path.join(self.tmp_dir, 'dest_2')
+        self.assertTrue(res_cache.get(key, dest_1, dest_2))
+        self.assertTrue(os.path.exists(dest_1))
+        self.assertFalse(os.path.exists(dest_2))
+
+    def test_evict(self):
+        res_cache = ResultCache(self.cache_dir, 25)
+        keys = [res_cache.key(str(i)) for i in range(3)]
+        src = self.write('src', '0123456789')
+        dest = os.path.join(self.tmp_dir, 'dest')
+        res_cache.put(keys[0], src)
+        res_cache.put(keys[1], src)
+        # the entry 0 is the least recently used one
+        now = time.time()
+        os.utime(res_cache._entry_path(keys[0]), (now - 10, now - 10))
+        os.utime(res_cache._entry_path(keys[1]), (now - 5, now - 5))
+        # a get make the entry the most recently used
+        self.assertTrue(res_cache.get(keys[0], dest))
+        res_cache.put(keys[2], src)
+        self.assertFalse(res_cache.get(keys[1], dest))
+        self.assertTrue(res_cache.get(keys[0], dest))
+        self.assertTrue(res_cache.get(keys[2], dest))
+        self.assertLessEqual(res_cache.size(), 25)
+
+    def test_put_scan(self):
+        res_cache = ResultCache(self.cache_dir, 25)
+        src = self.write('src', '0123456789')
+        scans = []
+        entries_ori = res_cache._entries
+
+        def entries():
+            scans.append(1)
+            return entries_ori()
+
+        res_cache._entries = entries
+        # the cache is scanned only to compute its initial size
+        # then when the estimated size goes over max_size
+        res_cache.put(res_cache.key('0'), src)
+        self.assertEqual(len(scans), 1)
+        res_cache.put(res_cache.key('1'), src)
+        self.assertEqual(len(scans), 1)
+        self.assertEqual(res_cache._size, 20)
+        res_cache.put(res_cache.key('2'), src)
+        self.assertEqual(len(scans), 2)
+        self.assertEqual(res_cache._size, 20)
+        self.assertEqual(res_cache.size(), 20)
+        # an entry already cached does not change the size
+        res_cache.put(res_cache.key('2'), src)
+        self.assertEqual(res_cache._size, 20)
+
+    def test_pickle(self):
+        res_cache = ResultCache(self.cache_dir, 25)
+        key = res_cache.key('0')
+        res_cache.put(key, self.write('src', '0123456789'))
+        res_cache_2 = pickle.loads(pickle.dumps(res_cache))
+        self.assertEqual(res_cache_2._size, 10)
+        dest = os.path.join(self.tmp_dir, 'dest')
+        self.assertTrue(res_cache_2.get(key, dest))
+        res_cache_2.put(res_cache.key('1'), dest)
+        self.assertEqual(res_cache_2._size, 20)
+
+    def test_tool_version(self):
+        # the binary does not print a version, its content is used
+        fake_bin = self.write('fake_cmsearch', '#!/bin/sh\nexit 1\n')
+        os.chmod(fake_bin, 0o755)
+        self.assertEqual(cache.tool_version(fake_bin), cache.file_digest(fake_bin))
+
+    def test_find_attc(self):
+        # a fake cmsearch which count its calls
+        calls = os.path.join(self.tmp_dir, 'calls')
+        fake_bin = self.write('fake_cmsearch',
+                              '#!/bin/sh\n'
+                              '[ "$1" = "-h" ] && exit 0\n'
+                              f'echo run >> {calls}\n'
+                              'while [ $# -gt 0 ]; do\n'
+                              '  case $1 in\n'
+                              '    --tblout) echo "# tblout" > $2; shift ;;\n'
+                              '    -A) echo "# alignment" > $2; shift ;;\n'
+                              '  esac\n'
+                              '  shift\n'
+                              'done\n')
+        os.chmod(fake_bin, 0o755)
+        replicon_path = self.find_data('Replicons', 'acba.007.p01.13.fst')
+        model_attc = self.find_data('Models', 'attc_4.cm')
+        res_cache = ResultCache(self.cache_dir, 1024 * 1024)
+        for run in range(2):
+            out_dir = os.path.join(self.tmp_dir, f'run_{run}')
+            os.mkdir(out_dir)
+            infernal.find_attc(replicon_path, 'ACBA.007.P01_13', fake_bin, out_dir, model_attc, cache=res_cache)
+            for suffix in ('_attc_table.res', '_attc.res'):
+                self.assertTrue(os.path.exists(os.path.join(out_dir, 'ACBA.007.P01_13' + suffix)))
+        with open(calls) as f:
+            self.assertEqual(len(f.readlines()), 1)
+        # an other option need a new search
+        infernal.find_attc(replicon_path, 'ACBA.007.P01_13', fake_bin, out_dir, model_attc, incE=0.1,
+                           cache=res_cache)
+        with open(calls) as f:
+            self.assertEqual(len(f.readlines()), 2)
@@ -27,7 +27,9 @@
 ####################################################################################
 
 import argparse
+import pickle
 import os
+import tempfile
 
 try:
     from tests import IntegronTest
@@ -36,6 +38,7 @@ except ImportError as err:
     raise ImportError(msg)
 
 from integron_finder import config
+from integron_finder.cache import ResultCache
 
 
 class TestConfig(IntegronTest):
@@ -274,4 +277,56 @@ class TestConfig(IntegronTest):
     def test_prot_file(self):
         self.args.prot_file = 'nimportnaoik'
         cf = config.Config(self.args)
-        self.assertEqual(cf.prot_file, self.args.prot_file)
\ No newline at end of file
+        self.assertEqual(cf.prot_file, self.args.prot_file)
+
+
+    def test_jobs(self):
+        cf = config.Config(self.args)
+        self.assertEqual(cf.jobs, 1)
+        self.args.jobs = 3
+        cf = config.Config(self.args)
+        self.assertEqual(cf.jobs, 3)
+
+    def test_job_config(self):
+        self.args.cpu = 8
+        self.args.jobs = 1
+        cf = config.Config(self.args)
+        self.assertIs(cf.job_config(), cf)
+
+        self.args.jobs = 3
+        cf = config.Config(self.args)
+        job_cf = cf.job_config()
+        self.assertEqual(job_cf.cpu, 2)
+        self.assertEqual(job_cf.jobs, 3)
+        # the original config is not modified
+        self.assertEqual(cf.cpu, 8)
+
+        self.args.jobs = 16
+        cf = config.Config(self.args)
+        self.assertEqual(cf.job_config().cpu, 1)
+
+    def test_result_cache(self):
+        cf = config.Config(self.args)
+        self.assertIsNone(cf.cache_dir)
+        self.assertIsNone(cf.result_cache)
+        with tempfile.TemporaryDirectory(prefix='tmp_test_integron_finder') as tmp_dir:
+            self.args.cache_dir = os.path.join(tmp_dir, 'cache')
+            self.args.cache_size = 10
+            cf = config.Config(self.args)
+            self.assertEqual(cf.cache_size, 10 * 1024 * 1024)
+            cache = cf.result_cache
+            self.assertTrue(isinstance(cache, ResultCache))
+            self.assertEqual(cache.cache_dir, self.args.cache_dir)
+            self.assertEqual(cache.max_size, 10 * 1024 * 1024)
+            self.assertTrue(os.path.isdir(self.args.cache_dir))
+            # the cache is shared by all the searches
+            self.assertIs(cf.result_cache, cache)
+            self.assertIs(cf.job_config().result_cache, cache)
+
+    def test_pickle(self):
+        self.args.cpu = 4
+        self.args.replicon = 'foo'
+        cf = config.Config(self.args)
+        cf_2 = pickle.loads(pickle.dumps(cf))
+        self.assertEqual(cf_2.cpu, 4)
+        self.assertEqual(cf_2.input_seq_path, cf.input_seq_path)
@@ -519,3 +519,49 @@ class TestExpand(IntegronTest):
                                            search_left=search_left,
                                            search_right=search_right)
         pdt.assert_frame_equal(max_elt_expected, max_elt_received)
+
+
+    def test_expand_linear_concurrent(self):
+        # same as test_expand_linear but the left and right searches are run concurrently
+        circular = False
+        dist_threshold = 4000
+        replicon_name = 'NZ_CP016323'
+        max_attc_size = 200
+        min_attc_size = 15
+        evalue_attc = 10
+        wb = 15266
+        we = 23308
+
+        replicon_path = self.find_data('Replicons', replicon_name + '.fna')
+        topologies = Topology(1, 'lin')
+
+        with FastaIterator(replicon_path) as sequences_db:
+            sequences_db.topologies = topologies
+            replicon = next(sequences_db)
+
+        max_elt_input = pd.read_csv(self.find_data('expand_mock', 'expand_linear_input.csv'))
+        max_elt_expected = pd.read_csv(self.find_data('expand_mock', 'expand_linear_output.csv'))
+
+        local_max_mock = infernal.local_max
+        calls = []
+        def local_max_spy(*args, **kwargs):
+            calls.append((args[1], args[2], kwargs['strand_search'], kwargs['cpu']))
+            return local_max_mock(*args, **kwargs)
+        infernal.local_max = local_max_spy
+
+        max_elt_received = infernal.expand(replicon,
+                                           wb, we,
+                                           max_elt_input,
+                                           circular,
+                                           dist_threshold,
+                                           self.model_attc_path,
+                                           max_attc_size, min_attc_size,
+                                           evalue_attc=evalue_attc,
+                                           search_left=True,
+                                           search_right=True,
+                                           cpu=4)
+        pdt.assert_frame_equal(max_elt_expected, max_elt_received)
+        # the 2 sides are searched at the same time, each with half of the cpus
+        self.assertEqual(calls[0][3], 2)
+        self.assertSetEqual({call[:3] for call in calls[:2]},
+                            {(23108, 27308, 'both'), (11266, 15466, 'both')})
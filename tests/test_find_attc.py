@@ -30,6 +30,9 @@ import os
 import tempfile
 import shutil
 import re
+import unittest
+
+from Bio import SeqIO
 
 # # display warning only for non installed integron_finder
 # from Bio import BiopythonExperimentalWarning
@@ -95,3 +98,86 @@ class TestFindAttc(IntegronTest):
         with self.assertRaises(RuntimeError) as ctx:
             infernal.find_attc(self.replicon_path, self.replicon_name, self.cmsearch_path, self.tmp_dir, model_attc)
         self.assertTrue(str(ctx.exception).endswith('failed returncode = 1'))
+
+    def test_find_attc_batch(self):
+        tblout_path = os.path.join(self.tmp_dir, 'all_attc_table.res')
+        out_dirs = {}
+        for rep_id in ('A', 'B'):
+            out_dirs[rep_id] = os.path.join(self.tmp_dir, rep_id)
+            os.mkdir(out_dirs[rep_id])
+        header = "#target name accession query name accession mdl mdl from mdl to seq from seq to strand " \
+                 "trunc pass gc bias score E-value inc description of target\n"
+        hit = "{} - attC_4 - cm 1 47 {} {} - no 1 0.55 0.0 46.4 {} ! a description\n"
+        cmds = []
+
+        def fake_run(cmd, **kwargs):
+            cmds.append(cmd)
+            with open(tblout_path, 'w') as tblout:
+                tblout.write(header)
+                tblout.write(hit.format('A', 100, 50, '1e-09'))
+                tblout.write(hit.format('B', 200, 150, '0.5'))
+                tblout.write(hit.format('B', 300, 250, '20'))
+                tblout.write(hit.format('C', 400, 350, '1e-09'))
+                tblout.write("#\n")
+            return infernal.subprocess.CompletedProcess(cmd, 0)
+
+        infernal.subprocess.run = fake_run
+        infernal.find_attc_batch(self.replicon_path, {'A': 1000, 'B': 3000}, 5000, 'cmsearch', out_dirs,
+                                 self.model_attc, tblout_path)
+        self.assertEqual(len(cmds), 1)
+        cmd = cmds[0]
+        # the reporting threshold and the filters are set for the smallest replicon
+        self.assertEqual(float(cmd[cmd.index('-E') + 1]), 50.)
+        self.assertEqual(float(cmd[cmd.index('--FZ') + 1]), 0.002)
+        self.assertEqual(cmd[-1], self.replicon_path)
+
+        def hits(rep_id):
+            with open(os.path.join(out_dirs[rep_id], rep_id + '_attc_table.res')) as tblout:
+                lines = tblout.readlines()
+            self.assertEqual(lines[0], header)
+            self.assertEqual(lines[-1], "#\n")
+            return [(line.split()[7], float(line.split()[15])) for line in lines[1:-1]]
+
+        self.assertEqual(hits('A'), [('100', 2e-10)])
+        self.assertEqual(hits('B'), [('200', 0.3)])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'C')))
+
+    def test_find_attc_batch_failed(self):
+        with self.assertRaises(RuntimeError) as ctx:
+            infernal.find_attc_batch(self.replicon_path, {self.replicon_name: 20301}, 20301, self.cmsearch_path,
+                                     {self.replicon_name: self.tmp_dir}, 'foo',
+                                     os.path.join(self.tmp_dir, 'all_attc_table.res'))
+        self.assertTrue(str(ctx.exception).endswith('failed returncode = 1'))
+
+    @unittest.skipIf(not shutil.which('cmsearch'), 'cmsearch binary not found.')
+    def test_find_attc_batch_eq_find_attc(self):
+        # the E-values are rescaled from the E-values rounded by cmsearch,
+        # the hits of a search by replicon are found with an E-value which differ by at most 10%
+        replicon_path = self.find_data(os.path.join('Replicons', 'ACBA.0917.00019.fna'))
+        replicons = list(SeqIO.parse(replicon_path, 'fasta'))
+        out_dirs = {}
+        for replicon in replicons:
+            out_dirs[replicon.id] = os.path.join(self.tmp_dir, replicon.id)
+            os.makedirs(os.path.join(out_dirs[replicon.id], 'one'))
+        infernal.find_attc_batch(replicon_path, {replicon.id: len(replicon) for replicon in replicons},
+                                 sum(len(replicon) for replicon in replicons), self.cmsearch_path, out_dirs,
+                                 self.model_attc, os.path.join(self.tmp_dir, 'all_attc_table.res'))
+
+        def hits(tblout_path):
+            with open(tblout_path) as tblout:
+                return {tuple(line.split()[7:10]): float(line.split()[15]) for line in tblout
+                        if not line.startswith('#')}
+
+        hits_nb = 0
+        for replicon in replicons:
+            one_dir = os.path.join(out_dirs[replicon.id], 'one')
+            one_path = os.path.join(one_dir, replicon.id + '.fst')
+            SeqIO.write(replicon, one_path, 'fasta')
+            infernal.find_attc(one_path, replicon.id, self.cmsearch_path, one_dir, self.model_attc)
+            batch = hits(os.path.join(out_dirs[replicon.id], replicon.id + '_attc_table.res'))
+            one = hits(os.path.join(one_dir, replicon.id + '_attc_table.res'))
+            hits_nb += len(one)
+            for hit, evalue in one.items():
+                self.assertIn(hit, batch)
+                self.assertLessEqual(abs(batch[hit] - evalue), 0.1 * evalue + 1e-300)
+        self.assertGreater(hits_nb, 0)
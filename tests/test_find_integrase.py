@@ -31,6 +31,8 @@ import tempfile
 import shutil
 import argparse
 import re
+import sys
+import unittest
 
 try:
     from tests import IntegronTest
@@ -96,7 +98,28 @@ class TestFindIntegrase(IntegronTest):
 
         integrase.find_integrase(replicon.id, prot_file, self.tmp_dir, cfg)
 
-        for suffix in ('_intI.res', '_intI_table.res', '_phage_int.res', '_phage_int_table.res'):
+        for suffix in ('_intI_domtable.res', '_intI_table.res', '_phage_int_domtable.res', '_phage_int_table.res'):
+            res = os.path.join(self.tmp_dir, replicon.id + suffix)
+            self.assertTrue(os.path.exists(res))
+
+
+    def test_find_integrase_keep_tmp(self):
+        self.args.keep_tmp = True
+        cfg = Config(self.args)
+        cfg._prefix_data = os.path.join(os.path.dirname(__file__), 'data')
+
+        replicon_name = 'acba.007.p01.13'
+        replicon_path = self.find_data(os.path.join('Replicons', replicon_name + '.fst'))
+        topologies = Topology(1, 'lin')
+        with FastaIterator(replicon_path) as sequences_db:
+            sequences_db.topologies = topologies
+            replicon = next(sequences_db)
+
+        prot_file = os.path.join(self.tmp_dir, replicon.id + ".prt")
+        shutil.copyfile(self.find_data(os.path.join('Proteins', replicon.id + ".prt")), prot_file)
+
+        integrase.find_integrase(replicon.id, prot_file, self.tmp_dir, cfg)
+        for suffix in ('_intI.res', '_intI_domtable.res', '_phage_int.res', '_phage_int_domtable.res'):
             res = os.path.join(self.tmp_dir, replicon.id + suffix)
             self.assertTrue(os.path.exists(res))
 
@@ -121,7 +144,7 @@ class TestFindIntegrase(IntegronTest):
             shutil.copyfile(self.find_data(os.path.join('Proteins', replicon.id + ".prt")), prot_file)
 
             integrase.find_integrase(replicon.id, prot_file, self.tmp_dir, cfg)
-            for suffix in ('_intI.res', '_intI_table.res', '_phage_int.res', '_phage_int_table.res'):
+            for suffix in ('_intI_domtable.res', '_intI_table.res', '_phage_int_domtable.res', '_phage_int_table.res'):
                 res = os.path.join(self.tmp_dir, replicon.id + suffix)
                 self.assertTrue(os.path.exists(res))
         finally:
@@ -178,7 +201,7 @@ class TestFindIntegrase(IntegronTest):
             shutil.copyfile(prot_path, prot_file)
 
             integrase.find_integrase(replicon.id, prot_file, self.tmp_dir, cfg)
-            for suffix in ('_intI.res', '_intI_table.res', '_phage_int.res', '_phage_int_table.res'):
+            for suffix in ('_intI_domtable.res', '_intI_table.res', '_phage_int_domtable.res', '_phage_int_table.res'):
                 res = os.path.join(self.tmp_dir, replicon.id + suffix)
                 self.assertTrue(os.path.exists(res))
         finally:
@@ -206,7 +229,7 @@ class TestFindIntegrase(IntegronTest):
             shutil.copyfile(self.find_data(os.path.join('Proteins', replicon.id + ".prt")), prot_file)
 
             integrase.find_integrase(replicon.id, prot_file, self.tmp_dir, cfg)
-            for suffix in ('_intI.res', '_intI_table.res', '_phage_int.res', '_phage_int_table.res'):
+            for suffix in ('_intI_domtable.res', '_intI_table.res', '_phage_int_domtable.res', '_phage_int_table.res'):
                 res = os.path.join(self.tmp_dir, replicon.id + suffix)
                 self.assertTrue(os.path.exists(res))
         finally:
@@ -310,3 +333,200 @@ class TestFindIntegrase(IntegronTest):
         with self.assertRaises(RuntimeError) as ctx:
             integrase.find_integrase(replicon.id, prot_file, self.tmp_dir, cfg)
         self.assertTrue(str(ctx.exception).endswith('failed return code = 1'))
+
+
+    def _fake_hmmsearch(self):
+        # a fake hmmsearch which report one hit by profile read on stdin
+        # and record each call
+        fake_hmmsearch = os.path.join(self.tmp_dir, 'hmmsearch')
+        calls = os.path.join(self.tmp_dir, 'calls')
+        with open(fake_hmmsearch, 'w') as fake:
+            fake.write(f"""#!{sys.executable}
+import sys
+args = sys.argv[1:]
+with open({calls!r}, 'a') as calls:
+    calls.write(' '.join(args) + '\\n')
+queries = [line.split()[1] for line in sys.stdin if line.startswith('NAME')]
+with open(args[args.index('--tblout') + 1], 'w') as tblout:
+    tblout.write('# target name accession query name\\n')
+    for query in queries:
+        tblout.write(f'prot_1 - {{query}} - 1e-10 40.0 0.1 1e-10 40.0 0.1 1 1 0 1 1 1 1 1 -\\n')
+    tblout.write('# [ok]\\n')
+with open(args[args.index('--domtblout') + 1], 'w') as domtblout:
+    domtblout.write('# target name accession tlen query name\\n')
+    for query in queries:
+        domtblout.write(f'prot_1 - 300 {{query}} - 100 1e-10 40.0 0.1 1 1 1e-10 1e-10 40.0 0.1 1 90 10 100 8 102 0.9 -\\n')
+    domtblout.write('# [ok]\\n')
+with open(args[args.index('-o') + 1], 'w') as out:
+    out.write('# hmmsearch\\n')
+    for query in queries:
+        out.write(f'Query:       {{query}}  [M=100]\\n')
+        out.write('//\\n')
+    out.write('[ok]\\n')
+""")
+        os.chmod(fake_hmmsearch, 0o755)
+        return fake_hmmsearch, calls
+
+
+    def test_find_integrase_one_pass(self):
+        self.args.hmmsearch, calls = self._fake_hmmsearch()
+        self.args.keep_tmp = True
+        cfg = Config(self.args)
+        cfg._prefix_data = os.path.join(os.path.dirname(__file__), 'data')
+
+        prot_file = os.path.join(self.tmp_dir, "ACBA.007.P01_13.prt")
+        shutil.copyfile(self.find_data(os.path.join('Proteins', "ACBA.007.P01_13.prt")), prot_file)
+
+        integrase.find_integrase("ACBA.007.P01_13", prot_file, self.tmp_dir, cfg)
+        with open(calls) as calls_file:
+            self.assertEqual(len(calls_file.readlines()), 1)
+
+        for suffix, query in (('intI', 'intI_Cterm'), ('phage_int', 'Phage_integrase')):
+            for out, col in (('_domtable.res', 3), ('_table.res', 2)):
+                with open(os.path.join(self.tmp_dir, f"ACBA.007.P01_13_{suffix}{out}")) as tbl:
+                    lines = tbl.readlines()
+                self.assertTrue(lines[0].startswith('# target name'))
+                self.assertEqual(lines[-1], '# [ok]\n')
+                self.assertEqual([line.split()[col] for line in lines[1:-1]], [query])
+            with open(os.path.join(self.tmp_dir, f"ACBA.007.P01_13_{suffix}.res")) as out:
+                self.assertEqual(out.read(),
+                                 f"# hmmsearch\nQuery:       {query}  [M=100]\n//\n[ok]\n")
+        for combined in ('_integrases.res', '_integrases_domtable.res', '_integrases_table.res'):
+            self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, f"ACBA.007.P01_13{combined}")))
+
+
+    def test_find_integrase_cache_keep_tmp(self):
+        self.args.hmmsearch, calls = self._fake_hmmsearch()
+        self.args.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        self.args.cache_size = 10
+        prot_file = os.path.join(self.tmp_dir, "ACBA.007.P01_13.prt")
+        shutil.copyfile(self.find_data(os.path.join('Proteins', "ACBA.007.P01_13.prt")), prot_file)
+
+        def find_integrase(keep_tmp):
+            self.args.keep_tmp = keep_tmp
+            cfg = Config(self.args)
+            cfg._prefix_data = os.path.join(os.path.dirname(__file__), 'data')
+            out_dir = tempfile.mkdtemp(dir=self.tmp_dir)
+            integrase.find_integrase("ACBA.007.P01_13", prot_file, out_dir, cfg)
+            with open(calls) as calls_file:
+                # the version of hmmsearch is also asked to compute the cache key
+                return out_dir, len([call for call in calls_file if '--domtblout' in call])
+
+        out_dir, call_nb = find_integrase(False)
+        self.assertEqual(call_nb, 1)
+        self.assertFalse(os.path.exists(os.path.join(out_dir, "ACBA.007.P01_13_intI.res")))
+        # the results cached without the text output are not used with keep_tmp
+        out_dir, call_nb = find_integrase(True)
+        self.assertEqual(call_nb, 2)
+        # the text output is restored from the cache
+        out_dir, call_nb = find_integrase(True)
+        self.assertEqual(call_nb, 2)
+        for suffix, query in (('intI', 'intI_Cterm'), ('phage_int', 'Phage_integrase')):
+            with open(os.path.join(out_dir, f"ACBA.007.P01_13_{suffix}.res")) as out:
+                self.assertEqual(out.read(),
+                                 f"# hmmsearch\nQuery:       {query}  [M=100]\n//\n[ok]\n")
+            self.assertTrue(os.path.exists(os.path.join(out_dir, f"ACBA.007.P01_13_{suffix}_domtable.res")))
+        out_dir, call_nb = find_integrase(False)
+        self.assertEqual(call_nb, 2)
+
+
+    def test_find_integrase_batch(self):
+        # a fake hmmsearch which report the 2 first proteins of each file
+        # for each profile read on stdin with a P-value of 1e-10
+        fake_hmmsearch = os.path.join(self.tmp_dir, 'hmmsearch')
+        with open(fake_hmmsearch, 'w') as fake:
+            fake.write(f"""#!{sys.executable}
+import sys
+args = sys.argv[1:]
+assert args[args.index('-Z') + 1] == '1' and args[args.index('--domZ') + 1] == '1'
+queries = [line.split()[1] for line in sys.stdin if line.startswith('NAME')]
+targets = {{}}
+with open(args[-1]) as prots:
+    for line in prots:
+        if line.startswith('>'):
+            target = line[1:].split()[0]
+            targets.setdefault(target.split('|')[0], []).append(target)
+with open(args[args.index('--tblout') + 1], 'w') as tblout, \\
+        open(args[args.index('--domtblout') + 1], 'w') as domtblout:
+    tblout.write('# target name accession query name\\n')
+    domtblout.write('# target name accession tlen query name\\n')
+    for query in queries:
+        for file_targets in targets.values():
+            for target in file_targets[:2]:
+                tblout.write(f'{{target}} - {{query}} - 1e-10 40.0 0.1 1e-10 40.0 0.1 1 1 0 1 1 1 1 1 a desc\\n')
+                domtblout.write(f'{{target}} - 300 {{query}} - 100 1e-10 40.0 0.1 1 1 1e-10 1e-10 40.0 0.1 '
+                                f'1 90 10 100 8 102 0.9 a desc\\n')
+    tblout.write('# [ok]\\n')
+    domtblout.write('# [ok]\\n')
+""")
+        os.chmod(fake_hmmsearch, 0o755)
+        self.args.hmmsearch = fake_hmmsearch
+        cfg = Config(self.args)
+        cfg._prefix_data = os.path.join(os.path.dirname(__file__), 'data')
+
+        prot_files = {}
+        out_dirs = {}
+        for rep_id, prot_file in (('ACBA', 'ACBA.007.P01_13.prt'), ('LIAN', 'lian.001.c02.10.prt'),
+                                  ('LIAN_bis', 'lian.001.c02.10.prt')):
+            prot_files[rep_id] = self.find_data(os.path.join('Proteins', prot_file))
+            out_dirs[rep_id] = os.path.join(self.tmp_dir, rep_id)
+            os.mkdir(out_dirs[rep_id])
+        integrase.find_integrase_batch(prot_files, out_dirs, self.tmp_dir, cfg)
+
+        for rep_id, prot_nb, prot_ids in (('ACBA', '2.3e-09', ['ACBA.007.P01_13_1', 'ACBA.007.P01_13_2']),
+                                          ('LIAN', '9e-08', ['LIAN001c02a_000010', 'LIAN001c02a_000020']),
+                                          ('LIAN_bis', '9e-08', ['LIAN001c02a_000010', 'LIAN001c02a_000020'])):
+            for suffix, query in (('intI', 'intI_Cterm'), ('phage_int', 'Phage_integrase')):
+                with open(os.path.join(out_dirs[rep_id], f"{rep_id}_{suffix}_domtable.res")) as domtbl:
+                    lines = domtbl.readlines()
+                self.assertEqual(lines[-1], '# [ok]\n')
+                hits = [line.split() for line in lines[1:-1]]
+                self.assertEqual([hit[0] for hit in hits], prot_ids)
+                self.assertEqual({hit[3] for hit in hits}, {query})
+                # full sequence E-value is scaled by the number of proteins
+                self.assertEqual({hit[6] for hit in hits}, {prot_nb})
+                # domain E-values are scaled by the number of hits
+                self.assertEqual({(hit[11], hit[12]) for hit in hits}, {('2e-10', '2e-10')})
+                self.assertEqual({' '.join(hit[22:]) for hit in hits}, {'a desc'})
+
+                with open(os.path.join(out_dirs[rep_id], f"{rep_id}_{suffix}_table.res")) as tbl:
+                    hits = [line.split() for line in tbl if not line.startswith('#')]
+                self.assertEqual([hit[0] for hit in hits], prot_ids)
+                self.assertEqual({(hit[4], hit[7]) for hit in hits}, {(prot_nb, prot_nb)})
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'integrases_proteins.prt')))
+
+
+    @unittest.skipIf(not shutil.which('hmmsearch'), 'hmmsearch binary not found.')
+    def test_find_integrase_batch_eq_find_integrase(self):
+        # the E-values are rescaled from the P-values rounded by hmmsearch,
+        # the hits are the same and the E-values differ by at most 10% from a search by replicon
+        cfg = Config(self.args)
+        cfg._prefix_data = os.path.join(os.path.dirname(__file__), 'data')
+        prot_files = {}
+        out_dirs = {}
+        for rep_id, prot_file in (('ACBA', 'ACBA.007.P01_13.prt'), ('LIAN', 'lian.001.c02.10.prt'),
+                                  ('PSSU', 'pssu.001.c01.13.prt')):
+            prot_files[rep_id] = self.find_data(os.path.join('Proteins', prot_file))
+            out_dirs[rep_id] = os.path.join(self.tmp_dir, rep_id)
+            os.makedirs(os.path.join(out_dirs[rep_id], 'one'))
+        integrase.find_integrase_batch(prot_files, out_dirs, self.tmp_dir, cfg)
+        hits_nb = 0
+        for rep_id, prot_file in prot_files.items():
+            integrase.find_integrase(rep_id, prot_file, os.path.join(out_dirs[rep_id], 'one'), cfg)
+            for out, evalue_cols in (('_domtable.res', (6, 11, 12)), ('_table.res', (4, 7))):
+                for suffix in ('intI', 'phage_int'):
+                    hits = {}
+                    for out_dir in (out_dirs[rep_id], os.path.join(out_dirs[rep_id], 'one')):
+                        with open(os.path.join(out_dir, f"{rep_id}_{suffix}{out}")) as tbl:
+                            hits[out_dir] = [line.split() for line in tbl if not line.startswith('#')]
+                    batch, one = hits.values()
+                    self.assertEqual(len(batch), len(one))
+                    hits_nb += len(one)
+                    for batch_hit, one_hit in zip(batch, one):
+                        for col, (batch_field, one_field) in enumerate(zip(batch_hit, one_hit)):
+                            if col in evalue_cols:
+                                self.assertLessEqual(abs(float(batch_field) - float(one_field)),
+                                                     0.1 * float(one_field) + 1e-300)
+                            else:
+                                self.assertEqual(batch_field, one_field)
+        self.assertGreater(hits_nb, 0)
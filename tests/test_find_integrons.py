@@ -31,6 +31,9 @@ import tempfile
 import shutil
 import argparse
 
+from Bio import Seq
+from Bio.SeqRecord import SeqRecord
+
 import numpy as np
 import pandas as pd
 import pandas.testing as pdt
@@ -41,12 +44,13 @@ import pandas.testing as pdt
 # warnings.simplefilter('ignore', BiopythonExperimentalWarning)
 
 try:
-    from tests import IntegronTest
+    from tests import IntegronTest, benchmark
 except ImportError as err:
     msg = "Cannot import integron_finder: {0!s}".format(err)
     raise ImportError(msg)
 
-from integron_finder.integron import find_integron
+from integron_finder.integron import find_integron, assign_attc_clusters, Integron
+from integron_finder.attc import search_attc
 from integron_finder.config import Config
 from integron_finder.utils import FastaIterator
 from integron_finder.topology import Topology
@@ -54,6 +58,176 @@ from integron_finder.infernal import read_infernal
 from integron_finder.prot_db import ProdigalDB
 
 
+def assign_attc_clusters_list(replicon, intI_ac, attc_cluster_list, cfg):
+    """
+    The former implementation of the assignment of the attC clusters to the integrases
+    which scan the list of all clusters for each integrase.
+    It is used as reference for assign_attc_clusters.
+    """
+    attc_cluster_list = list(attc_cluster_list)
+    integrons = []
+    if not intI_ac.empty and attc_cluster_list:
+        attc_cluster_nb = len(attc_cluster_list)
+        # If an array hasn't been clustered with an Integrase
+        # or if an integrase lacks an array
+        # redundant info, we could check for len(attc_cluster_list)==0
+        # -> to remove
+        for i, id_int in enumerate(intI_ac.ID_prot.values):  # For each Integrase
+            if attc_cluster_nb == 0:  # No more array to attribute to an integrase
+
+                integrons.append(Integron(replicon, cfg))
+                integrons[-1].add_integrase(intI_ac.pos_beg.values[i],
+                                            intI_ac.pos_end.values[i],
+                                            id_int,
+                                            int(intI_ac.strand.values[i]),
+                                            intI_ac.evalue.values[i],
+                                            intI_ac.query_name.values[i])
+
+            else:  # we still have several attC cluster and int :
+                # Look for array of attC (cluster) where intI would fall inside it
+
+                # array_2_split is a boolean with True when intI is within an array
+                array_2_split = [(attc.pos_beg.values[0] < intI_ac.pos_beg.values[i] and
+                                  intI_ac.pos_beg.values[i] < attc.pos_end.values[-1])
+                                  for attc in attc_cluster_list]
+                # get the index of array to split
+                split_index = np.where(array_2_split)[0]
+                # for each of the attc cluster to split
+                # pop it, split it and add the 2 new arrays back.
+                for index in split_index:
+                    poped_attc = attc_cluster_list.pop(index)
+                    whr_split = np.searchsorted(poped_attc.pos_beg.values, intI_ac.pos_beg.values[i])
+                    for split_item in poped_attc.iloc[:whr_split], poped_attc.iloc[whr_split:]:
+                        # when there is only one attC in the cluster
+                        # the split generate an emtpy dataframe
+                        if not split_item.empty:
+                            attc_cluster_list.append(split_item)
+                    attc_cluster_nb += 1  # new attC array
+
+                attc_left = np.array([i_attc.pos_beg.values[0] for i_attc in attc_cluster_list])
+                attc_right = np.array([i_attc.pos_end.values[-1] for i_attc in attc_cluster_list])
+
+                if replicon.topology == 'circ':
+                    distances = np.array([(attc_left - intI_ac.pos_end.values[i]),
+                                          (intI_ac.pos_beg.values[i] - attc_right)]) % len(replicon)
+                else:
+                    distances = np.array([abs(attc_left - intI_ac.pos_end.values[i]),
+                                          abs(intI_ac.pos_beg.values[i] - attc_right)])
+
+                if attc_cluster_list:
+                    # tmp = (distances /
+                    #       np.array([[len(aac) for attc in attc_cluster_list]]))
+                    side, idx_attc = np.where(distances == distances.min())
+                    # side : 0 <=> left; 1 <=> right
+                    # index of the closest and biggest attC array to the integrase
+                    # exactly tmp = dist(cluster to integrase) / size cluster
+                    # to make a decision between 2 equally distant arrays
+                    # Usually they are on the same side but on 2 different strands
+
+                    # If they are exactly similar (same distance, same number of attC, take the first one arbitrarily
+                    # Or just flatten from idx_attc=[i] to idx_attc=i
+                    idx_attc = idx_attc[0]
+                    side = side[0]
+
+                else:
+                    idx_attc = 0
+                    side = np.argmin(distances)
+
+                if distances[side, idx_attc] < cfg.distance_threshold:
+                    integrons.append(Integron(replicon, cfg))
+                    integrons[-1].add_integrase(intI_ac.pos_beg.values[i],
+                                                intI_ac.pos_end.values[i],
+                                                id_int,
+                                                int(intI_ac.strand.values[i]),
+                                                intI_ac.evalue.values[i],
+                                                intI_ac.query_name.values[i])
+
+                    attc_tmp = attc_cluster_list.pop(idx_attc)
+                    for a_tmp in attc_tmp.values:
+                        integrons[-1].add_attC(a_tmp[4],  # pos_beg
+                                               a_tmp[5],  # pos_end
+                                               1 if a_tmp[6] == "+" else -1,  # sens
+                                               a_tmp[7],  # evalue
+                                               cfg.model_attc_name
+                                               )
+                    attc_cluster_nb -= 1
+
+                else:  # no array close to the integrase on both side
+                    integrons.append(Integron(replicon, cfg))
+                    integrons[-1].add_integrase(intI_ac.pos_beg.values[i],
+                                                intI_ac.pos_end.values[i],
+                                                id_int,
+                                                int(intI_ac.strand.values[i]),
+                                                intI_ac.evalue.values[i], intI_ac.query_name.values[i])
+
+        if attc_cluster_nb > 0:  # after the integrase loop (<=> no more integrases)
+            for attc_array in attc_cluster_list:
+                integrons.append(Integron(replicon, cfg))
+
+                for a_tmp in attc_array.values:
+                    integrons[-1].add_attC(a_tmp[4],
+                                           a_tmp[5],
+                                           1 if a_tmp[6] == "+" else -1,
+                                           a_tmp[7], cfg.model_attc_name)
+
+    elif intI_ac.pos_end.values.size == 0 and attc_cluster_list:  # If attC only
+        for attc_array in attc_cluster_list:
+            integrons.append(Integron(replicon, cfg))
+            for a_tmp in attc_array.values:
+                integrons[-1].add_attC(a_tmp[4],
+                                       a_tmp[5],
+                                       1 if a_tmp[6] == "+" else -1,
+                                       a_tmp[7], cfg.model_attc_name)
+
+    elif intI_ac.pos_end.values.size >= 1 and not attc_cluster_list:  # If intI only
+        for i, id_int in enumerate(intI_ac.ID_prot.values):
+            integrons.append(Integron(replicon, cfg))
+            integrons[-1].add_integrase(intI_ac.pos_beg.values[i],
+                                        intI_ac.pos_end.values[i],
+                                        id_int,
+                                        int(intI_ac.strand.values[i]),
+                                        intI_ac.evalue.values[i],
+                                        intI_ac.query_name.values[i])
+
+    return integrons
+
+
+def synthetic_replicon(replicon_size, clusters_nb, integrases_nb, topology, dist_threshold):
+    """
+    Build a replicon with *clusters_nb* attC clusters on both strands and *integrases_nb* integrases,
+    some integrases are inside a cluster and the positions are rounded to make ties on distances.
+
+    :return: the replicon, the integrases and the attC clusters
+    """
+    rng = np.random.default_rng(42)
+    attc = []
+    for strand in '+-':
+        pos = int(rng.integers(1, 50)) * 100
+        for _ in range(clusters_nb // 2):
+            for _ in range(int(rng.integers(1, 6))):
+                attc.append(('synthetic', 'attc_4', 1, 47, pos, pos + 60, strand, float(rng.choice([1e-5, 1e-7]))))
+                pos += int(rng.integers(3, 8)) * 100
+            pos += int(rng.integers(dist_threshold // 100 + 1, 2 * dist_threshold // 100)) * 100
+    replicon_size = max(replicon_size, max(a[5] for a in attc) + 5000)
+    attc = pd.DataFrame(attc, columns=["Accession_number", "cm_attC", "cm_debut", "cm_fin",
+                                       "pos_beg", "pos_end", "sens", "evalue"])
+    attc.sort_values(["Accession_number", "pos_beg", "evalue"], inplace=True)
+    clusters = search_attc(attc, True, dist_threshold, replicon_size, topology)
+
+    int_beg = np.sort(rng.integers(1, (replicon_size - 2000) // 100, integrases_nb)) * 100
+    intI_ac = pd.DataFrame({"Accession_number": 'synthetic',
+                            "query_name": 'intersection_tyr_intI',
+                            "ID_query": 'PF00589.16',
+                            "ID_prot": [f"synthetic_{i}" for i in range(integrases_nb)],
+                            "strand": rng.choice([1, -1], integrases_nb),
+                            "pos_beg": int_beg,
+                            "pos_end": int_beg + 1000,
+                            "evalue": 1e-20})
+    replicon = SeqRecord(Seq.Seq('A' * replicon_size), id='synthetic')
+    replicon.topology = topology
+    return replicon, intI_ac, clusters
+
+
 class TestFindIntegons(IntegronTest):
 
 
@@ -602,3 +776,58 @@ class TestFindIntegons(IntegronTest):
             pdt.assert_frame_equal(integron.promoter, empty)
             pdt.assert_frame_equal(integron.attI, empty)
             pdt.assert_frame_equal(integron.proteins, empty)
+
+
+    def assertIntegronsEqual(self, integrons, exp_integrons):
+        self.assertEqual(len(integrons), len(exp_integrons))
+        for integron, exp_integron in zip(integrons, exp_integrons):
+            self.assertEqual(integron.type(), exp_integron.type())
+            pdt.assert_frame_equal(integron.integrase, exp_integron.integrase)
+            pdt.assert_frame_equal(integron.attC, exp_integron.attC)
+
+
+    def test_assign_attc_clusters_eq_list(self):
+        args = argparse.Namespace()
+        args.gembase = False
+        args.prot_file = False
+        args.cmsearch = __file__
+        args.hmmsearch = __file__
+        args.prodigal = __file__
+        args.distance_threshold = 4000
+        args.attc_model = 'attc_4.cm'
+        cfg = Config(args)
+        for topology in 'lin', 'circ':
+            with self.subTest(topology=topology):
+                replicon, intI_ac, clusters = synthetic_replicon(200_000, 40, 60, topology, cfg.distance_threshold)
+                exp = assign_attc_clusters_list(replicon, intI_ac, clusters, cfg)
+                self.assertIn('complete', {i.type() for i in exp})
+                self.assertIn('In0', {i.type() for i in exp})
+                self.assertIn('CALIN', {i.type() for i in exp})
+                integrons = assign_attc_clusters(replicon, intI_ac, clusters, cfg)
+                self.assertIntegronsEqual(integrons, exp)
+                # only integrases or only attC
+                self.assertIntegronsEqual(assign_attc_clusters(replicon, intI_ac, [], cfg),
+                                          assign_attc_clusters_list(replicon, intI_ac, [], cfg))
+                self.assertIntegronsEqual(assign_attc_clusters(replicon, intI_ac.iloc[:0], clusters, cfg),
+                                          assign_attc_clusters_list(replicon, intI_ac.iloc[:0], clusters, cfg))
+
+
+    @benchmark
+    def test_benchmark_assign_attc_clusters(self):
+        args = argparse.Namespace()
+        args.gembase = False
+        args.prot_file = False
+        args.cmsearch = __file__
+        args.hmmsearch = __file__
+        args.prodigal = __file__
+        args.distance_threshold = 4000
+        args.attc_model = 'attc_4.cm'
+        cfg = Config(args)
+        self.set_log_level('WARNING')
+        replicon, intI_ac, clusters = synthetic_replicon(5_000_000, 1000, 1000, 'circ', cfg.distance_threshold)
+        with self.timer('assign attC clusters list 1000 integrases x 1000 clusters') as old_time:
+            exp = assign_attc_clusters_list(replicon, intI_ac, clusters, cfg)
+        with self.timer('assign attC clusters 1000 integrases x 1000 clusters') as new_time:
+            integrons = assign_attc_clusters(replicon, intI_ac, clusters, cfg)
+        self.assertIntegronsEqual(integrons, exp)
+        self.assertLess(new_time['time'], old_time['time'])
@@ -32,6 +32,7 @@ import argparse
 import glob
 import tempfile
 import re
+import sys
 from importlib import resources as impresources
 
 import numpy as np
@@ -110,11 +111,12 @@ class TestFuncAnnot(IntegronTest):
         self.prot_db = ProdigalDB(self.replicon, self.cfg, prot_file=self.prot_file)
 
         self.exp_files = ["{}{}".format(self.replicon.id, suffix) for suffix in ("_NCBIfam-AMRFinder_fa_table.res",
+                                                                                 "_NCBIfam-AMRFinder_fa_domtable.res",
                                                                                  "_intI_table.res",
                                                                                  "_phage_int_table.res",
                                                                                  "_NCBIfam-AMRFinder_fa.res",
-                                                                                 "_intI.res",
-                                                                                 "_phage_int.res",
+                                                                                 "_intI_domtable.res",
+                                                                                 "_phage_int_domtable.res",
                                                                                  "_subseqprot.tmp")]
         self.exp_files = [os.path.join(self.tmp_dir, file) for file in self.exp_files]
 
@@ -215,8 +217,8 @@ class TestFuncAnnot(IntegronTest):
         files_created = [f for f in glob.glob(os.path.join(self.tmp_dir, "*")) if os.path.isfile(f)]
         exp_files = ["{}{}".format(self.replicon.id, suffix) for suffix in ("_intI_table.res",
                                                                             "_phage_int_table.res",
-                                                                            "_intI.res",
-                                                                            "_phage_int.res")]
+                                                                            "_intI_domtable.res",
+                                                                            "_phage_int_domtable.res")]
         exp_files = [os.path.join(self.tmp_dir, file) for file in exp_files]
         self.assertEqual(set(exp_files), set(files_created))
 
@@ -252,8 +254,8 @@ class TestFuncAnnot(IntegronTest):
         files_created = [f for f in glob.glob(os.path.join(self.tmp_dir, "*")) if os.path.isfile(f)]
         exp_files = ["{}{}".format(self.replicon.id, suffix) for suffix in ("_intI_table.res",
                                                                             "_phage_int_table.res",
-                                                                            "_intI.res",
-                                                                            "_phage_int.res")]
+                                                                            "_intI_domtable.res",
+                                                                            "_phage_int_domtable.res")]
         exp_files = [os.path.join(self.tmp_dir, file) for file in exp_files]
         self.assertEqual(set(exp_files), set(files_created))
         # check proteins after annotation
@@ -365,6 +367,132 @@ class TestFuncAnnot(IntegronTest):
             pdt.assert_frame_equal(inte.proteins.sort_index(), prots.sort_index())
 
 
+    def _fake_hmmsearch(self):
+        """
+        Create a fake hmmsearch which report all proteins with a profile named as the hmm file
+        with a P-value of 1e-10 for bank_1 and 1e-20 for the others banks.
+        Each call is recorded in the file *calls*.
+
+        :return: the path to the fake hmmsearch and to the file of calls
+        """
+        fake_hmmsearch = os.path.join(self.tmp_dir, 'hmmsearch')
+        calls = os.path.join(self.tmp_dir, 'calls')
+        with open(fake_hmmsearch, 'w') as fake:
+            fake.write(f"""#!{sys.executable}
+import os
+import sys
+args = sys.argv[1:]
+with open({calls!r}, 'a') as calls:
+    calls.write(' '.join(args) + '\\n')
+assert args[args.index('--domZ') + 1] == '1'
+query = os.path.basename(args[-2])
+pvalue = '1e-10' if query == 'bank_1' else '1e-20'
+targets = [line[1:].split()[0] for line in open(args[-1]) if line.startswith('>')]
+with open(args[args.index('--tblout') + 1], 'w') as tblout, \\
+        open(args[args.index('--domtblout') + 1], 'w') as domtblout:
+    domtblout.write('# target name accession tlen query name\\n')
+    for target in targets:
+        tblout.write(f'{{target}} - {{query}} - 1e-10 40.0 0.1 1e-10 40.0 0.1 1 1 0 1 1 1 1 1 -\\n')
+        domtblout.write(f'{{target}} - 300 {{query}} - 100 1e-10 40.0 0.1 1 1 {{pvalue}} {{pvalue}} 40.0 0.1 '
+                        f'1 90 10 100 8 102 0.9 -\\n')
+open(args[args.index('-o') + 1], 'w').close()
+""")
+        os.chmod(fake_hmmsearch, 0o755)
+        return fake_hmmsearch, calls
+
+
+    def _calins(self):
+        """
+        :return: 2 CALIN with 4 and 2 proteins
+        """
+        integron1 = Integron(self.replicon, self.cfg)
+        integron1.add_attC(7400, 7650, -1, 7e-9, "attc_4")
+        integron1.add_attC(8600, 8650, -1, 7e-4, "attc_4")
+        integron1.add_attC(10200, 10400, -1, 7e-7, "attc_4")
+        integron1.add_attC(10800, 10900, -1, 7e-7, "attc_4")
+        integron1.add_proteins(self.prot_db)
+        integron2 = Integron(self.replicon, self.cfg)
+        integron2.add_attC(4320, 4400, -1, 7e-9, "attc_4")
+        integron2.add_proteins(self.prot_db)
+        return [integron1, integron2]
+
+
+    def test_annot_one_search_by_bank(self):
+        """
+        Test that the proteins of all integrons are annotated with one hmmsearch run by hmm file
+        and that the domains E-values are those of a search on the proteins of each integron.
+        """
+        self.cfg._args.hmmsearch, calls = self._fake_hmmsearch()
+        hmm_files = [os.path.join(self.tmp_dir, 'bank_1'), os.path.join(self.tmp_dir, 'bank_2')]
+        integrons = self._calins()
+
+        func_annot(integrons, self.replicon, self.prot_db, hmm_files, self.cfg, self.tmp_dir)
+        with open(calls) as calls_file:
+            self.assertEqual(len(calls_file.readlines()), 2)
+        for integron, prot_nb in zip(integrons, (4, 2)):
+            self.assertEqual(len(integron.proteins), prot_nb)
+            self.assertEqual(set(integron.proteins.annotation), {'bank_2'})
+            self.assertTrue(np.allclose(integron.proteins.evalue, 1e-20 * prot_nb, rtol=0, atol=1e-22))
+
+
+    def test_annot_overlapping_integrons(self):
+        """
+        Test that a protein which belongs to several integrons is annotated in each of them
+        with the domain E-value of a search on the proteins of each integron.
+        """
+        self.cfg._args.hmmsearch, _ = self._fake_hmmsearch()
+        hmm_files = [os.path.join(self.tmp_dir, 'bank_2')]
+        integron1 = self._calins()[0]
+        # integron2 is included in integron1, they share their proteins
+        integron2 = Integron(self.replicon, self.cfg)
+        integron2.add_attC(10200, 10400, -1, 7e-7, "attc_4")
+        integron2.add_attC(10800, 10900, -1, 7e-7, "attc_4")
+        integron2.add_proteins(self.prot_db)
+        prots_1 = set(integron1.proteins.index)
+        prots_2 = set(integron2.proteins.index)
+        self.assertTrue(prots_2)
+        self.assertTrue(prots_2 < prots_1)
+
+        func_annot([integron1, integron2], self.replicon, self.prot_db, hmm_files, self.cfg, self.tmp_dir)
+        for integron, prots in ((integron1, prots_1), (integron2, prots_2)):
+            self.assertSetEqual(set(integron.proteins.index), prots)
+            self.assertEqual(set(integron.proteins.annotation), {'bank_2'})
+            # domZ is the number of proteins of the integron reported for the profile
+            self.assertTrue(np.allclose(integron.proteins.evalue, 1e-20 * len(prots), rtol=0, atol=1e-22))
+
+
+    def test_annot_parallel_banks(self):
+        """
+        Test that the hmm files are searched in parallel with the cpus shared between the runs
+        and that the results are the same as a sequential search.
+        """
+        self.cfg._args.hmmsearch, calls = self._fake_hmmsearch()
+        # bank_2 and bank_3 hit the same proteins with the same evalue, bank_2 must be kept
+        hmm_files = [os.path.join(self.tmp_dir, f'bank_{i}') for i in (1, 2, 3)]
+        seq_integrons = self._calins()
+        func_annot(seq_integrons, self.replicon, self.prot_db, hmm_files, self.cfg, self.tmp_dir)
+
+        os.unlink(calls)
+        self.cfg._args.cpu = 7
+        par_integrons = self._calins()
+        self.set_log_level('INFO')
+        try:
+            with self.catch_log() as log:
+                func_annot(par_integrons, self.replicon, self.prot_db, hmm_files, self.cfg, self.tmp_dir)
+                got_log = log.get_value()
+        finally:
+            self.set_log_level('WARNING')
+        with open(calls) as calls_file:
+            calls = [call.split() for call in calls_file]
+        self.assertEqual(len(calls), 3)
+        self.assertEqual({call[call.index('--cpu') + 1] for call in calls}, {'2'})
+        for seq_integron, par_integron in zip(seq_integrons, par_integrons):
+            pdt.assert_frame_equal(seq_integron.proteins, par_integron.proteins)
+            self.assertEqual(set(par_integron.proteins.annotation), {'bank_2'})
+        for i in (1, 2, 3):
+            self.assertRegex(got_log, rf"Functional annotation with bank_{i}: 6 proteins annotated in \d+\.\d\ds")
+
+
     def test_annot_wrong_hmm(self):
         """
         Test that when the given hmm file does not exist, it returns an error specifying that
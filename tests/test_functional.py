@@ -40,6 +40,8 @@ import pandas.testing as pdt
 # import warnings
 # warnings.simplefilter('ignore', BiopythonExperimentalWarning)
 from Bio import SeqIO
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
 
 try:
     from tests import IntegronTest
@@ -242,6 +244,112 @@ class TestFunctional(IntegronTest):
         pdt.assert_frame_equal(summary_2nd_contig, iso_summary)
 
 
+    @unittest.skipIf(not shutil.which('cmsearch'), 'cmsearch binary not found.')
+    @unittest.skipIf(not shutil.which('hmmsearch'), 'hmmsearch binary not found.')
+    @unittest.skipIf(not shutil.which('prodigal'), 'prodigal binary not found.')
+    def test_acba_jobs_eq_sequential(self):
+        # test if we find the same results if we analyse replicons in parallel with --jobs
+        replicon_filename = 'ACBA.0917.00019'
+        results = {}
+        for jobs in (1, 2):
+            out_dir = os.path.join(self.out_dir, f'jobs_{jobs}')
+            cmd = "integron_finder " \
+                  f"--outdir {out_dir} " \
+                  f"--jobs {jobs} " \
+                  "--cpu 2 " \
+                  f"{self.find_data('Replicons', replicon_filename + '.fna')}"
+            with self.catch_io(out=True, err=True):
+                main(cmd.split()[1:], loglevel='WARNING')
+            results[jobs] = os.path.join(out_dir, f'Results_Integron_Finder_{replicon_filename}')
+
+        for ext in ('.integrons', '.summary'):
+            seq_res = os.path.join(results[1], replicon_filename + ext)
+            par_res = os.path.join(results[2], replicon_filename + ext)
+            with open(seq_res) as seq_file, open(par_res) as par_file:
+                # skip the header which contains the command line
+                seq_lines = [line for line in seq_file if not line.startswith('# cmd')]
+                par_lines = [line for line in par_file if not line.startswith('# cmd')]
+            self.assertListEqual(seq_lines, par_lines)
+
+
+    @unittest.skipIf(not shutil.which('cmsearch'), 'cmsearch binary not found.')
+    @unittest.skipIf(not shutil.which('hmmsearch'), 'hmmsearch binary not found.')
+    @unittest.skipIf(not shutil.which('prodigal'), 'prodigal binary not found.')
+    def test_acba_prodigal_prefetch_eq_sequential(self):
+        # test if we find the same results if the proteins are predicted in advance
+        replicon_filename = 'ACBA.0917.00019'
+        results = {}
+        for prefetch in (0, 2):
+            out_dir = os.path.join(self.out_dir, f'prefetch_{prefetch}')
+            cmd = "integron_finder " \
+                  f"--outdir {out_dir} " \
+                  f"--prodigal-prefetch {prefetch} " \
+                  f"{self.find_data('Replicons', replicon_filename + '.fna')}"
+            with self.catch_io(out=True, err=True):
+                main(cmd.split()[1:], loglevel='WARNING')
+            results[prefetch] = os.path.join(out_dir, f'Results_Integron_Finder_{replicon_filename}')
+
+        for ext in ('.integrons', '.summary'):
+            seq_res = os.path.join(results[0], replicon_filename + ext)
+            pref_res = os.path.join(results[2], replicon_filename + ext)
+            with open(seq_res) as seq_file, open(pref_res) as pref_file:
+                # skip the header which contains the command line
+                seq_lines = [line for line in seq_file if not line.startswith('# cmd')]
+                pref_lines = [line for line in pref_file if not line.startswith('# cmd')]
+            self.assertListEqual(seq_lines, pref_lines)
+
+
+    def test_prefetch_proteins(self):
+        replicons = [SeqRecord(Seq('ACGT'), id=f"rep_{i}") for i in range(6)]
+        # the skipped replicons are not prefetched
+        replicons[2] = None
+        started = []
+        depth = 2
+
+        def predict_proteins(replicon, cfg):
+            started.append(replicon.id)
+            if replicon.id == 'rep_3':
+                raise RuntimeError('prodigal failed')
+
+        predict_proteins_ori = finder._predict_proteins
+        finder._predict_proteins = predict_proteins
+        try:
+            received = []
+            for replicon in finder.prefetch_proteins(iter(replicons), None, depth):
+                received.append(replicon)
+                # backpressure: no more than depth replicons are prefetched ahead of the current one
+                self.assertLessEqual(len(started), sum(rep is not None for rep in replicons[:len(received) + depth]))
+                if replicon is not None:
+                    self.assertIn(replicon.id, started)
+        finally:
+            finder._predict_proteins = predict_proteins_ori
+        # the failure is reported when the replicon is analysed
+        self.assertListEqual(received, replicons)
+        self.assertListEqual(sorted(started), [rep.id for rep in replicons if rep is not None])
+
+
+    def test_process_replicon(self):
+        # the replicon is announced when its analysis starts (in the worker with --jobs)
+        replicon = SeqRecord(Seq('ACGT'), id="rep_2")
+        events = []
+
+        def find_integron_in_one_replicon(replicon, cfg):
+            events.append(log.get_value())
+            return 'rep_2.integrons', 'rep_2.summary'
+
+        find_integron_ori = finder.find_integron_in_one_replicon
+        finder.find_integron_in_one_replicon = find_integron_in_one_replicon
+        self.set_log_level('INFO')
+        try:
+            with self.catch_log() as log:
+                self.assertEqual(finder._process_replicon(replicon, None, 2, 5),
+                                 ('rep_2.integrons', 'rep_2.summary'))
+        finally:
+            finder.find_integron_in_one_replicon = find_integron_ori
+            self.set_log_level('WARNING')
+        self.assertIn("Processing replicon rep_2 (2/5)", events[0])
+
+
     @unittest.skipIf(not shutil.which('cmsearch'), 'cmsearch binary not found.')
     @unittest.skipIf(not shutil.which('hmmsearch'), 'hmmsearch binary not found.')
     @unittest.skipIf(not shutil.which('prodigal'), 'prodigal binary not found.')
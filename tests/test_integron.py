@@ -45,7 +45,7 @@ from integron_finder.config import Config
 from integron_finder.utils import FastaIterator
 from integron_finder.topology import Topology
 from integron_finder.integron import Integron
-from integron_finder.prot_db import ProdigalDB
+from integron_finder.prot_db import ProdigalDB, SeqDescTable
 
 class TestIntegron(IntegronTest):
 
@@ -434,6 +434,45 @@ class TestIntegron(IntegronTest):
         pdt.assert_frame_equal(exp_proteins.sort_index(), integron.proteins.sort_index())
 
 
+    def test_add_proteins_circular(self):
+        # proteins around the origin of a circular replicon
+
+        class FakeProtDB:
+
+            def descriptions(self):
+                return SeqDescTable(np.array(['prot_A', 'prot_B', 'prot_C', 'prot_D', 'prot_E'], dtype=object),
+                                    np.array([1, -1, 1, -1, 1]),
+                                    np.array([9500, 9980, 50, 500, 5000]),
+                                    np.array([9700, 120, 400, 900, 6000]))
+
+        replicon = SeqRecord(Seq.Seq('A' * 10000), id='circular', name='circular')
+        data_attc = {"pos_beg": [9800, 9900],
+                     "pos_end": [9850, 9950],
+                     "strand": [-1] * 2,
+                     "evalue": [1e-06] * 2,
+                     "type_elt": ['attC'] * 2,
+                     "annotation": ['attC'] * 2,
+                     "model": ['attc_4'] * 2,
+                     "distance_2attC": [np.nan, 50.0]}
+        attC = pd.DataFrame(data_attc, columns=self.columns, index=['attc_000', 'attc_001'])
+        attC = attC.astype(dtype=self.dtype)
+
+        for topology, exp_ids in (('circ', ['prot_A', 'prot_B', 'prot_C']),
+                                  ('lin', ['prot_A', 'prot_B'])):
+            with self.subTest(topology=topology):
+                replicon.topology = topology
+                integron = Integron(replicon, self.cfg)
+                integron.attC = attC
+                integron.add_proteins(FakeProtDB())
+                self.assertListEqual(integron.proteins.index.tolist(), exp_ids)
+                self.assertListEqual(integron.proteins.columns.tolist(), self.columns)
+                self.assertListEqual(integron.proteins.pos_beg.tolist(), [9500, 9980, 50][:len(exp_ids)])
+                self.assertListEqual(integron.proteins.pos_end.tolist(), [9700, 120, 400][:len(exp_ids)])
+                self.assertListEqual(integron.proteins.strand.tolist(), [1, -1, 1][:len(exp_ids)])
+                self.assertTrue(integron.proteins.evalue.isna().all())
+                self.assertSetEqual(set(integron.proteins.type_elt), {'protein'})
+
+
     def test_describe(self):
         replicon_name = "acba.007.p01.13"
         replicon_path = self.find_data(os.path.join('Replicons', replicon_name + '.fst'))
@@ -507,6 +546,53 @@ class TestIntegron(IntegronTest):
         pdt.assert_frame_equal(recieved_description, excp_description)
 
 
+    def test_describe_cache(self):
+        replicon = SeqRecord(Seq.Seq('A' * 20000), id='foo')
+        replicon.topology = 'lin'
+        integron = Integron(replicon, self.cfg)
+        for i in range(200):
+            integron.add_attC(100 + i * 80, 160 + i * 80, -1, 1e-5, "attc_4")
+        description = integron.describe()
+        self.assertEqual(len(description), 200)
+        self.assertListEqual(description.element.tolist()[:2], ['attc_001', 'attc_002'])
+        self.assertTrue(np.isnan(description.distance_2attC.values[0]))
+        self.assertListEqual(description.distance_2attC.tolist()[1:3], [20.0, 20.0])
+        # the description is kept and cannot be modified by the caller
+        description["evalue"] = 1.0
+        pdt.assert_frame_equal(integron.describe(), integron.describe())
+        self.assertEqual(integron.describe().evalue.tolist()[0], 1e-5)
+        # but it is computed again when the integron change
+        integron.add_integrase(19000, 19900, 'foo_1', -1, 1e-20, "intersection_tyr_intI")
+        description = integron.describe()
+        self.assertEqual(len(description), 201)
+        self.assertEqual(description.element.tolist()[0], 'foo_1')
+        self.assertTrue((description.type == 'complete').all())
+
+
+    def test_annotate_proteins(self):
+        replicon = SeqRecord(Seq.Seq('A' * 5000), id='foo')
+        integron = Integron(replicon, self.cfg)
+        proteins = pd.DataFrame({'pos_beg': [10, 1000, 2000],
+                                 'pos_end': [900, 1900, 2900],
+                                 'strand': [1, 1, -1],
+                                 'evalue': [np.nan] * 3,
+                                 'type_elt': ['protein'] * 3,
+                                 'annotation': ['protein'] * 3,
+                                 'model': ['NA'] * 3,
+                                 'distance_2attC': [np.nan] * 3},
+                                index=['foo_1', 'foo_2', 'foo_3'],
+                                columns=self.columns).astype(dtype=self.dtype)
+        integron.proteins = proteins
+        self.assertEqual(integron.describe().annotation.tolist(), ['protein'] * 3)
+        integron.annotate_proteins(['foo_3', 'foo_1'], [1e-10, 2e-20], ['aadA', 'sul1'], ['NF000001', 'NF000002'])
+        exp = proteins.copy()
+        exp.loc[['foo_3', 'foo_1'], 'evalue'] = [1e-10, 2e-20]
+        exp.loc[['foo_3', 'foo_1'], 'annotation'] = ['aadA', 'sul1']
+        exp.loc[['foo_3', 'foo_1'], 'model'] = ['NF000001', 'NF000002']
+        pdt.assert_frame_equal(integron.proteins, exp)
+        self.assertEqual(integron.describe().annotation.tolist(), ['sul1', 'protein', 'aadA'])
+
+
     # def test_draw_integron(self):
     #     pass
 
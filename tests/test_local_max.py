@@ -27,6 +27,7 @@
 ####################################################################################
 
 import os
+import time
 import tempfile
 import shutil
 import re
@@ -46,6 +47,7 @@ except ImportError as err:
 from integron_finder.utils import FastaIterator
 from integron_finder.topology import Topology
 from integron_finder import infernal
+from integron_finder.cache import ResultCache
 
 _read_infernal_ori = infernal.read_infernal
 
@@ -239,7 +241,7 @@ class TestLocalMax(IntegronTest):
         fake_cp = namedtuple('FakeCompletedProcess', 'returncode')
         fake_cp_1 = fake_cp(1)
         try:
-            infernal.subprocess.run = lambda x, stdout=None: fake_cp_1
+            infernal.subprocess.run = lambda x, **kwargs: fake_cp_1
             with self.assertRaises(RuntimeError) as ctx:
                 _ = infernal.local_max(self.replicon,
                                        win_beg, win_end,
@@ -251,4 +253,184 @@ class TestLocalMax(IntegronTest):
                                        )
             self.assertTrue(str(ctx.exception).endswith(f"failed returncode = {fake_cp_1.returncode}"))
         finally:
-            infernal.subprocess.run = run_ori
\ No newline at end of file
+            infernal.subprocess.run = run_ori
+
+class TestLocalMaxBatch(IntegronTest):
+
+    tblout_header = ("#target name         accession query name           accession mdl mdl from   mdl to seq from   "
+                     "seq to strand trunc pass   gc  bias  score   E-value inc description of target\n"
+                     "#------------------- --------- -------------------- --------- --- -------- -------- -------- "
+                     "-------- ------ ----- ---- ---- ----- ------ --------- --- ---------------------\n")
+    tblout_footer = ("#\n"
+                     "# Program:         cmsearch\n"
+                     "# [ok]\n")
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory(prefix='tmp_test_integron_finder')
+        self.out_dir = self._tmp_dir.name
+        self.model_attc_path = self.find_data(os.path.join('Models', 'attc_4.cm'))
+        replicon_path = self.find_data(os.path.join('Replicons', 'lian.001.c02.10.fst'))
+        with FastaIterator(replicon_path) as sequences_db:
+            sequences_db.topologies = Topology(1, 'lin')
+            self.replicon = next(sequences_db)
+        self.cmsearch_calls = []
+        self._cmsearch_max_ori = infernal._cmsearch_max
+        infernal._cmsearch_max = self.fake_cmsearch_max
+
+    def tearDown(self):
+        infernal._cmsearch_max = self._cmsearch_max_ori
+        self._tmp_dir.cleanup()
+
+    def hit(self, target, seq_from, seq_to, strand, evalue):
+        return (f"{target:<20} -         attC_4               -          cm        1       47 {seq_from:>8} "
+                f"{seq_to:>8}      {strand}    no    1 0.40   0.0   20.1  {evalue:8.2g} !   -\n")
+
+    def fake_cmsearch_max(self, subseqs, tblout_path, replicon_size, strand_search, model_attc_path,
+                          evalue_attc=1., cmsearch_bin='cmsearch', cpu=1, infile_path=None, output_path=None):
+        """
+        write a hit at position 101 - 226 of each sequence
+        """
+        self.cmsearch_calls.append(([subseq.id for subseq in subseqs], replicon_size, strand_search, infile_path))
+        with open(tblout_path, 'w') as tblout:
+            tblout.write(self.tblout_header)
+            for subseq in subseqs:
+                tblout.write(self.hit(subseq.id, 101, 226, '+', 0.01))
+            tblout.write(self.tblout_footer)
+
+    def test_split_tblout(self):
+        tblout_path = os.path.join(self.out_dir, 'batch_tblout.res')
+        with open(tblout_path, 'w') as tblout:
+            tblout.write(self.tblout_header)
+            tblout.write(self.hit('seq_1', 101, 226, '+', 0.01))
+            tblout.write(self.hit('seq_2', 500, 375, '-', 0.02))
+            tblout.write(self.hit('seq_1', 701, 826, '+', 0.03))
+            tblout.write(self.tblout_footer)
+        targets = {'seq_1': os.path.join(self.out_dir, 'seq_1.res'),
+                   'seq_2': os.path.join(self.out_dir, 'seq_2.res'),
+                   'seq_3': os.path.join(self.out_dir, 'seq_3.res')}
+        infernal._split_tblout(tblout_path, targets)
+        expected = {'seq_1': [self.hit('seq_1', 101, 226, '+', 0.01), self.hit('seq_1', 701, 826, '+', 0.03)],
+                    'seq_2': [self.hit('seq_2', 500, 375, '-', 0.02)],
+                    'seq_3': []}
+        for target, path in targets.items():
+            with open(path) as f:
+                self.assertEqual(f.read(),
+                                 self.tblout_header + ''.join(expected[target]) + self.tblout_footer)
+
+    def test_local_max_batch(self):
+        windows = [(942899, 947099, 'top'), (10000, 12000, 'top'), (942899, 947099, 'top'), (20000, 22000, 'both')]
+        received = infernal.local_max_batch(self.replicon, windows, self.model_attc_path,
+                                            out_dir=self.out_dir)
+        # one cmsearch for the 2 distinct 'top' windows, one for the 'both' window
+        self.assertEqual(len(self.cmsearch_calls), 2)
+        self.assertEqual(self.cmsearch_calls[0],
+                         (['LIAN.001.C02_10_942899_947099', 'LIAN.001.C02_10_10000_12000'],
+                          len(self.replicon), 'top', None))
+        self.assertEqual(self.cmsearch_calls[1],
+                         (['LIAN.001.C02_10'], len(self.replicon), 'both', None))
+
+        self.assertEqual(len(received), len(windows))
+        for (win_beg, win_end, _), df_max in zip(windows, received):
+            expected = pd.DataFrame([['LIAN.001.C02_10', 'attc_4', 1, 47, win_beg + 101, win_beg + 226,
+                                      '+', 0.01]],
+                                    columns=['Accession_number', 'cm_attC', 'cm_debut', 'cm_fin', 'pos_beg',
+                                             'pos_end', 'sens', 'evalue'])
+            pdt.assert_frame_equal(expected, df_max)
+        for win_beg, win_end, _ in windows:
+            self.assertTrue(os.path.exists(
+                os.path.join(self.out_dir, f'LIAN.001.C02_10_{win_beg}_{win_end}_subseq_attc_table.res')))
+
+    def test_local_max_batch_same_as_local_max(self):
+        win_beg, win_end = 942899, 947099
+        batch = infernal.local_max_batch(self.replicon, [(win_beg, win_end, 'top'), (30000, 31000, 'top')],
+                                         self.model_attc_path, out_dir=self.out_dir)
+        single = infernal.local_max(self.replicon, win_beg, win_end, self.model_attc_path,
+                                    strand_search='top', out_dir=self.out_dir)
+        pdt.assert_frame_equal(batch[0], single)
+
+    def test_local_max_batch_cache(self):
+        res_cache = ResultCache(os.path.join(self.out_dir, 'cache'), 1024 * 1024)
+        windows = [(942899, 947099, 'top'), (10000, 12000, 'top')]
+        first = infernal.local_max_batch(self.replicon, windows, self.model_attc_path,
+                                         cmsearch_bin=__file__, out_dir=self.out_dir, cache=res_cache)
+        self.assertEqual(len(self.cmsearch_calls), 1)
+        # only the new window is searched
+        second = infernal.local_max_batch(self.replicon, windows + [(20000, 22000, 'top')], self.model_attc_path,
+                                          cmsearch_bin=__file__, out_dir=self.out_dir, cache=res_cache)
+        self.assertEqual(len(self.cmsearch_calls), 2)
+        self.assertEqual(self.cmsearch_calls[1][0], ['LIAN.001.C02_10'])
+        for df_1, df_2 in zip(first, second):
+            pdt.assert_frame_equal(df_1, df_2)
+
+    def test_local_max_batch_table_end(self):
+        windows = [(942899, 947099, 'top'), (10000, 12000, 'both')]
+        table_end_path = os.path.join(self.out_dir, 'LIAN.001.C02_10_subseq_attc_table_end.res')
+        table_end = []
+        infernal.local_max_batch(self.replicon, windows, self.model_attc_path,
+                                 out_dir=self.out_dir, table_end=table_end)
+        self.assertFalse(os.path.exists(table_end_path))
+        self.assertListEqual([df_max.pos_beg.tolist() for df_max in table_end], [[943000], [10101]])
+        infernal.local_max_batch(self.replicon, windows, self.model_attc_path, out_dir=self.out_dir)
+        with open(table_end_path) as table:
+            self.assertListEqual([int(line.split()[4]) for line in table], [943000, 10101])
+
+    def test_run_search_table_end(self):
+        table_end_path = os.path.join(self.out_dir, 'table_end.res')
+        columns = ['Accession_number', 'cm_attC', 'cm_debut', 'cm_fin', 'pos_beg', 'pos_end', 'sens', 'evalue']
+
+        def search():
+            dfs_max = yield [(100, 200, 'top'), (300, 400, 'bottom')]
+            dfs_max += yield [(500, 600, 'top')]
+            return dfs_max
+
+        def local_max_func(window_beg, window_end, strand_search, cpu, table_end):
+            if window_beg == 100:
+                # the first window is over after the second one
+                time.sleep(0.1)
+            df_max = pd.DataFrame([['seq', 'attc_4', 1, 47, window_beg, window_end, '+', 0.01]], columns=columns)
+            table_end.append(df_max)
+            return df_max
+
+        dfs_max = infernal.run_search(search(), local_max_func, cpu=2, table_end_path=table_end_path)
+        self.assertListEqual([df_max.pos_beg.iloc[0] for df_max in dfs_max], [100, 300, 500])
+        # the intermediate results are written in the windows order
+        with open(table_end_path) as table:
+            self.assertListEqual([int(line.split()[4]) for line in table], [100, 300, 500])
+
+    def test_cmsearch_max_stdin(self):
+        # a fake cmsearch which copy its input and its arguments
+        captured = os.path.join(self.out_dir, 'captured')
+        fake_bin = os.path.join(self.out_dir, 'fake_cmsearch')
+        with open(fake_bin, 'w') as f:
+            f.write('#!/bin/sh\n'
+                    f'echo "$@" > {captured}.args\n'
+                    'for last; do true; done\n'
+                    f'if [ "$last" = "-" ]; then cat > {captured}.fst; else cp "$last" {captured}.fst; fi\n')
+        os.chmod(fake_bin, 0o755)
+        subseqs = [infernal._subseq(self.replicon, 100, 300), infernal._subseq(self.replicon, 1000, 1200)]
+        subseqs[1].id = 'win_2'
+        expected_fasta = ''.join(subseq.format('fasta') for subseq in subseqs)
+        tblout_path = os.path.join(self.out_dir, 'tblout.res')
+
+        # by default the sequences are not written on disk
+        self._cmsearch_max_ori(subseqs, tblout_path, len(self.replicon), 'top', self.model_attc_path,
+                               cmsearch_bin=fake_bin)
+        with open(captured + '.fst') as f:
+            self.assertEqual(f.read(), expected_fasta)
+        with open(captured + '.args') as f:
+            args = f.read().split()
+        self.assertEqual(args[-1], '-')
+        self.assertNotIn('-A', args)
+        self.assertEqual(sorted(os.listdir(self.out_dir)), ['captured.args', 'captured.fst', 'fake_cmsearch'])
+
+        # keep the intermediate files
+        infile_path = os.path.join(self.out_dir, 'subseq.fst')
+        output_path = os.path.join(self.out_dir, 'subseq_attc.res')
+        self._cmsearch_max_ori(subseqs, tblout_path, len(self.replicon), 'top', self.model_attc_path,
+                               cmsearch_bin=fake_bin, infile_path=infile_path, output_path=output_path)
+        with open(infile_path) as f:
+            self.assertEqual(f.read(), expected_fasta)
+        with open(captured + '.args') as f:
+            args = f.read().split()
+        self.assertEqual(args[-1], infile_path)
+        self.assertEqual(args[args.index('-A') + 1], output_path)
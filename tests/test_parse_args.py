@@ -85,6 +85,45 @@ class TestParseArgs(IntegronTest):
         cfg = parse_args(['--cpu', str(cpu), self.replicon])
         self.assertEqual(cfg.cpu, cpu)
 
+    def test_jobs(self):
+        cfg = parse_args([self.replicon])
+        self.assertEqual(cfg.jobs, 1)
+        jobs = 4
+        cfg = parse_args(['--jobs', str(jobs), self.replicon])
+        self.assertEqual(cfg.jobs, jobs)
+
+    def test_cache(self):
+        cfg = parse_args([self.replicon])
+        self.assertIsNone(cfg.cache_dir)
+        self.assertEqual(cfg.cache_size, 2048 * 1024 * 1024)
+        cfg = parse_args(['--cache-dir', 'foo', '--cache-size', '10', self.replicon])
+        self.assertEqual(cfg.cache_dir, 'foo')
+        self.assertEqual(cfg.cache_size, 10 * 1024 * 1024)
+
+    def test_attc_batch(self):
+        cfg = parse_args([self.replicon])
+        self.assertFalse(cfg.attc_batch)
+        cfg = parse_args(['--attc-batch', self.replicon])
+        self.assertTrue(cfg.attc_batch)
+
+    def test_integrase_batch(self):
+        cfg = parse_args([self.replicon])
+        self.assertFalse(cfg.integrase_batch)
+        cfg = parse_args(['--integrase-batch', self.replicon])
+        self.assertTrue(cfg.integrase_batch)
+
+    def test_prodigal_batch(self):
+        cfg = parse_args([self.replicon])
+        self.assertFalse(cfg.prodigal_batch)
+        cfg = parse_args(['--prodigal-batch', self.replicon])
+        self.assertTrue(cfg.prodigal_batch)
+
+    def test_prodigal_prefetch(self):
+        cfg = parse_args([self.replicon])
+        self.assertEqual(cfg.prodigal_prefetch, 0)
+        cfg = parse_args(['--prodigal-prefetch', '4', self.replicon])
+        self.assertEqual(cfg.prodigal_prefetch, 4)
+
     def test_distance_threshold(self):
         cfg = parse_args([self.replicon])
         self.assertEqual(cfg.distance_threshold, 4000)
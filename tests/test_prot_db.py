@@ -31,19 +31,61 @@ import argparse
 import tempfile
 import shutil
 import re
+import pickle
+
+import numpy as np
+import pandas.testing as pdt
 
 from Bio import SeqIO, Seq
 
 try:
-    from tests import IntegronTest
+    from tests import IntegronTest, benchmark
 except ImportError as err:
     msg = "Cannot import integron_finder: {0!s}".format(err)
     raise ImportError(msg)
 
-from integron_finder import IntegronError
+from integron_finder import IntegronError, prot_db
 from integron_finder.config import Config
+from integron_finder.cache import ResultCache
 from integron_finder.utils import MultiFastaReader
-from integron_finder.prot_db import GembaseDB, ProdigalDB, SeqDesc, CustomDB, GembaseType, RepliconType
+from integron_finder.prot_db import GembaseDB, GembaseGenome, ProdigalDB, SeqDesc, SeqDescTable, CustomDB, \
+    GembaseType, RepliconType, FastaIndex, ProteinStore, prodigal_batch
+
+def get_description_regex(info, gene_id):
+    """
+    The former implementation of GembaseDB.get_description which scan the whole LSTINFO for each gene.
+    It is used as reference to test the gene index.
+    """
+    specie, date, strain, contig_gene = gene_id.split('.')
+    contig_gene = contig_gene[1:]
+    pattern = fr'{specie}\.{date}\.{strain}\.\w?{contig_gene}'
+    seq_info = info.loc[info[4].str.contains(pattern, regex=True)]
+    if seq_info.empty:
+        raise KeyError(gene_id)
+    return SeqDesc(seq_info[4].values[0],
+                   1 if seq_info[2].values[0] == "D" else -1,
+                   seq_info[0].values[0],
+                   seq_info[1].values[0],
+                   )
+
+
+def make_protfile_seqio(seq_ids, all_prot_path, prot_file_path):
+    """
+    The former implementation of GembaseDB._make_protfile which parse and format each protein.
+    It is used as reference to test the copy of the raw records.
+    """
+    all_prots = SeqIO.index(all_prot_path, "fasta")
+    missing = []
+    with open(prot_file_path, 'w') as prot_file:
+        for seq_id in seq_ids:
+            try:
+                seq = all_prots[seq_id]
+                SeqIO.write(seq, prot_file, 'fasta')
+            except KeyError:
+                missing.append(seq_id)
+    all_prots.close()
+    return missing
+
 
 class TestGemBase(IntegronTest):
 
@@ -545,6 +587,8 @@ class TestGemBase(IntegronTest):
             for seq_id, desc in descriptions.items():
                 with self.subTest(seq_id=seq_id, desc=desc):
                     self.assertEqual(desc, db.get_description(seq_id))
+                    # the description comes from the LSTINFO not from the protein header
+                    self.assertEqual(desc, db._parse_description(seq_id, db[seq_id].description))
 
         with self.assertRaises(IntegronError) as ctx:
             db.get_description('nimport_naoik')
@@ -555,6 +599,271 @@ class TestGemBase(IntegronTest):
         self.assertEqual(str(ctx.exception), "'FOO.BAR.00019.i0001_03924'")
 
 
+
+    def test_get_description_index(self):
+        # the gene index must give the same results as the scan of the LSTINFO
+        for gembase, seq_name in (('Gembase1', 'ACBA.0917.00019'), ('Gembase2', 'VICH001.0523.00090')):
+            replicon_path = self.find_data(os.path.join('Gembase', gembase, 'Replicons', seq_name + '.fna'))
+            self.args.replicon = replicon_path
+            cfg = Config(self.args)
+            with MultiFastaReader(replicon_path) as seq_db:
+                replicon = next(seq_db)
+            replicon.path = replicon_path
+            os.makedirs(cfg.tmp_dir(replicon.id), exist_ok=True)
+            with self.catch_log():
+                db = GembaseDB(replicon, cfg)
+            with self.subTest(gembase=gembase):
+                # the first, the last and some genes in the middle
+                for seq_id in db._info[4].iloc[::97]:
+                    self.assertEqual(get_description_regex(db._info, seq_id), db.get_description(seq_id))
+
+
+    def test_descriptions(self):
+        replicon_path = self.find_data(os.path.join('Gembase', 'Gembase1', 'Replicons', 'ACBA.0917.00019.fna'))
+        self.args.replicon = replicon_path
+        cfg = Config(self.args)
+        with MultiFastaReader(replicon_path) as seq_db:
+            replicon = next(seq_db)
+        replicon.path = replicon_path
+        os.makedirs(cfg.tmp_dir(replicon.id))
+        with self.catch_log():
+            db = GembaseDB(replicon, cfg)
+        descs = db.descriptions()
+        self.assertIsInstance(descs, SeqDescTable)
+        self.assertListEqual(descs.id.tolist(), list(db))
+        exp = [db.get_description(seq_id) for seq_id in db]
+        self.assertListEqual([SeqDesc(*desc) for desc in zip(*descs)], exp)
+
+        gene_ids = ['ACBA.0917.00019.i0001_03957', 'ACBA.0917.00019.b0001_00001']
+        descs = db.get_descriptions(gene_ids)
+        self.assertListEqual(descs.id.tolist(), gene_ids)
+        self.assertListEqual(descs.strand.tolist(), [-1, -1])
+        self.assertListEqual(descs.start.tolist(), [4043755, 266])
+        self.assertListEqual(descs.stop.tolist(), [4044354, 1480])
+        with self.assertRaises(KeyError):
+            db.get_descriptions(['ACBA.0917.00019.i0001_03957', 'FOO.BAR.00019.i0001_03924'])
+
+
+    def test_genome_replicon_info(self):
+        parsers = {GembaseType.DRAFT_1: GembaseDB.gembase1_draft_parser,
+                   GembaseType.COMPLETE_1: GembaseDB.gembase1_complete_parser}
+        genomes = (('Gembase1', 'LSTINF', 'ACBA.0917.00019', '.fna'),
+                   ('Gembase1', 'LSTINF', 'ESCO001.C.00001.C001', '.fst'),
+                   ('Gembase2', 'LST', 'VIBR.0322.11443', '.fna'),
+                   ('Gembase2', 'LST', 'VICH001.0523.00090', '.fna'),
+                   ('Gembase2plus', 'LST', 'VIBR001.0322.11443', '.fna'),
+                   ('Gembase2plus', 'LST', 'VICH001.0523.00090', '.fna'))
+        for gembase, lst_dir, genome_name, ext in genomes:
+            with self.subTest(genome=genome_name):
+                lst_path = self.find_data('Gembase', gembase, lst_dir, genome_name + '.lst')
+                prot_path = self.find_data('Gembase', gembase, 'Proteins', genome_name + '.prt')
+                genome = GembaseGenome(lst_path, prot_path)
+                parser = parsers.get(genome.gembase_type, GembaseDB.gembase2_parser)
+                replicon_path = os.path.join(self._data_dir, 'Gembase', gembase, 'Replicons', genome_name + ext)
+                if os.path.exists(replicon_path):
+                    with MultiFastaReader(replicon_path) as seq_db:
+                        replicon_ids = [replicon.id for replicon in seq_db]
+                else:
+                    # complete genome
+                    replicon_ids = [genome_name]
+                for replicon_id in replicon_ids:
+                    pdt.assert_frame_equal(genome.replicon_info(replicon_id), parser(lst_path, replicon_id))
+                genome.close()
+
+
+    def test_genome_shared_by_replicons(self):
+        replicon_path = self.find_data(os.path.join('Gembase', 'Gembase2', 'Replicons', 'VIBR.0322.11443.fna'))
+        prot_path = self.find_data(os.path.join('Gembase', 'Gembase2', 'Proteins', 'VIBR.0322.11443.prt'))
+        self.args.replicon = replicon_path
+        cfg = Config(self.args)
+        calls = {'lst': 0, 'prt': 0}
+        read_gembase2_ori = GembaseDB.read_gembase2
+        build_ori = FastaIndex.build
+
+        def read_gembase2(lst_path):
+            calls['lst'] += 1
+            return read_gembase2_ori(lst_path)
+
+        def build(path):
+            if os.path.realpath(path) == os.path.realpath(prot_path):
+                calls['prt'] += 1
+            return build_ori(path)
+
+        GembaseDB.read_gembase2 = staticmethod(read_gembase2)
+        FastaIndex.build = staticmethod(build)
+        try:
+            with MultiFastaReader(replicon_path) as seq_db:
+                for replicon, _ in zip(seq_db, range(10)):
+                    replicon.path = replicon_path
+                    with self.catch_log():
+                        db = GembaseDB(replicon, cfg)
+                    self.assertGreater(len(db._info), 0)
+                    self.assertTrue(all(prot_id.startswith(replicon.id) for prot_id in db._info[4]))
+                    self.assertListEqual([seq.id for seq in SeqIO.parse(db.protfile, 'fasta')],
+                                         db._info[4].tolist())
+        finally:
+            GembaseDB.read_gembase2 = staticmethod(read_gembase2_ori)
+            FastaIndex.build = staticmethod(build_ori)
+        self.assertEqual(calls, {'lst': 1, 'prt': 1})
+
+
+    def test_get_genome_modified(self):
+        lst_path = os.path.join(self.tmp_dir, 'VIBR.0322.11443.lst')
+        prot_path = os.path.join(self.tmp_dir, 'VIBR.0322.11443.prt')
+        shutil.copyfile(self.find_data(os.path.join('Gembase', 'Gembase2', 'LST', 'VIBR.0322.11443.lst')), lst_path)
+        shutil.copyfile(self.find_data(os.path.join('Gembase', 'Gembase2', 'Proteins', 'VIBR.0322.11443.prt')),
+                        prot_path)
+        genome = GembaseDB.get_genome(lst_path, prot_path)
+        self.assertIs(GembaseDB.get_genome(lst_path, prot_path), genome)
+        # the protein file is updated, the genome is indexed again
+        with open(prot_path, 'a') as prt:
+            prt.write('>VIBR.0322.11443.0001.i0001_99999 D 1 99 100\nMKL\n')
+        new_genome = GembaseDB.get_genome(lst_path, prot_path)
+        self.assertIsNot(new_genome, genome)
+        self.assertIn('VIBR.0322.11443.0001.i0001_99999', new_genome.proteins)
+        new_genome.close()
+        GembaseDB._genome_cache = None
+
+
+    def test_fasta_index(self):
+        prot_path = self.find_data(os.path.join('Gembase', 'Gembase2', 'Proteins', 'VIBR.0322.11443.prt'))
+        index = FastaIndex(prot_path)
+        with open(prot_path) as prot_file:
+            exp_ids = [rec.id for rec in SeqIO.parse(prot_file, 'fasta')]
+        self.assertListEqual(list(index.records), exp_ids)
+        self.assertEqual(len(index), len(exp_ids))
+        self.assertIn(exp_ids[0], index)
+        self.assertNotIn('foo', index)
+
+        # contiguous and scattered records, the last record of the file and an unknown id
+        seq_ids = exp_ids[10:20] + [exp_ids[-1], 'foo'] + exp_ids[5:8] + exp_ids[30:40:3]
+        prot_file_path = os.path.join(self.tmp_dir, 'copy.prt')
+        with open(prot_file_path, 'wb') as prot_file:
+            missing = index.copy_records(seq_ids, prot_file)
+        self.assertListEqual(missing, ['foo'])
+        exp_path = os.path.join(self.tmp_dir, 'exp.prt')
+        exp_missing = make_protfile_seqio(seq_ids, prot_path, exp_path)
+        self.assertListEqual(missing, exp_missing)
+        with open(prot_file_path) as prot_file, open(exp_path) as exp_file:
+            copied = [(rec.id, rec.description, str(rec.seq)) for rec in SeqIO.parse(prot_file, 'fasta')]
+            exp = [(rec.id, rec.description, str(rec.seq)) for rec in SeqIO.parse(exp_file, 'fasta')]
+        self.assertListEqual(copied, exp)
+
+
+    def test_fasta_index_no_final_newline(self):
+        prot_path = os.path.join(self.tmp_dir, 'prots.prt')
+        with open(prot_path, 'w') as prot_file:
+            prot_file.write(">prot_1 desc 1\nMAAA\nLLL\n>prot_2\nMCCC\n>prot_1 dup\nMDDD\n>prot_3\nMEEE")
+        index = FastaIndex(prot_path)
+        self.assertListEqual(list(index.records), ['prot_1', 'prot_2', 'prot_3'])
+        prot_file_path = os.path.join(self.tmp_dir, 'copy.prt')
+        with open(prot_file_path, 'wb') as prot_file:
+            missing = index.copy_records(['prot_3', 'prot_1'], prot_file)
+        self.assertListEqual(missing, [])
+        with open(prot_file_path) as prot_file:
+            self.assertEqual(prot_file.read(), ">prot_3\nMEEE\n>prot_1 desc 1\nMAAA\nLLL\n")
+
+
+    def test_fasta_index_cache(self):
+        prot_path = os.path.join(self.tmp_dir, 'prots.prt')
+        shutil.copyfile(self.find_data(os.path.join('Gembase', 'Gembase2', 'Proteins', 'VIBR.0322.11443.prt')),
+                        prot_path)
+        cache = ResultCache(os.path.join(self.tmp_dir, 'cache'), 1 << 30)
+        builds = []
+        build_ori = FastaIndex.build
+
+        def build(path):
+            builds.append(path)
+            return build_ori(path)
+
+        FastaIndex.build = staticmethod(build)
+        try:
+            records = FastaIndex(prot_path, cache=cache).records
+            self.assertEqual(len(builds), 1)
+            # the index is reused by an other run
+            self.assertDictEqual(FastaIndex(prot_path, cache=cache).records, records)
+            self.assertEqual(len(builds), 1)
+            # the index is rebuilt when the fasta file change
+            with open(prot_path, 'a') as prot_file:
+                prot_file.write(">new_prot\nMAAA\n")
+            records = FastaIndex(prot_path, cache=cache).records
+            self.assertEqual(len(builds), 2)
+            self.assertIn('new_prot', records)
+        finally:
+            FastaIndex.build = staticmethod(build_ori)
+
+
+    def _make_big_gembase(self, genes_nb):
+        """
+        create a fake Gembase2 Complete with one replicon with *genes_nb* genes
+
+        :return: the path of the replicon
+        """
+        gembase_path = os.path.join(self.tmp_dir, 'Gembase')
+        replicon_name = 'SYNT001.0523.00001'
+        replicon_id = f'{replicon_name}.001C'
+        for sub_dir in ('LST', 'Replicons', 'Proteins'):
+            os.makedirs(os.path.join(gembase_path, sub_dir))
+        with open(os.path.join(gembase_path, 'LST', replicon_name + '.lst'), 'w') as lst:
+            for i in range(1, genes_nb + 1):
+                lst.write(f"{i * 1000 + 1}\t{i * 1000 + 900}\t{'D' if i % 2 else 'C'}\tCDS\t"
+                          f"{replicon_id}_{i:05d}\tNA\tNA\tNA\tfake_protein\n")
+        replicon_path = os.path.join(gembase_path, 'Replicons', replicon_name + '.fna')
+        with open(replicon_path, 'w') as fasta:
+            fasta.write(f">{replicon_id}\nACGT\n")
+        open(os.path.join(gembase_path, 'Proteins', replicon_name + '.prt'), 'w').close()
+        return replicon_path
+
+
+    @benchmark
+    def test_benchmark_get_description(self):
+        genes_nb = 10_000
+        replicon_path = self._make_big_gembase(genes_nb)
+        self.args.replicon = replicon_path
+        cfg = Config(self.args)
+        with MultiFastaReader(replicon_path) as seq_db:
+            replicon = next(seq_db)
+        replicon.path = replicon_path
+        db = GembaseDB(replicon, cfg, prot_file=os.devnull)
+        gene_ids = db._info[4].tolist()
+        with self.timer(f'regex get_description {genes_nb} genes') as regex_time:
+            exp = [get_description_regex(db._info, gene_id) for gene_id in gene_ids]
+        with self.timer(f'indexed get_description {genes_nb} genes') as index_time:
+            descs = [db.get_description(gene_id) for gene_id in gene_ids]
+        self.assertListEqual(descs, exp)
+        self.assertLess(index_time['time'], regex_time['time'])
+
+
+    @benchmark
+    def test_benchmark_make_protfile(self):
+        genes_nb = 50_000
+        replicon_path = self._make_big_gembase(genes_nb)
+        self.args.replicon = replicon_path
+        cfg = Config(self.args)
+        with MultiFastaReader(replicon_path) as seq_db:
+            replicon = next(seq_db)
+        replicon.path = replicon_path
+        db = GembaseDB(replicon, cfg, prot_file=os.devnull)
+        gene_ids = db._info[4].tolist()
+        all_prot_path = db._genome.prot_path
+        with open(all_prot_path, 'w') as all_prots:
+            for i, gene_id in enumerate(gene_ids):
+                all_prots.write(f">{gene_id} fake_protein\n")
+                seq = 'MKLAVGT' * (30 + i % 50)
+                for j in range(0, len(seq), 60):
+                    all_prots.write(seq[j:j + 60] + '\n')
+        exp_path = os.path.join(self.tmp_dir, 'exp.prt')
+        with self.timer(f'SeqIO make_protfile {genes_nb} proteins') as seqio_time:
+            make_protfile_seqio(gene_ids, all_prot_path, exp_path)
+        db._genome.close()
+        with self.timer(f'byte offsets make_protfile {genes_nb} proteins') as copy_time:
+            prot_file_path = db._make_protfile()
+        with open(prot_file_path) as prot_file, open(exp_path) as exp_file:
+            self.assertListEqual([(rec.id, str(rec.seq)) for rec in SeqIO.parse(prot_file, 'fasta')],
+                                 [(rec.id, str(rec.seq)) for rec in SeqIO.parse(exp_file, 'fasta')])
+        self.assertLess(copy_time['time'], seqio_time['time'])
+
+
 class TestProdigalDB(IntegronTest):
 
     def setUp(self):
@@ -668,6 +977,91 @@ class TestProdigalDB(IntegronTest):
 
         self.assertTrue(str(ctx.exception).strip().endswith(": failed : prodigal returncode = 50"))
 
+
+    def _read_replicons(self, *file_names):
+        replicons = []
+        for file_name in file_names:
+            replicon_path = self.find_data('Replicons', file_name + '.fst')
+            with MultiFastaReader(replicon_path) as seq_db:
+                replicon = next(seq_db)
+            replicon.path = replicon_path
+            replicons.append(replicon)
+        return replicons
+
+
+    def test_prodigal_batch(self):
+        self.args.replicon = self.find_data('Replicons', 'acba.007.p01.13.fst')
+        cfg = Config(self.args)
+        replicons = self._read_replicons('acba.007.p01.13', 'saen.040.p01.10', 'lian.001.c02.10')
+        prot_files = prodigal_batch(replicons, cfg, self.tmp_dir)
+        # lian is too long for the metagenomic mode
+        self.assertDictEqual(prot_files,
+                             {rep.id: os.path.join(cfg.tmp_dir(rep.id), rep.id + '.prt') for rep in replicons[:2]})
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'prodigal_batch.fst')))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'prodigal_batch.prt')))
+        for replicon in replicons[:2]:
+            with open(prot_files[replicon.id]) as prot_file:
+                batch_prots = prot_file.read()
+            os.unlink(prot_files[replicon.id])
+            db = ProdigalDB(replicon, cfg)
+            with open(db.protfile) as prot_file:
+                self.assertEqual(batch_prots, prot_file.read())
+            db.close()
+
+
+    def test_prodigal_batch_skip(self):
+        self.args.replicon = self.find_data('Replicons', 'acba.007.p01.13.fst')
+        self.args.prodigal = self.find_data('fake_prodigal')
+        cfg = Config(self.args)
+        replicons = self._read_replicons('acba.007.p01.13', 'lian.001.c02.10')
+        # the proteins of a previous run are kept
+        os.makedirs(cfg.tmp_dir(replicons[0].id))
+        prot_file_path = os.path.join(cfg.tmp_dir(replicons[0].id), replicons[0].id + '.prt')
+        open(prot_file_path, 'w').close()
+        self.assertDictEqual(prodigal_batch(replicons, cfg, self.tmp_dir), {})
+        self.assertEqual(os.path.getsize(prot_file_path), 0)
+        self.assertFalse(os.path.exists(cfg.tmp_dir(replicons[1].id)))
+
+
+    def test_prodigal_batch_failed(self):
+        self.args.replicon = self.find_data('Replicons', 'acba.007.p01.13.fst')
+        self.args.prodigal = self.find_data('fake_prodigal')
+        cfg = Config(self.args)
+        replicons = self._read_replicons('acba.007.p01.13', 'saen.040.p01.10')
+        with self.assertRaises(RuntimeError) as ctx:
+            prodigal_batch(replicons, cfg, self.tmp_dir)
+        self.assertTrue(str(ctx.exception).strip().endswith(": failed : prodigal returncode = 50"))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'prodigal_batch.fst')))
+        for replicon in replicons:
+            self.assertFalse(os.path.exists(os.path.join(cfg.tmp_dir(replicon.id), replicon.id + '.prt')))
+
+
+    def test_split_prodigal_batch(self):
+        prot_path = os.path.join(self.tmp_dir, 'batch.prt')
+        with open(prot_path, 'w') as prot_file:
+            prot_file.write(">seq_A_1 # 10 # 99 # 1 # ID=1_1;partial=00;gc_cont=0.5\nMKL\nAV*\n"
+                            ">seq_A_2 # 110 # 199 # -1 # ID=1_2;partial=00;gc_cont=0.5\nMPP*\n"
+                            ">seq_C_1 # 5 # 50 # 1 # ID=3_1;partial=10;gc_cont=0.4\nMCC*\n")
+        prot_file_paths = [os.path.join(self.tmp_dir, f"{seq_id}.prt") for seq_id in ('seq_A', 'seq_B', 'seq_C')]
+        prot_db._split_prodigal_batch(prot_path, prot_file_paths)
+        exp = [">seq_A_1 # 10 # 99 # 1 # ID=1_1;partial=00;gc_cont=0.5\nMKL\nAV*\n"
+               ">seq_A_2 # 110 # 199 # -1 # ID=1_2;partial=00;gc_cont=0.5\nMPP*\n",
+               "",
+               ">seq_C_1 # 5 # 50 # 1 # ID=1_1;partial=10;gc_cont=0.4\nMCC*\n"]
+        for path, exp_prots in zip(prot_file_paths, exp):
+            with open(path) as prot_file:
+                self.assertEqual(prot_file.read(), exp_prots)
+
+        with open(prot_path, 'w') as prot_file:
+            prot_file.write(">seq_D_1 # 10 # 99 # 1 # ID=4_1;partial=00\nMKL*\n")
+        with self.assertRaises(RuntimeError) as ctx:
+            prot_db._split_prodigal_batch(prot_path, prot_file_paths)
+        self.assertEqual(str(ctx.exception),
+                         f"Cannot find the sequence of the protein '>seq_D_1 # 10 # 99 # 1 # ID=4_1;partial=00' "
+                         f"in prodigal results {prot_path}")
+        for path in prot_file_paths:
+            self.assertFalse(os.path.exists(path))
+
     def test_protfile(self):
         file_name = 'acba.007.p01.13'
         prot_name = 'ACBA.007.P01_13.prt'
@@ -771,6 +1165,22 @@ class TestProdigalDB(IntegronTest):
             self.assertEqual(desc, db.get_description(seq_id))
 
 
+    def test_descriptions(self):
+        file_name = 'acba.007.p01.13'
+        replicon_path = self.find_data(os.path.join('Replicons', file_name + '.fst'))
+        self.args.replicon = replicon_path
+        cfg = Config(self.args)
+        with MultiFastaReader(replicon_path) as seq_db:
+            replicon = next(seq_db)
+        replicon.path = replicon_path
+        os.makedirs(cfg.tmp_dir(replicon.id))
+
+        db = ProdigalDB(replicon, cfg)
+        descs = db.descriptions()
+        self.assertListEqual(descs.id.tolist(), list(db))
+        self.assertEqual(SeqDesc(*(field[0] for field in descs)), SeqDesc('ACBA.007.P01_13_1', 1, 55, 1014))
+
+
 class TestCustomDB(IntegronTest):
 
     def setUp(self):
@@ -816,6 +1226,30 @@ class TestCustomDB(IntegronTest):
         self.assertTrue(db.replicon.id, replicon.id)
 
 
+    def test_pickle(self):
+        file_name = 'acba.007.p01.13'
+        prot_name = 'ACBA.007.P01_13.prt'
+        replicon_path = self.find_data('Replicons', file_name + '.fst')
+        protein_path = self.find_data('Proteins', prot_name)
+        self.args.replicon = replicon_path
+        self.args.prot_file = protein_path
+        cfg = Config(self.args)
+        with MultiFastaReader(replicon_path) as seq_db:
+            replicon = next(seq_db)
+        replicon.path = replicon_path
+        os.makedirs(cfg.tmp_dir(replicon.id))
+
+        db = CustomDB(replicon, cfg, protein_path)
+        seq_id = next(iter(db))
+        exp = db[seq_id]
+        copy = pickle.loads(pickle.dumps(db))
+        self.assertListEqual(list(copy), list(db))
+        self.assertEqual(str(copy[seq_id].seq), str(exp.seq))
+        self.assertEqual(copy.get_description(seq_id), db.get_description(seq_id))
+        copy.close()
+        db.close()
+
+
     def test_ProteinDB_bad_parser(self):
         file_name = 'acba.007.p01.13'
         prot_name = 'ACBA.007.P01_13.prt'
@@ -957,6 +1391,64 @@ class TestCustomDB(IntegronTest):
             self.assertEqual(desc, db.get_description(seq_id))
 
 
+    def test_descriptions(self):
+        file_name = 'acba.007.p01.13'
+        prot_name = 'ACBA.007.P01_13.prt'
+        replicon_path = self.find_data(os.path.join('Replicons', file_name + '.fst'))
+        protein_path = self.find_data('Proteins', prot_name)
+        self.args.replicon = replicon_path
+        self.args.prot_file = protein_path
+        cfg = Config(self.args)
+        with MultiFastaReader(replicon_path) as seq_db:
+            replicon = next(seq_db)
+        replicon.path = replicon_path
+        os.makedirs(cfg.tmp_dir(replicon.id))
+
+        db = CustomDB(replicon, cfg, protein_path)
+        exp = [db.get_description(seq_id) for seq_id in db]
+        descs = db.descriptions()
+        self.assertIsInstance(descs, SeqDescTable)
+        self.assertListEqual([SeqDesc(*desc) for desc in zip(*descs)], exp)
+
+        gene_ids = ['ACBA.007.P01_13_23', 'ACBA.007.P01_13_1']
+        descs = db.get_descriptions(gene_ids)
+        self.assertListEqual(descs.id.tolist(), gene_ids)
+        self.assertListEqual(descs.strand.tolist(), [-1, 1])
+        self.assertListEqual(descs.start.tolist(), [19721, 55])
+        self.assertListEqual(descs.stop.tolist(), [20254, 1014])
+        self.assertEqual(descs.start.dtype, np.int64)
+
+        # once the headers are parsed the protein file is not read anymore
+        db.close()
+        self.assertEqual(db.get_description('ACBA.007.P01_13_1'), SeqDesc('ACBA.007.P01_13_1', 1, 55, 1014))
+
+        with self.assertRaises(IntegronError):
+            db.get_descriptions(['ACBA.007.P01_13_1', 'nimport_naoik'])
+
+
+    def test_descriptions_stupid_parser(self):
+        file_name = 'acba.007.p01.13'
+        prot_name = 'ACBA.007.P01_13.prt'
+        replicon_path = self.find_data(os.path.join('Replicons', file_name + '.fst'))
+        protein_path = self.find_data('Proteins', prot_name)
+        self.args.replicon = replicon_path
+        self.args.prot_file = protein_path
+        self.args.annot_parser = self.find_data('stupid_annot_parser2.py')
+        cfg = Config(self.args)
+        with MultiFastaReader(replicon_path) as seq_db:
+            replicon = next(seq_db)
+        replicon.path = replicon_path
+        os.makedirs(cfg.tmp_dir(replicon.id))
+
+        db = CustomDB(replicon, cfg, protein_path)
+        with self.assertRaises(IntegronError) as ctx:
+            with self.catch_log():
+                db.descriptions()
+        self.assertEqual(str(ctx.exception),
+                         f"'ACBA.007.P01_13_1' protein is not compliant with custom --annot-parser "
+                         f"'{self.args.annot_parser}'.")
+
+
     def test_get_description_stupid_parser(self):
         file_name = 'acba.007.p01.13'
         prot_name = 'ACBA.007.P01_13.prt'
@@ -1030,6 +1522,140 @@ class TestCustomDB(IntegronTest):
                          "ACBA.007.P01_13_23, 19721, 20254, -1")
 
 
+class TestProteinDB(IntegronTest):
+
+    def test_parse_description_abstract(self):
+        # a ProteinDB must implement the hook used to build the descriptions table
+        class NoParserDB(prot_db.ProteinDB):
+
+            def __getitem__(self, prot_seq_id):
+                pass
+
+            def __iter__(self):
+                pass
+
+            def _make_protfile(self, path=None):
+                pass
+
+            def coding_prot_ids(self):
+                pass
+
+        with self.assertRaises(TypeError) as ctx:
+            NoParserDB(None, None)
+        self.assertIn('_parse_description', str(ctx.exception))
+
+
+class TestProteinStore(IntegronTest):
+
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory(prefix='tmp_test_integron_finder')
+        self.tmp_dir = self._tmp_dir.name
+        self.prot_path = self.find_data(os.path.join('Proteins', 'ACBA.007.P01_13.prt'))
+
+
+    def tearDown(self):
+        self._tmp_dir.cleanup()
+
+
+    def assertRecordEqual(self, rec, exp):
+        self.assertEqual(rec.id, exp.id)
+        self.assertEqual(rec.name, exp.name)
+        self.assertEqual(rec.description, exp.description)
+        self.assertEqual(str(rec.seq), str(exp.seq))
+
+
+    def test_getitem(self):
+        store = ProteinStore(self.prot_path)
+        idx = SeqIO.index(self.prot_path, 'fasta')
+        try:
+            self.assertListEqual(list(store), list(idx))
+            self.assertEqual(len(store), len(idx))
+            for seq_id in idx:
+                self.assertIn(seq_id, store)
+                self.assertRecordEqual(store[seq_id], idx[seq_id])
+            self.assertNotIn('nimport_naoik', store)
+            with self.assertRaises(KeyError):
+                store['nimport_naoik']
+        finally:
+            store.close()
+            idx.close()
+
+
+    def test_raw(self):
+        prot_path = os.path.join(self.tmp_dir, 'prots.prt')
+        with open(prot_path, 'w') as prot_file:
+            prot_file.write(">prot_1 desc 1\nMAAA\nLLL\n\n>prot_2\r\nMC CC\r\nKK\r\n>prot_3\nMEEE")
+        store = ProteinStore(prot_path)
+        self.assertEqual(store.raw('prot_1'), b">prot_1 desc 1\nMAAA\nLLL\n\n")
+        self.assertEqual(store.raw('prot_3'), b">prot_3\nMEEE")
+        idx = SeqIO.index(prot_path, 'fasta')
+        try:
+            for seq_id in idx:
+                self.assertRecordEqual(store[seq_id], idx[seq_id])
+        finally:
+            store.close()
+            idx.close()
+
+
+    def test_empty(self):
+        prot_path = os.path.join(self.tmp_dir, 'prots.prt')
+        open(prot_path, 'w').close()
+        store = ProteinStore(prot_path)
+        self.assertEqual(len(store), 0)
+        self.assertListEqual(list(store), [])
+        with self.assertRaises(KeyError):
+            store['prot_1']
+        store.close()
+
+
+    def test_duplicate(self):
+        prot_path = os.path.join(self.tmp_dir, 'prots.prt')
+        with open(prot_path, 'w') as prot_file:
+            prot_file.write(">prot_1\nMAAA\n>prot_1\nMCCC\n")
+        with self.assertRaises(ValueError) as ctx:
+            ProteinStore(prot_path)
+        self.assertEqual(str(ctx.exception), "Duplicate key 'prot_1'")
+
+
+    def test_pickle(self):
+        store = ProteinStore(self.prot_path)
+        seq_id = list(store)[3]
+        exp = store[seq_id]
+        # the mapping is not pickled
+        pickled = pickle.dumps(store)
+        self.assertLess(len(pickled), os.path.getsize(self.prot_path))
+        copy = pickle.loads(pickled)
+        store.close()
+        self.assertListEqual(list(copy), list(store))
+        self.assertRecordEqual(copy[seq_id], exp)
+        copy.close()
+        # the mapping is reopened when needed
+        self.assertRecordEqual(store[seq_id], exp)
+        store.close()
+
+
+    @benchmark
+    def test_benchmark_getitem(self):
+        prots_nb = 50_000
+        prot_path = os.path.join(self.tmp_dir, 'prots.prt')
+        with open(prot_path, 'w') as prot_file:
+            for i in range(prots_nb):
+                prot_file.write(f">prot_{i} # {i * 1000} # {i * 1000 + 900} # 1 # ID=1_{i}\n")
+                seq = 'MKLAVGT' * (30 + i % 50)
+                for j in range(0, len(seq), 60):
+                    prot_file.write(seq[j:j + 60] + '\n')
+        with self.timer(f'SeqIO.index {prots_nb} proteins') as seqio_time:
+            idx = SeqIO.index(prot_path, 'fasta')
+            exp = [str(idx[seq_id].seq) for seq_id in idx]
+            idx.close()
+        with self.timer(f'ProteinStore {prots_nb} proteins') as store_time:
+            store = ProteinStore(prot_path)
+            seqs = [str(store[seq_id].seq) for seq_id in store]
+            store.close()
+        self.assertListEqual(seqs, exp)
+        self.assertLess(store_time['time'], seqio_time['time'])
+
+
 class TestRepliconType(IntegronTest):
 
 
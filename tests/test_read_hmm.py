@@ -28,19 +28,23 @@
 
 import os
 import argparse
+import tempfile
+import shutil
 
+import numpy as np
 import pandas as pd
 import pandas.testing as pdt
 
 try:
-    from tests import IntegronTest
+    from tests import IntegronTest, benchmark
 except ImportError as err:
     msg = "Cannot import integron_finder: {0!s}".format(err)
     raise ImportError(msg)
 
 from integron_finder.config import Config
-from integron_finder.hmm import read_hmm
-from integron_finder.prot_db import GembaseDB, ProdigalDB
+from integron_finder.hmm import read_hmm, domtblout_path, scale_evalue
+from integron_finder.prot_db import GembaseDB, ProdigalDB, SeqDesc
+from integron_finder.hmm import SearchIO
 from integron_finder.utils import MultiFastaReader
 
 
@@ -56,6 +60,21 @@ class TestReadHMM(IntegronTest):
         self.args.prodigal = __file__
 
 
+    def test_scale_evalue(self):
+        self.assertEqual(scale_evalue(1e-20, 3), 3e-20)
+        self.assertEqual(scale_evalue(2.5e-3, 1), 2.5e-3)
+        self.assertEqual(scale_evalue(1.5e-5, 7), 1.1e-4)
+        # the E-values are reported rounded, the rescaled E-values differ by at most 10%
+        # from those of a search run directly with the other search space size
+        rng = np.random.default_rng(3)
+        exact_evalues = 10 ** rng.uniform(-30, 0, 10_000)
+        factors = rng.integers(1, 1000, 10_000)
+        direct = np.array([float(f"{evalue * factor:.2g}") for evalue, factor in zip(exact_evalues, factors)])
+        rescaled = np.array([scale_evalue(float(f"{evalue:.2g}"), factor)
+                             for evalue, factor in zip(exact_evalues, factors)])
+        self.assertLessEqual(np.max(np.abs(rescaled - direct) / direct), 0.1 + 1e-9)
+
+
     def test_read_empty(self):
         # Test that when there are no hits in the hmm result file, it returns an empty
         # dataframe, without error.
@@ -358,3 +377,281 @@ class TestReadHMM(IntegronTest):
         exp1 = exp1[["Accession_number", "query_name", "ID_query", "ID_prot",
                      "strand", "pos_beg", "pos_end", "evalue"]]
         pdt.assert_frame_equal(df1, exp1)
+
+
+    def test_read_hmm_domtblout(self):
+        # parsing the --domtblout output must give the same results than parsing the --out output
+        rep_name = "acba.007.p01.13"
+        replicon_id = 'ACBA.007.P01_13'
+        replicon_path = self.find_data(os.path.join('Replicons', rep_name + '.fst'))
+        prot_file = self.find_data(os.path.join('Proteins', replicon_id + '.prt'))
+        self.args.replicon = replicon_path
+        cfg = Config(self.args)
+        with MultiFastaReader(replicon_path) as seq_db:
+            replicon = next(seq_db)
+        prot_db = ProdigalDB(replicon, cfg, prot_file=prot_file)
+
+        text_out = self.find_data(os.path.join("Results_Integron_Finder_{}".format(rep_name),
+                                               "tmp_{}".format(replicon_id),
+                                               "{}_intI.res".format(replicon_id)))
+        domtbl_out = self.find_data("fictive_results", "{}_intI.domtblout".format(replicon_id))
+        pdt.assert_frame_equal(read_hmm(rep_name, prot_db, domtbl_out, cfg),
+                               read_hmm(rep_name, prot_db, text_out, cfg))
+
+    def test_read_hmm_domtblout_multi(self):
+        # 2 domains on the same protein: keep the one with the best i-evalue
+        replicon_id = 'ACBA.0917.00019'
+        contig_id = 'ACBA.0917.00019.0001'
+        result_dir_expected = self.find_data("Results_Integron_Finder_{}.gembase".format(replicon_id))
+        replicon_path = self.find_data('Gembase', 'Gembase1', 'Replicons', replicon_id + '.fna')
+        prot_file = os.path.join(result_dir_expected, "tmp_{}".format(contig_id), contig_id + '.prt')
+
+        self.args.gembase = True
+        self.args.replicon = replicon_path
+        cfg = Config(self.args)
+        with MultiFastaReader(replicon_path) as seq_db:
+            replicon = next(seq_db)
+        with self.catch_log():
+            prot_db = GembaseDB(replicon, cfg, prot_file=prot_file)
+
+        text_out = self.find_data('fictive_results', "{}_intI_multi.res".format(contig_id))
+        domtbl_out = self.find_data('fictive_results', "{}_intI_multi.domtblout".format(contig_id))
+        pdt.assert_frame_equal(read_hmm(contig_id, prot_db, domtbl_out, cfg),
+                               read_hmm(contig_id, prot_db, text_out, cfg))
+
+    def test_read_hmm_domtblout_auto(self):
+        # if the --domtblout output exists beside the --out output it is parsed instead
+        replicon_id = 'NZ_AP023221.2'
+        replicon_path = self.find_data('Replicons', 'NZ_AP023221.fasta')
+        prot_file = self.find_data('Proteins', replicon_id + '.prt')
+        self.args.replicon = replicon_path
+        cfg = Config(self.args)
+        with MultiFastaReader(replicon_path) as seq_db:
+            replicon = next(seq_db)
+        prot_db = ProdigalDB(replicon, cfg, prot_file=prot_file)
+
+        with tempfile.TemporaryDirectory(prefix='test_read_hmm') as tmp_dir:
+            text_out = os.path.join(tmp_dir, f"{replicon_id}_phage_int.res")
+            shutil.copyfile(self.find_data('fictive_results', f"{replicon_id}_phage_int.domtblout"),
+                            domtblout_path(text_out))
+            # the --out output is not written if --keep-tmp is not set
+            self.assertFalse(os.path.exists(text_out))
+            df = read_hmm(replicon_id, prot_db, text_out, cfg)
+        self.assertListEqual(df.ID_prot.tolist(), ["NZ_AP023221.2_109", "NZ_AP023221.2_106"])
+        self.assertListEqual(df.evalue.tolist(), [7.3e-30, 7.8e-29])
+
+
+def write_hmmer3_text(path, hits_nb):
+    """
+    Write a synthetic hmmsearch output (hmmer3-text format without alignments) with *hits_nb* hits.
+    Each hit has 2 domains, some hits are filtered out by coverage or evalue.
+    """
+    with open(path, 'w') as out:
+        out.write("# hmmsearch :: search profile(s) against a sequence database\n"
+                  "# HMMER 3.1b2 (February 2015); http://hmmer.org/\n"
+                  "# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -\n\n"
+                  "Query:       Phage_integrase  [M=173]\n"
+                  "Accession:   PF00589.16\n"
+                  "Description: Phage integrase family\n"
+                  "Scores for complete sequences (score includes all domains):\n"
+                  "   --- full sequence ---   --- best 1 domain ---    -#dom-\n"
+                  "    E-value  score  bias    E-value  score  bias    exp  N  Sequence  Description\n"
+                  "    ------- ------ -----    ------- ------ -----   ---- --  --------  -----------\n")
+        for i in range(hits_nb):
+            out.write(f"    2.3e-66  220.8   0.0    5.5e-66  219.5   0.0    1.6  2  prot_{i}  fake protein\n")
+        out.write("\n\nDomain annotation for each sequence (and alignments):\n")
+        for i in range(hits_nb):
+            hmm_to = 171 if i % 7 else 60  # low coverage
+            i_evalue = f"{i % 11 + 1}.5e-{i % 60 + 1:02}" if i % 13 else "3.0e+00"  # high evalue
+            out.write(f">> prot_{i}  fake protein\n"
+                      "   #    score  bias  c-Evalue  i-Evalue hmmfrom  hmm to    alifrom  ali to"
+                      "    envfrom  env to     acc\n"
+                      " ---   ------ ----- --------- --------- ------- -------    ------- -------"
+                      "    ------- -------    ----\n"
+                      "   1 ?   -2.3   0.0       0.4   7.7e+02       3      26 ..      56      83 .."
+                      "      54      88 .. 0.66\n"
+                      f"   2 !  219.5   0.0   2.9e-69 {i_evalue:>9}       2 {hmm_to:>7} ..     116     317 .."
+                      "     115     319 .. 0.99\n\n")
+        out.write("\n\nInternal pipeline statistics summary:\n"
+                  "-------------------------------------\n"
+                  "Query model(s):                              1  (173 nodes)\n"
+                  "//\n[ok]\n")
+
+
+def write_domtblout(path, hits_nb):
+    """
+    Write a synthetic hmmsearch --domtblout output with the same hits as :func:`write_hmmer3_text`.
+    """
+    with open(path, 'w') as out:
+        out.write("# target name        accession   tlen query name           accession   qlen   E-value"
+                  "  score  bias   #  of  c-Evalue  i-Evalue  score  bias  from    to  from    to  from    to"
+                  "  acc description of target\n"
+                  "#------------------- ---------- ----- -------------------- ---------- ----- ---------"
+                  " ------ ----- --- --- --------- --------- ------ ----- ----- ----- ----- ----- ----- -----"
+                  " ---- ---------------------\n")
+        for i in range(hits_nb):
+            hmm_to = 171 if i % 7 else 60  # low coverage
+            i_evalue = f"{i % 11 + 1}.5e-{i % 60 + 1:02}" if i % 13 else "3.0e+00"  # high evalue
+            out.write(f"prot_{i:<15} -            344 Phage_integrase      PF00589.16   173   2.3e-66  220.8"
+                      "   0.0   1   2       0.4   7.7e+02   -2.3   0.0     3    26    56    83    54    88"
+                      " 0.66 fake protein\n"
+                      f"prot_{i:<15} -            344 Phage_integrase      PF00589.16   173   2.3e-66  220.8"
+                      f"   0.0   2   2   2.9e-69 {i_evalue:>9}  219.5   0.0     2 {hmm_to:>5}   116   317   115"
+                      "   319 0.99 fake protein\n")
+        out.write("#\n# Program:         hmmsearch\n# [ok]\n")
+
+
+class FakeProtDB:
+
+    def get_description(self, gene_id):
+        prot_nb = int(gene_id.split('_')[1])
+        return SeqDesc(gene_id, 1 if prot_nb % 2 else -1, prot_nb * 1000 + 1, prot_nb * 1000 + 900)
+
+
+def read_hmm_loc(replicon_id, prot_db, infile, cfg, evalue=1., coverage=0.5):
+    """
+    The former implementation of read_hmm which write DataFrame cell by cell.
+    It is used as reference for read_hmm.
+    """
+    df = pd.DataFrame(columns=["Accession_number", "query_name", "ID_query",
+                               "ID_prot", "strand", "pos_beg", "pos_end",
+                               "evalue", "hmmfrom", "hmmto", "alifrom",
+                               "alito", "len_profile"])
+    gen = SearchIO.parse(infile, 'hmmer3-text')
+    for idx, query_result in enumerate(gen):
+        len_profile = query_result.seq_len
+        query = query_result.id
+        try:
+            id_query = query_result.accession
+        except AttributeError:
+            id_query = "-"
+        for idx2, hit in enumerate(query_result.hits):
+            if not hit.hsps:
+                continue
+            _, strand, pos_beg, pos_end = prot_db.get_description(hit.id)
+            evalue_tmp = [hsp.evalue for hsp in hit.hsps]
+            best_evalue = np.argmin(evalue_tmp)
+            best_hsp = hit.hsps[best_evalue]
+            df.loc[idx + idx2, "ID_prot"] = hit.id
+            df.loc[idx + idx2, "ID_query"] = id_query
+            df.loc[idx + idx2, "pos_beg"] = pos_beg
+            df.loc[idx + idx2, "pos_end"] = pos_end
+            df.loc[idx + idx2, "strand"] = strand
+            df.loc[idx + idx2, "evalue"] = evalue_tmp[best_evalue]
+            df.loc[idx + idx2, "hmmfrom"] = best_hsp.query_start + 1
+            df.loc[idx + idx2, "hmmto"] = best_hsp.query_end
+            df.loc[idx + idx2, "alifrom"] = best_hsp.hit_start + 1
+            df.loc[idx + idx2, "alito"] = best_hsp.hit_end
+            df.loc[idx + idx2, "len_profile"] = float(len_profile)
+            df.loc[idx + idx2, "Accession_number"] = replicon_id
+            df.loc[idx + idx2, "query_name"] = query
+
+    intcols = ["pos_beg", "pos_end", "strand"]
+    floatcol = ["evalue", "len_profile"]
+    df[intcols] = df[intcols].astype(int)
+    df[floatcol] = df[floatcol].astype(float)
+    df = df[(((df.hmmto - df.hmmfrom) / df.len_profile) > coverage) & (df.evalue < evalue)]
+    df.index = range(len(df))
+    return df[["Accession_number", "query_name", "ID_query", "ID_prot",
+               "strand", "pos_beg", "pos_end", "evalue"]]
+
+
+class TestReadHMMManyHits(IntegronTest):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.mkdtemp(prefix='test_read_hmm')
+        self.prot_db = FakeProtDB()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read_hmm_eq_read_hmm_loc(self):
+        hmm_out = os.path.join(self.tmp_dir, 'synthetic_hits.res')
+        write_hmmer3_text(hmm_out, 300)
+        exp = read_hmm_loc('synthetic', self.prot_db, hmm_out, None)
+        df = read_hmm('synthetic', self.prot_db, hmm_out, None)
+        # check that some hits are filtered out
+        self.assertLess(len(df), 300)
+        pdt.assert_frame_equal(df, exp)
+
+    def test_read_hmm_multi_queries(self):
+        # all hits of all queries must be kept
+        hmm_out = os.path.join(self.tmp_dir, 'synthetic_hits.res')
+        write_hmmer3_text(hmm_out, 3)
+        with open(hmm_out) as hmm_file:
+            hmm_text = hmm_file.read()
+        # add a second query before the '[ok]' which end the output
+        hmm_text = hmm_text[:hmm_text.rindex('[ok]')] + hmm_text[hmm_text.index('Query:'):]
+        with open(hmm_out, 'w') as hmm_file:
+            hmm_file.write(hmm_text)
+        df = read_hmm('synthetic', self.prot_db, hmm_out, None)
+        self.assertListEqual(df.ID_prot.tolist(), ['prot_1', 'prot_2', 'prot_1', 'prot_2'])
+        self.assertListEqual(df.index.tolist(), [0, 1, 2, 3])
+
+    def test_read_hmm_multi_queries_multi_domains(self):
+        # the former implementation indexed the hits with idx + idx2 (query index + hit index)
+        # so the hit 1 of the first query was overwritten by the hit 0 of the second one.
+        # Now the output is the hits of each query, in the queries order,
+        # with the best domain of each hit, as the former implementation on each query alone.
+        hmm_out_1 = os.path.join(self.tmp_dir, 'phage_int.res')
+        write_hmmer3_text(hmm_out_1, 3)
+        with open(hmm_out_1) as hmm_file:
+            text_1 = hmm_file.read()
+        text_2 = text_1.replace('Phage_integrase', 'intI_Cterm').replace('PF00589.16', 'intI_Cterm')
+        hmm_out_2 = os.path.join(self.tmp_dir, 'intI.res')
+        with open(hmm_out_2, 'w') as hmm_file:
+            hmm_file.write(text_2)
+        hmm_out = os.path.join(self.tmp_dir, 'integrases.res')
+        with open(hmm_out, 'w') as hmm_file:
+            hmm_file.write(text_1[:text_1.rindex('[ok]')] + text_2[text_2.index('Query:'):])
+
+        df = read_hmm('synthetic', self.prot_db, hmm_out, None)
+        exp = pd.DataFrame({"Accession_number": ['synthetic'] * 4,
+                            "query_name": ['Phage_integrase', 'Phage_integrase', 'intI_Cterm', 'intI_Cterm'],
+                            "ID_query": ['PF00589.16', 'PF00589.16', 'intI_Cterm', 'intI_Cterm'],
+                            "ID_prot": ['prot_1', 'prot_2', 'prot_1', 'prot_2'],
+                            "strand": [1, -1, 1, -1],
+                            "pos_beg": [1001, 2001, 1001, 2001],
+                            "pos_end": [1900, 2900, 1900, 2900],
+                            # the i-evalue of the best domain (the other one is 7.7e+02)
+                            "evalue": [2.5e-02, 3.5e-03, 2.5e-02, 3.5e-03]})
+        pdt.assert_frame_equal(df, exp)
+        by_query = pd.concat([read_hmm_loc('synthetic', self.prot_db, path, None) for path in (hmm_out_1, hmm_out_2)],
+                             ignore_index=True)
+        pdt.assert_frame_equal(df, by_query)
+        # with the former implementation the hits of the first query are lost
+        former = read_hmm_loc('synthetic', self.prot_db, hmm_out, None)
+        self.assertListEqual(former.ID_prot.tolist(), ['prot_1', 'prot_2'])
+        self.assertListEqual(former.query_name.tolist(), ['intI_Cterm', 'intI_Cterm'])
+
+    def test_read_hmm_domtblout_eq_text(self):
+        text_out = os.path.join(self.tmp_dir, 'synthetic_hits.res')
+        write_hmmer3_text(text_out, 300)
+        domtbl_out = os.path.join(self.tmp_dir, 'synthetic_hits.domtblout')
+        write_domtblout(domtbl_out, 300)
+        pdt.assert_frame_equal(read_hmm('synthetic', self.prot_db, domtbl_out, None),
+                               read_hmm('synthetic', self.prot_db, text_out, None))
+
+    @benchmark
+    def test_benchmark_read_hmm_domtblout(self):
+        text_out = os.path.join(self.tmp_dir, 'synthetic_hits.res')
+        write_hmmer3_text(text_out, 50_000)
+        domtbl_out = os.path.join(self.tmp_dir, 'synthetic_hits.domtblout')
+        write_domtblout(domtbl_out, 50_000)
+        with self.timer('read_hmm hmmer3-text 50000 hits') as text_time:
+            exp = read_hmm('synthetic', self.prot_db, text_out, None)
+        with self.timer('read_hmm domtblout 50000 hits') as domtbl_time:
+            df = read_hmm('synthetic', self.prot_db, domtbl_out, None)
+        pdt.assert_frame_equal(df, exp)
+        self.assertLess(domtbl_time['time'], text_time['time'])
+
+    @benchmark
+    def test_benchmark_read_hmm(self):
+        hmm_out = os.path.join(self.tmp_dir, 'synthetic_hits.res')
+        write_hmmer3_text(hmm_out, 50_000)
+        with self.timer('read_hmm loc 50000 hits') as old_time:
+            exp = read_hmm_loc('synthetic', self.prot_db, hmm_out, None)
+        with self.timer('read_hmm 50000 hits') as new_time:
+            df = read_hmm('synthetic', self.prot_db, hmm_out, None)
+        pdt.assert_frame_equal(df, exp)
+        self.assertLess(new_time['time'], old_time['time'])
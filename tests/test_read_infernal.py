@@ -28,11 +28,12 @@
 
 
 import os
+import tempfile
 import pandas as pd
 import pandas.testing as pdt
 
 try:
-    from tests import IntegronTest
+    from tests import IntegronTest, benchmark
 except ImportError as err:
     msg = "Cannot import integron_finder: {0!s}".format(err)
     raise ImportError(msg)
@@ -40,6 +41,75 @@ except ImportError as err:
 from integron_finder import infernal
 
 
+def write_tblout(path, hits_nb, replicon_size):
+    """
+    Write a synthetic cmsearch --tblout output with *hits_nb* hits on both strands.
+    Some hits are filtered out by evalue or size, some are truncated or overflow the replicon ends.
+    """
+    with open(path, 'w') as out:
+        out.write("#target name         accession query name           accession mdl mdl from   mdl to seq from"
+                  "   seq to strand trunc pass   gc  bias  score   E-value inc description of target\n"
+                  "#------------------- --------- -------------------- --------- --- -------- -------- --------"
+                  " -------- ------ ----- ---- ---- ----- ------ --------- --- ---------------------\n")
+        for i in range(hits_nb):
+            start = (i * 97) % replicon_size + 1
+            length = 30 + (i * 13) % 200
+            cm_from = 1 + i % 5
+            cm_to = 47 - i % 4
+            evalue = f"{i % 9 + 1}.{i % 7}e-{i % 12:02}"
+            if i % 50 == 1:
+                start = 1
+            elif i % 50 == 2:
+                start = replicon_size - length
+            if i % 2:
+                seq_from, seq_to, strand = start + length, start, '-'
+            else:
+                seq_from, seq_to, strand = start, start + length, '+'
+            desc = "fake replicon" if i % 3 else "-"
+            out.write(f"replicon             -         attC_4               -          cm {cm_from:>8} {cm_to:>8}"
+                      f" {seq_from:>8} {seq_to:>8} {strand:>6}    no    1 0.55   0.0   20.1 {evalue:>9} !   {desc}\n")
+        out.write("#\n# Program:         cmsearch\n# [ok]\n")
+
+
+def read_infernal_apply(infile, replicon_id, replicon_size, len_model_attc,
+                        evalue=1, size_max_attc=200, size_min_attc=40):
+    """
+    The former implementation of read_infernal which parse the file with the python engine
+    and compute the positions row by row. It is used as reference for read_infernal.
+    """
+    dtype = {"Accession_number": "str",
+             "cm_attC": "str",
+             "cm_debut": "int",
+             "cm_fin": "int",
+             "pos_beg": "int",
+             "pos_end": "int",
+             "evalue": "float",
+             }
+    df = pd.read_csv(infile, sep="\\s+", engine="python", header=None,
+                     comment='#',
+                     usecols=[2, 5, 6, 7, 8, 9, 15])
+    df.columns = ["cm_attC", "cm_debut", "cm_fin", "pos_beg_tmp", "pos_end_tmp", "sens", "evalue"]
+    df["Accession_number"] = replicon_id
+    df = df[df.evalue < evalue]
+    df = df[(abs(df.pos_end_tmp - df.pos_beg_tmp) < size_max_attc) &
+            (size_min_attc < abs(df.pos_end_tmp - df.pos_beg_tmp))]
+    df = df.sort_values(['pos_end_tmp', 'evalue'])
+    df.index = list(range(0, len(df)))
+    idx = (df.pos_beg_tmp > df.pos_end_tmp)
+    df.loc[idx, "pos_beg"] = df.loc[idx].apply(lambda x: max(x["pos_end_tmp"] - (len_model_attc - x["cm_fin"]), 1),
+                                               axis=1)
+    df.loc[idx, "pos_end"] = df.loc[idx].apply(lambda x: min(x["pos_beg_tmp"] + (x["cm_debut"] - 1), replicon_size),
+                                               axis=1)
+    df.loc[~idx, "pos_beg"] = df.loc[~idx].apply(lambda x: max(x["pos_beg_tmp"] - (x["cm_debut"] - 1), 1),
+                                                 axis=1)
+    df.loc[~idx, "pos_end"] = df.loc[~idx].apply(lambda x: min(x["pos_end_tmp"] + (len_model_attc - x["cm_fin"]),
+                                                               replicon_size),
+                                                 axis=1)
+    df = df[["Accession_number", "cm_attC", "cm_debut", "cm_fin", "pos_beg", "pos_end", "sens", "evalue"]]
+    df["cm_attC"] = df["cm_attC"].str.lower()
+    return df.astype(dtype)
+
+
 class TestReadInfernal(IntegronTest):
 
     def setUp(self):
@@ -257,4 +327,30 @@ class TestReadInfernal(IntegronTest):
                                "evalue": [0.0024,0.0023]})
 
         expect = expect.astype(self.dtype)
-        pdt.assert_frame_equal(df, expect)
\ No newline at end of file
+        pdt.assert_frame_equal(df, expect)
+
+
+    def test_read_infernal_eq_apply(self):
+        replicon_size = 20000
+        with tempfile.TemporaryDirectory(prefix='test_read_infernal') as tmp_dir:
+            tblout = os.path.join(tmp_dir, 'synthetic_attc_table.res')
+            write_tblout(tblout, 1000, replicon_size)
+            df = infernal.read_infernal(tblout, 'replicon', replicon_size, self.length_cm)
+            exp = read_infernal_apply(tblout, 'replicon', replicon_size, self.length_cm)
+        self.assertGreater(len(df), 0)
+        self.assertIn(1, df.pos_beg.tolist())
+        self.assertIn(replicon_size, df.pos_end.tolist())
+        pdt.assert_frame_equal(df, exp)
+
+    @benchmark
+    def test_benchmark_read_infernal(self):
+        replicon_size = 5_000_000
+        with tempfile.TemporaryDirectory(prefix='test_read_infernal') as tmp_dir:
+            tblout = os.path.join(tmp_dir, 'synthetic_attc_table.res')
+            write_tblout(tblout, 50_000, replicon_size)
+            with self.timer('read_infernal apply 50000 hits') as old_time:
+                exp = read_infernal_apply(tblout, 'replicon', replicon_size, self.length_cm)
+            with self.timer('read_infernal 50000 hits') as new_time:
+                df = infernal.read_infernal(tblout, 'replicon', replicon_size, self.length_cm)
+        pdt.assert_frame_equal(df, exp)
+        self.assertLess(new_time['time'], old_time['time'])
@@ -32,7 +32,7 @@ import pandas as pd
 import pandas.testing as pdt
 
 try:
-    from tests import IntegronTest
+    from tests import IntegronTest, benchmark
 except ImportError as err:
     msg = "Cannot import integron_finder: {0!s}".format(err)
     raise ImportError(msg)
@@ -40,6 +40,47 @@ except ImportError as err:
 from integron_finder import attc, infernal
 
 
+def synthetic_attc(replicon_id, hits_nb):
+    """
+    Build a table of *hits_nb* attC sites on both strands,
+    with palindromes (same site on both strands), overlapping sites and evalue ties.
+    """
+    pos_beg = [(i // 3) * 150 + (i % 3) * 40 + 1 for i in range(hits_nb)]
+    return pd.DataFrame({"Accession_number": replicon_id,
+                         "cm_attC": "attc_4",
+                         "cm_debut": 1,
+                         "cm_fin": 47,
+                         "pos_beg": pos_beg,
+                         "pos_end": [beg + 60 + (i * 7) % 50 for i, beg in enumerate(pos_beg)],
+                         "sens": ["+" if i % 5 < 3 else "-" for i in range(hits_nb)],
+                         "evalue": [float(f"1e-{i % 4 + 3}") for i in range(hits_nb)]})
+
+
+def drop_palindromes_iloc(attc_df):
+    """
+    The former implementation of the palindromes removal of search_attc, which iterate over the rows.
+    It is used as reference for search_attc.
+    """
+    def overlap(attc1, attc2):
+        if attc2.pos_beg >= attc1.pos_end:
+            return attc1, attc2
+        else:
+            attc_1_len = attc1.pos_end - attc1.pos_beg
+            overlap = min(attc1.pos_end, attc2.pos_end) - attc2.pos_beg
+            ratio = overlap / attc_1_len
+            if ratio > .5:
+                return (attc1, ) if attc1.evalue < attc2.evalue else (attc2, )
+            else:
+                return attc1, attc2
+
+    attc_df = attc_df.sort_values(by=["pos_beg", "pos_end", "evalue"])
+    attc_to_keep = [attc_df.iloc[0]]
+    for row_idx in range(1, len(attc_df)):
+        previous_attc = attc_to_keep.pop()
+        attc_to_keep.extend(overlap(previous_attc, attc_df.iloc[row_idx]))
+    return pd.DataFrame(attc_to_keep, index=list(range(len(attc_to_keep))))
+
+
 class TestSearchAttc(IntegronTest):
     """
     Unit tests search_attc function of integron_finder
@@ -448,3 +489,44 @@ class TestSearchAttc(IntegronTest):
         pdt.assert_frame_equal(attc_res2, attc_array[0])
         pdt.assert_frame_equal(attc_res, attc_array[1])
         pdt.assert_frame_equal(attc_res3, attc_array[2])
+
+
+    def test_search_attc_drop_palindrome_eq_iloc(self):
+        attc_df = synthetic_attc(self.replicon_id, 3000)
+        exp_df = drop_palindromes_iloc(attc_df)
+        self.assertLess(len(exp_df), len(attc_df))
+        attc_array = attc.search_attc(attc_df, False, self.dist_threshold, 1_000_000, 'lin')
+        exp_array = attc.search_attc(exp_df, True, self.dist_threshold, 1_000_000, 'lin')
+        self.assertEqual(len(attc_array), len(exp_array))
+        for array, exp in zip(attc_array, exp_array):
+            pdt.assert_frame_equal(array, exp)
+
+    def test_search_attc_drop_palindrome_null_length(self):
+        # sites of null length and sites overlapping the origin of a circular replicon (pos_end < pos_beg)
+        attc_df = pd.DataFrame({"Accession_number": self.replicon_id,
+                                "cm_attC": "attc_4",
+                                "cm_debut": 1,
+                                "cm_fin": 47,
+                                "pos_beg": [100, 100, 100, 150, 990, 995, 996],
+                                "pos_end": [100, 100, 180, 150, 20, 995, 40],
+                                "sens": "+",
+                                "evalue": [1e-3, 1e-4, 1e-5, 1e-3, 1e-4, 1e-5, 1e-3]})
+        exp_df = drop_palindromes_iloc(attc_df)
+        attc_array = attc.search_attc(attc_df, False, self.dist_threshold, 1000, 'circ')
+        exp_array = attc.search_attc(exp_df, True, self.dist_threshold, 1000, 'circ')
+        self.assertEqual(len(attc_array), len(exp_array))
+        for array, exp in zip(attc_array, exp_array):
+            pdt.assert_frame_equal(array, exp)
+
+    @benchmark
+    def test_benchmark_search_attc_drop_palindrome(self):
+        attc_df = synthetic_attc(self.replicon_id, 100_000)
+        with self.timer('drop palindromes iloc 100000 hits') as old_time:
+            exp_df = drop_palindromes_iloc(attc_df)
+        with self.timer('search_attc drop palindromes 100000 hits') as new_time:
+            attc_array = attc.search_attc(attc_df, False, self.dist_threshold, 20_000_000, 'lin')
+        exp_array = attc.search_attc(exp_df, True, self.dist_threshold, 20_000_000, 'lin')
+        self.assertEqual(len(attc_array), len(exp_array))
+        for array, exp in zip(attc_array, exp_array):
+            pdt.assert_frame_equal(array, exp)
+        self.assertLess(new_time['time'], old_time['time'])
@@ -154,6 +154,15 @@ sequence seq_(4|2) is too short \(32 bp\), the sequence is skipped \(must be > 5
         expected_seq_id = sorted(['seq_1', 'seq_3'])
         self.assertListEqual(expected_seq_id, received_seq_id)
 
+    def test_FastaIterator_sizes(self):
+        replicon_path = self.find_data(os.path.join('Replicons', 'replicon_too_short.fst'))
+        with utils.FastaIterator(replicon_path) as seq_db:
+            self.assertEqual(seq_db.sizes(), (192, {'seq_1': 64, 'seq_3': 64}))
+
+        replicon_path = self.find_data(os.path.join('Replicons', 'replicon_bad_char.fst'))
+        with utils.FastaIterator(replicon_path) as seq_db:
+            self.assertEqual(seq_db.sizes(), (256, {'seq_1': 64, 'seq_2': 64}))
+
 
     def test_model_len(self):
         model_path = self.find_data(os.path.join('Models', 'attc_4.cm'))